@@ -1,28 +1,235 @@
+"""Build the FAISS index of PubMed abstracts.
+
+Abstracts are split into chunks on a process pool, and chunks are embedded in batches as the
+splits come back. Each batch goes straight into the index, so only one batch of vectors is in
+flight. Chunk text goes to the SQLite chunk store as it is indexed (see chunk_store.py); the new
+store replaces the one at --output only once it is complete.
+Embeddings are cached on disk by (model, chunk text), and a rebuild only encodes the chunks
+that changed.
+
+Run from the repository root, e.g.:
+    python -m RagModule.scripts.build_vectorstore --workers 4 --batch-size 64
+"""
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
 import pandas as pd
-from langchain.docstore.document import Document
-from langchain_community.vectorstores import FAISS
-from langchain.embeddings import HuggingFaceEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-import os
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+from .chunk_store import EMBEDDING_MODEL, create_chunk_store, discard_chunk_store, save_chunk_store
+from .embedding_cache import CACHE_PATH, EmbeddingCache, embedding_key
 
 DATA_PATH = os.path.join(os.path.dirname(__file__), "../data/pubmed_abstracts.csv")
 INDEX_PATH = os.path.join(os.path.dirname(__file__), "../vectorstore/faiss_pubmed")
 
-def build_index():
-    df = pd.read_csv(DATA_PATH)
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+
+# Abstracts per split task: large enough to amortize pickling, small enough to keep every worker busy
+SPLIT_BATCH = 256
+
+# Tried by --batch-size auto; MiniLM on CPU usually peaks around 32-128
+BATCH_SIZE_CANDIDATES = (16, 32, 64, 128, 256)
+
+_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+
+def load_abstracts(path: str = DATA_PATH) -> Tuple[list, list]:
+    """(texts, pmids) of every abstract with text, as plain Python lists"""
+    df = pd.read_csv(path, usecols=["pmid", "text"]).dropna(subset=["text"])
+    return df["text"].astype(str).tolist(), df["pmid"].tolist()
+
+
+def split_abstracts(batch: Tuple[list, list]) -> List[Tuple[str, dict]]:
+    """(chunk text, metadata) for one batch of abstracts; runs in the worker processes"""
+    texts, pmids = batch
+    documents = _splitter.create_documents(texts, [{"pmid": pmid} for pmid in pmids])
+    return [(document.page_content, document.metadata) for document in documents]
+
+
+def build_embeddings(kind: str = "minilm", batch_size: int = 64):
+    """(embeddings, cache namespace); "fake" is a deterministic hash embedding for offline runs"""
+    if kind == "fake":
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+
+        return DeterministicFakeEmbedding(size=384), "fake-384"
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL, encode_kwargs={"batch_size": batch_size})
+    return embeddings, EMBEDDING_MODEL
 
-    docs = [Document(page_content=row["text"], metadata={"pmid": row["pmid"]})
-            for _, row in df.iterrows()]
 
-    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    chunks = splitter.split_documents(docs)
+def set_encode_batch_size(embeddings, size: int):
+    """Make the encoder itself run batches of `size` (HuggingFaceEmbeddings; a no-op for others)"""
+    encode_kwargs = getattr(embeddings, "encode_kwargs", None)
+    if encode_kwargs is not None:
+        encode_kwargs["batch_size"] = size
 
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    vectorstore = FAISS.from_documents(chunks, embeddings)
 
-    os.makedirs(INDEX_PATH, exist_ok=True)
-    vectorstore.save_local(INDEX_PATH)
-    print(f"Vector store saved to {INDEX_PATH}")
+def tune_batch_size(embeddings, texts: list, candidates=BATCH_SIZE_CANDIDATES) -> int:
+    """The candidate batch size with the highest chunks/sec on a sample of chunk texts.
+
+    Each candidate is set on the encoder while it is measured, and the winner stays set.
+    """
+    best, best_rate = candidates[0], 0.0
+    for size in candidates:
+        set_encode_batch_size(embeddings, size)
+        sample = texts[:max(size * 2, 64)]
+        start = time.perf_counter()
+        for offset in range(0, len(sample), size):
+            embeddings.embed_documents(sample[offset:offset + size])
+        rate = len(sample) / max(time.perf_counter() - start, 1e-9)
+        if rate > best_rate:
+            best, best_rate = size, rate
+    set_encode_batch_size(embeddings, best)
+    return best
+
+
+def peak_rss_mb() -> dict:
+    """Peak resident memory of this process and of its (finished) workers ({} on Windows)"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return {}
+    # ru_maxrss is kB on Linux but bytes on macOS
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "main": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit, 1),
+        "workers": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit, 1),
+    }
+
+
+def build_index(
+    data_path: str = DATA_PATH,
+    index_path: Optional[str] = INDEX_PATH,
+    embeddings=None,
+    model_name: Optional[str] = None,
+    workers: int = os.cpu_count() or 1,
+    batch_size: Optional[int] = 64,
+    cache: Optional[EmbeddingCache] = None,
+):
+    """Split, embed and index the abstracts; returns (vectorstore, stats).
+
+    `batch_size=None` tunes the embedding batch size on the first chunks. Pass `cache=None`
+    to embed every chunk, and `index_path=None` to skip saving.
+    """
+    if embeddings is None:
+        embeddings, model_name = build_embeddings("minilm", batch_size or 64)
+    model_name = model_name or type(embeddings).__name__
+    start = time.perf_counter()
+    texts, pmids = load_abstracts(data_path)
+    batches = [(texts[i:i + SPLIT_BATCH], pmids[i:i + SPLIT_BATCH]) for i in range(0, len(texts), SPLIT_BATCH)]
+
+    vectorstore = None
+    stats = {"abstracts": len(texts), "chunks": 0, "embedded": 0, "embed_seconds": 0.0}
+    pending: List[Tuple[str, dict]] = []
+
+    def flush(chunks):
+        nonlocal vectorstore
+        keys = [embedding_key(model_name, text) for text, _ in chunks]
+        vectors = cache.get_many(keys) if cache is not None else {}
+        missing = list({key: text for key, (text, _) in zip(keys, chunks) if key not in vectors}.items())
+        if missing:
+            embed_start = time.perf_counter()
+            fresh = embeddings.embed_documents([text for _, text in missing])
+            stats["embed_seconds"] += time.perf_counter() - embed_start
+            stats["embedded"] += len(missing)
+            fresh = {key: np.asarray(vector, dtype=np.float32) for (key, _), vector in zip(missing, fresh)}
+            if cache is not None:
+                cache.put_many(fresh)
+            vectors.update(fresh)
+        if vectorstore is None:
+            dimension = len(vectors[keys[0]])
+            if index_path:
+                vectorstore = create_chunk_store(index_path, embeddings, dimension)
+            else:
+                import faiss
+
+                vectorstore = FAISS(embeddings, faiss.IndexFlatL2(dimension), InMemoryDocstore(), {})
+        vectorstore.add_embeddings(
+            [(text, vectors[key]) for key, (text, _) in zip(keys, chunks)],
+            metadatas=[metadata for _, metadata in chunks],
+        )
+        stats["chunks"] += len(chunks)
+
+    # map() yields splits in input order as they finish, so the index order is the same for any
+    # number of workers, and the main process embeds while the pool keeps splitting
+    try:
+        with ProcessPoolExecutor(max_workers=workers) if workers > 1 else _inline() as pool:
+            for chunks in pool.map(split_abstracts, batches):
+                if batch_size is None:
+                    batch_size = tune_batch_size(embeddings, [text for text, _ in chunks])
+                    stats["tuned"] = True
+                pending.extend(chunks)
+                while len(pending) >= batch_size:
+                    flush(pending[:batch_size])
+                    del pending[:batch_size]
+        if pending:
+            flush(pending)
+    except BaseException:
+        # The live index at index_path is untouched until save_chunk_store swaps the new one in
+        if vectorstore is not None and index_path:
+            discard_chunk_store(vectorstore)
+        raise
+
+    if vectorstore is not None and index_path:
+        save_chunk_store(vectorstore, index_path)
+
+    seconds = time.perf_counter() - start
+    stats.update(
+        workers=workers,
+        batch_size=batch_size,
+        seconds=round(seconds, 3),
+        embed_seconds=round(stats["embed_seconds"], 3),
+        chunks_per_sec=round(stats["chunks"] / max(seconds, 1e-9), 1),
+        peak_rss_mb=peak_rss_mb(),
+    )
+    if cache is not None:
+        stats["cache"] = cache.stats()
+    return vectorstore, stats
+
+
+class _inline:
+    """Stand-in for the process pool when splitting on a single worker"""
+
+    map = staticmethod(map)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
 
 if __name__ == "__main__":
-    build_index()
+    parser = argparse.ArgumentParser(description="Build the PubMed FAISS index")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--output", default=INDEX_PATH)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes splitting abstracts")
+    parser.add_argument("--batch-size", default="64", help="Chunks per embedding call, or 'auto' to measure")
+    parser.add_argument("--embeddings", choices=["minilm", "fake"], default="minilm")
+    parser.add_argument("--cache", default=CACHE_PATH, help="Embedding cache (SQLite)")
+    parser.add_argument("--no-cache", action="store_true", help="Re-encode every chunk")
+    args = parser.parse_args()
+
+    batch_size = None if args.batch_size == "auto" else int(args.batch_size)
+    embeddings, model_name = build_embeddings(args.embeddings, batch_size or 64)
+    cache = None if args.no_cache else EmbeddingCache(args.cache)
+    _, stats = build_index(args.data, args.output, embeddings, model_name, args.workers, batch_size, cache)
+    print(
+        f"Indexed {stats['chunks']} chunks from {stats['abstracts']} abstracts in {stats['seconds']:.2f} s "
+        f"({stats['chunks_per_sec']:.0f} chunks/s, {stats['embedded']} embedded, batch size {stats['batch_size']})"
+    )
+    if "cache" in stats:
+        print(f"Embedding cache: {stats['cache']['hits']} hits, {stats['cache']['misses']} misses")
+    peak = stats["peak_rss_mb"]
+    if peak:
+        print(f"Peak RSS: {peak['main']} MB" + (f", {peak['workers']} MB per worker" if args.workers > 1 else ""))
+    print(f"Vector store saved to {args.output}")
@@ -0,0 +1,257 @@
+"""Vector store persistence without the pickled docstore.
+
+`FAISS.save_local` pickles every chunk's text and metadata into `index.pkl`, so loading
+unpickles the whole corpus (slow, memory-hungry and unsafe on untrusted files). This format
+keeps the same `index.faiss` next to a `chunks.sqlite` table keyed by the FAISS row position:
+
+- the FAISS index is memory-mapped (IO_FLAG_MMAP_IFC), so its pages come from the page cache and
+  are shared by every worker process;
+- chunk text and metadata are read from SQLite by position only for the search hits.
+
+Loading therefore costs the same at 10k and 1M chunks. A store is written to a staging directory
+next to its folder and only swapped in once both files are complete, so an interrupted build never
+touches the store being served. Convert an existing pickled index with:
+    python -m RagModule.scripts.chunk_store RagModule/vectorstore/faiss_pubmed
+"""
+import os
+import json
+import shutil
+import sqlite3
+import tempfile
+import warnings
+import threading
+from collections.abc import Mapping
+from typing import Dict, Union
+
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+# Sentence encoder the index is built with; queries must be embedded with the same one
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+CHUNKS_FILE = "chunks.sqlite"
+INDEX_FILE = "index.faiss"
+
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    """Chunk text and metadata in SQLite, looked up by FAISS row position.
+
+    `add` appends in insertion order, which is the order FAISS assigns row positions in, so the
+    store stays aligned with the index as long as both only grow together (see PositionIds).
+    """
+
+    def __init__(self, path: str, readonly: bool = False):
+        self.path = path
+        self.readonly = readonly
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        if not readonly:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with self._lock:
+                self._connection().execute(
+                    "CREATE TABLE IF NOT EXISTS chunks (position INTEGER PRIMARY KEY, id TEXT NOT NULL, "
+                    "text TEXT NOT NULL, metadata TEXT NOT NULL)"
+                )
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections must not cross fork (gunicorn preloads the index in the master)
+        if self._pid != os.getpid():
+            if self.readonly:
+                self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            else:
+                self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._pid = os.getpid()
+        return self._conn
+
+    def search(self, search: Union[int, str]) -> Union[str, Document]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT id, text, metadata FROM chunks WHERE position = ?", (int(search),)
+            ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(id=row[0], page_content=row[1], metadata=json.loads(row[2]))
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        with self._lock:
+            conn = self._connection()
+            start = self._end(conn)
+            conn.executemany(
+                "INSERT INTO chunks (position, id, text, metadata) VALUES (?, ?, ?, ?)",
+                (
+                    (start + offset, str(id_), document.page_content, json.dumps(document.metadata))
+                    for offset, (id_, document) in enumerate(texts.items())
+                ),
+            )
+            conn.commit()
+
+    @staticmethod
+    def _end(conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM chunks").fetchone()[0]
+
+    def end(self) -> int:
+        """One past the last position: the number of chunks, since positions are contiguous"""
+        with self._lock:
+            return self._end(self._connection())
+
+    def delete(self, ids) -> None:
+        raise NotImplementedError("Chunk stores are append-only; rebuild the index to remove chunks")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+            self._pid = None
+
+
+class PositionIds(Mapping):
+    """FAISS row position -> docstore key without a per-chunk dict: the key is the position itself"""
+
+    def __init__(self, size: int = 0):
+        self.size = size
+
+    def __getitem__(self, position: int) -> int:
+        if not 0 <= position < self.size:
+            raise KeyError(position)
+        return int(position)
+
+    def __iter__(self):
+        return iter(range(self.size))
+
+    def __len__(self) -> int:
+        return self.size
+
+    def update(self, positions: Dict[int, str]):
+        # FAISS.add_embeddings passes {starting_len + j: id}; only appends keep positions aligned
+        if sorted(positions) != list(range(self.size, self.size + len(positions))):
+            raise ValueError("Chunk stores only support appending rows in order")
+        self.size += len(positions)
+
+
+STAGING_SUFFIX = ".building"
+
+
+def _staging_folder(folder: str) -> str:
+    """New empty directory beside `folder` (same file system, so os.replace can move files out of it)"""
+    folder = os.path.abspath(folder)
+    os.makedirs(os.path.dirname(folder), exist_ok=True)
+    return tempfile.mkdtemp(prefix=f".{os.path.basename(folder)}.", suffix=STAGING_SUFFIX, dir=os.path.dirname(folder))
+
+
+def _staging_of(docstore, folder: str) -> bool:
+    if not isinstance(docstore, SQLiteDocstore):
+        return False
+    staging = os.path.dirname(os.path.abspath(docstore.path))
+    folder = os.path.abspath(folder)
+    return (os.path.dirname(staging) == os.path.dirname(folder)
+            and os.path.basename(staging).startswith(f".{os.path.basename(folder)}.")
+            and staging.endswith(STAGING_SUFFIX))
+
+
+def create_chunk_store(folder: str, embeddings, dimension: int) -> FAISS:
+    """Empty, writable vector store for `folder`; fill with add_embeddings and publish with save_chunk_store.
+
+    It is written to a staging directory, and whatever `folder` holds keeps serving until then.
+    """
+    import faiss
+
+    docstore = SQLiteDocstore(os.path.join(_staging_folder(folder), CHUNKS_FILE))
+    return FAISS(embeddings, faiss.IndexFlatL2(dimension), docstore, PositionIds())
+
+
+def discard_chunk_store(vectorstore: FAISS):
+    """Remove the staging directory of an unpublished store from create_chunk_store"""
+    docstore = vectorstore.docstore
+    docstore.close()
+    shutil.rmtree(os.path.dirname(os.path.abspath(docstore.path)), ignore_errors=True)
+
+
+def save_chunk_store(vectorstore: FAISS, folder: str):
+    """Write `vectorstore` in the chunk-store format and swap it into `folder`.
+
+    Both files are completed in a staging directory first (the one from create_chunk_store, or a
+    new one holding a copy of the docstore), then moved over the live ones with os.replace.
+    """
+    import faiss
+
+    docstore = vectorstore.docstore
+    staged = _staging_of(docstore, folder)
+    if staged:
+        staging = os.path.dirname(os.path.abspath(docstore.path))
+        docstore.close()
+    else:
+        staging = _staging_folder(folder)
+        target = SQLiteDocstore(os.path.join(staging, CHUNKS_FILE))
+        batch = {}
+        for position in range(vectorstore.index.ntotal):
+            key = vectorstore.index_to_docstore_id[position]
+            batch[key] = docstore.search(key)
+            if len(batch) == 10_000:
+                target.add(batch)
+                batch = {}
+        target.add(batch)
+        target.close()
+    faiss.write_index(vectorstore.index, os.path.join(staging, INDEX_FILE))
+
+    # Chunks first: a store loaded between the two moves fails the size check in load_chunk_store
+    os.makedirs(folder, exist_ok=True)
+    for name in (CHUNKS_FILE, INDEX_FILE):
+        os.replace(os.path.join(staging, name), os.path.join(folder, name))
+    os.rmdir(staging)
+    if staged:
+        docstore.path = os.path.join(folder, CHUNKS_FILE)
+    # A pickled docstore left behind would describe a different build
+    legacy = os.path.join(folder, "index.pkl")
+    if os.path.exists(legacy):
+        os.remove(legacy)
+
+
+def load_chunk_store(folder: str, embeddings, mmap: bool = True) -> FAISS:
+    """Read-only vector store: memory-mapped FAISS index, chunks fetched from SQLite per hit"""
+    import faiss
+
+    flags = faiss.IO_FLAG_MMAP_IFC if mmap else 0
+    index = faiss.read_index(os.path.join(folder, INDEX_FILE), flags)
+    docstore = SQLiteDocstore(os.path.join(folder, CHUNKS_FILE), readonly=True)
+    chunks = docstore.end()
+    if chunks != index.ntotal:
+        raise ValueError(f"{folder} has {index.ntotal} vectors but {chunks} chunks; rebuild the index")
+    return FAISS(embeddings, index, docstore, PositionIds(index.ntotal))
+
+
+def is_chunk_store(folder: str) -> bool:
+    return os.path.exists(os.path.join(folder, CHUNKS_FILE))
+
+
+def load_vectorstore(folder: str, embeddings, mmap: bool = True) -> FAISS:
+    """Load `folder` in whichever format it was saved; pickled indexes still load, with a warning"""
+    if is_chunk_store(folder):
+        return load_chunk_store(folder, embeddings, mmap)
+    warnings.warn(
+        f"{folder} uses the pickled FAISS docstore; convert it with `python -m RagModule.scripts.chunk_store {folder}`",
+        stacklevel=2,
+    )
+    return FAISS.load_local(folder, embeddings, allow_dangerous_deserialization=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from langchain_core.embeddings import FakeEmbeddings
+
+    parser = argparse.ArgumentParser(description="Convert a pickled FAISS index to the chunk-store format")
+    parser.add_argument("folder", help="Folder written by FAISS.save_local (index.faiss + index.pkl)")
+    parser.add_argument("--output", help="Destination folder (default: convert in place)")
+    args = parser.parse_args()
+
+    # The embedding function is only used for queries, so any stand-in works for the conversion
+    source = FAISS.load_local(args.folder, FakeEmbeddings(size=1), allow_dangerous_deserialization=True)
+    save_chunk_store(source, args.output or args.folder)
+    print(f"Converted {source.index.ntotal} chunks -> {args.output or args.folder}")
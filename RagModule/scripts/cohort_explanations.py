@@ -0,0 +1,280 @@
+"""Explain the ML predictions of a whole cohort offline.
+
+Patients are grouped on the bucketed profile fields that drive retrieval (--group-by; strain,
+vaccine and doses by default, see explanation_cache.profile_frame). Evidence is retrieved once
+per group, and the remaining profile fields are listed with each patient. A group's patients
+are packed into prompts of up to --patients-per-prompt, and the LLM answers with a JSON array
+holding one entry per patient. Groups run concurrently through the shared LLM gateway at background
+priority, and prompts are spaced to --requests-per-minute.
+
+Verdicts come from a prediction column of the input, and patients without one are scored with the
+API's model (covid_predictor_api/app).
+
+Every explained patient is appended to the output JSONL as soon as its prompt returns, so an
+interrupted run resumes where it stopped. Patients missing from a malformed answer are left
+out and picked up by the next run.
+
+Run from the repository root, e.g.:
+    python -m RagModule.scripts.cohort_explanations "data/Covid-19 Dataset.csv" --output explanations.jsonl
+"""
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from .explanation_cache import PROFILE_FIELDS, profile_frame
+from .llm_gateway import PRIORITY_BACKGROUND, get_gateway
+from .llm_providers import check_llm_available
+from .rag_pipeline import aretrieve_context
+
+RISK_LEVELS = ("Low", "Moderate", "High")
+
+# Profile fields shared by every patient of a group: 80 groups on the 3,000-patient dataset,
+# where the full profile leaves most groups with a single patient
+GROUP_FIELDS = ["COVID_Strain", "Vaccine_Type", "Doses_Received"]
+
+# Per-patient fields outside the profile
+DETAIL_FIELDS = [
+    "Age", "Gender", "Symptoms", "ICU_Admission", "Ventilator_Support", "BMI",
+    "Date_of_Infection", "Date_of_Last_Dose",
+]
+
+cohort_template = """
+You are a medical assistant explaining COVID-19 reinfection risk using research evidence.
+The patients below share this profile:
+{group_query}
+
+Scientific evidence:
+{context_text}
+
+Patients (with the ML model's prediction for each):
+{patients}
+
+TASK:
+For every patient, state the risk level (Low/Moderate/High) and explain it in 3-5 sentences
+from evidence matching the patient's profile and details. Only use the given scientific evidence.
+
+Respond with only a JSON array, one object per patient, in this form:
+[{{"patient": "<patient id>", "risk_level": "Low|Moderate|High", "explanation": "According to the evidence, ..."}}]
+"""
+
+
+class RateLimiter:
+    """Spaces acquisitions at least 1/rate seconds apart (no limit when rate is 0)"""
+
+    def __init__(self, per_minute: float, clock=time.monotonic, sleep=asyncio.sleep):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self.clock = clock
+        self.sleep = sleep
+        self._next = 0.0
+
+    async def acquire(self):
+        now = self.clock()
+        start = max(now, self._next)
+        self._next = start + self.interval
+        if start > now:
+            await self.sleep(start - now)
+
+
+def score_patients(df: pd.DataFrame) -> list:
+    """The API model's "Yes"/"No" for raw patient records (PatientFeatures columns)"""
+    api_dir = os.path.join(os.path.dirname(__file__), "../../covid_predictor_api")
+    if os.path.abspath(api_dir) not in sys.path:
+        sys.path.append(os.path.abspath(api_dir))
+    from app.model_interface import predict_frame
+    from app.preprocessing import engineer_features
+
+    return predict_frame(engineer_features({column: df[column].to_numpy(dtype=object) for column in df.columns}))
+
+
+def load_cohort(path: str, prediction_column: str = "ML_Prediction", id_column: str = "Patient_ID") -> pd.DataFrame:
+    """Patients with a string `patient_id` and `ML_Prediction`.
+
+    Predictions come from `prediction_column`; patients without one (or all of them, when the
+    file has no such column) are scored with the API's model.
+    """
+    df = pd.read_csv(path)
+    df["patient_id"] = (df[id_column] if id_column in df else pd.Series(df.index, index=df.index)).astype(str)
+    if df["patient_id"].duplicated().any():
+        raise ValueError(f"{id_column} must identify each patient once")
+    predictions = df[prediction_column] if prediction_column in df else pd.Series(None, index=df.index, dtype=object)
+    missing = predictions.isna()
+    if missing.any():
+        print(f"Scoring {int(missing.sum())} patients without a {prediction_column} with the model")
+        predictions = predictions.astype(object)
+        predictions[missing] = score_patients(df[missing])
+    df["ML_Prediction"] = predictions.astype(str)
+    return df
+
+
+def load_checkpoint(path: str) -> Dict[str, dict]:
+    """Results already written to the output, by patient id; a torn last line is ignored"""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            done[record["patient_id"]] = record
+    return done
+
+
+def build_group_query(group: dict) -> str:
+    """Retrieval query for the fields a group shares"""
+    return "COVID-19 reinfection risk assessment considering: " + ", ".join(
+        f"{field.replace('_', ' ')}: {value}" for field, value in group.items()
+    )
+
+
+def patient_details(patient: dict, group: dict) -> str:
+    fields = [field for field in PROFILE_FIELDS if field not in group] + DETAIL_FIELDS
+    details = ", ".join(f"{field}: {patient['profile'][field] if field in PROFILE_FIELDS else patient.get(field)}"
+                        for field in fields)
+    return f"[patient {patient['patient_id']}]\nML Prediction: {patient['ML_Prediction']} risk. {details}"
+
+
+def build_cohort_prompt(group: dict, context_text: str, patients: List[dict]) -> str:
+    return cohort_template.format(
+        group_query=build_group_query(group),
+        context_text=context_text,
+        patients="\n".join(patient_details(patient, group) for patient in patients),
+    )
+
+
+def parse_cohort_response(text: str, patient_ids: List[str]) -> Dict[str, dict]:
+    """{patient id: {"risk_level", "explanation"}} for the well-formed entries of the LLM answer"""
+    match = re.search(r"\[.*\]", text, re.DOTALL)
+    if match is None:
+        return {}
+    try:
+        entries = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return {}
+    wanted, parsed = set(patient_ids), {}
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        patient, risk_level = str(entry.get("patient", "")), str(entry.get("risk_level", "")).strip().title()
+        explanation = entry.get("explanation")
+        if patient in wanted and risk_level in RISK_LEVELS and isinstance(explanation, str) and explanation.strip():
+            parsed[patient] = {"risk_level": risk_level, "explanation": explanation.strip()}
+    return parsed
+
+
+def group_patients(df: pd.DataFrame, patients_per_prompt: int, group_fields: List[str] = GROUP_FIELDS) -> List[tuple]:
+    """[(shared field values, [prompt batches of patient dicts])], largest groups first"""
+    profiles = profile_frame(df)
+    patients = df[["patient_id", "ML_Prediction"] + [c for c in DETAIL_FIELDS if c in df]].to_dict("records")
+    for patient, profile in zip(patients, profiles.to_dict("records")):
+        patient["profile"] = profile
+    groups = []
+    for values, positions in profiles.reset_index(drop=True).groupby(group_fields, sort=False).indices.items():
+        members = [patients[i] for i in positions]
+        batches = [members[i:i + patients_per_prompt] for i in range(0, len(members), patients_per_prompt)]
+        values = values if isinstance(values, tuple) else (values,)
+        groups.append((dict(zip(group_fields, values)), batches))
+    groups.sort(key=lambda item: -sum(len(batch) for batch in item[1]))
+    return groups
+
+
+async def explain_cohort(
+    df: pd.DataFrame,
+    output: str,
+    patients_per_prompt: int = 8,
+    concurrency: int = 4,
+    requests_per_minute: float = 0,
+    group_fields: List[str] = GROUP_FIELDS,
+    priority: int = PRIORITY_BACKGROUND,
+) -> dict:
+    """Explain every patient of `df` not already in `output`; returns a run summary"""
+    check_llm_available()
+    done = load_checkpoint(output)
+    todo = df[~df["patient_id"].isin(list(done))]
+    groups = group_patients(todo, patients_per_prompt, group_fields)
+    summary = {
+        "patients": len(df), "already_done": len(df) - len(todo), "groups": len(groups),
+        "prompts": 0, "explained": 0, "failed": 0, "failed_prompts": 0,
+    }
+    gateway = get_gateway()
+    limiter = RateLimiter(requests_per_minute)
+    slots = asyncio.Semaphore(concurrency)
+    start = time.perf_counter()
+
+    with open(output, "a", encoding="utf-8") as out:
+        def checkpoint(batch, results):
+            for patient in batch:
+                result = results.get(str(patient["patient_id"]))
+                if result is None:
+                    summary["failed"] += 1
+                    continue
+                out.write(json.dumps({
+                    "patient_id": str(patient["patient_id"]),
+                    "ML_Prediction": patient["ML_Prediction"],
+                    "profile": patient["profile"],
+                    **result,
+                }) + "\n")
+                summary["explained"] += 1
+            out.flush()
+
+        async def run_group(group, batches):
+            async with slots:
+                try:
+                    context_text = await aretrieve_context(build_group_query(group))
+                except Exception as e:
+                    print(f"Retrieval failed for {group}: {e}")
+                    summary["failed"] += sum(len(batch) for batch in batches)
+                    return
+                for batch in batches:
+                    await limiter.acquire()
+                    summary["prompts"] += 1
+                    try:
+                        text = await gateway.acall(build_cohort_prompt(group, context_text, batch), priority)
+                    except Exception as e:
+                        print(f"LLM request failed for {len(batch)} patients of {group}: {e}")
+                        summary["failed_prompts"] += 1
+                        text = ""
+                    checkpoint(batch, parse_cohort_response(text, [str(p["patient_id"]) for p in batch]))
+
+        await asyncio.gather(*(run_group(group, batches) for group, batches in groups))
+
+    seconds = time.perf_counter() - start
+    summary["seconds"] = round(seconds, 2)
+    summary["patients_per_sec"] = round(summary["explained"] / max(seconds, 1e-9), 1)
+    summary["gateway"] = gateway.stats()
+    return summary
+
+
+def run_cohort(path: str, output: str, prediction_column: str = "ML_Prediction", limit: Optional[int] = None, **options) -> dict:
+    df = load_cohort(path, prediction_column)
+    if limit:
+        df = df.head(limit)
+    return asyncio.run(explain_cohort(df, output, **options))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Explain the ML predictions of a cohort of patients")
+    parser.add_argument("data", help="CSV with raw patient records (and the model's predictions)")
+    parser.add_argument("--output", default="cohort_explanations.jsonl", help="JSONL results; also the checkpoint")
+    parser.add_argument("--prediction-column", default="ML_Prediction",
+                        help="column with the model's Yes/No; patients without one are scored with the model")
+    parser.add_argument("--patients-per-prompt", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4, help="groups processed at once")
+    parser.add_argument("--group-by", default=",".join(GROUP_FIELDS), help=f"profile fields shared by a group, from {PROFILE_FIELDS}")
+    parser.add_argument("--requests-per-minute", type=float, default=60, help="0 for no limit")
+    parser.add_argument("--limit", type=int, help="only the first N patients")
+    args = parser.parse_args()
+
+    print(run_cohort(
+        args.data, args.output, args.prediction_column, args.limit,
+        patients_per_prompt=args.patients_per_prompt, concurrency=args.concurrency,
+        requests_per_minute=args.requests_per_minute, group_fields=args.group_by.split(","),
+    ))
@@ -0,0 +1,198 @@
+"""Server-side chat sessions with a token-bounded memory.
+
+Each session keeps its most recent turns verbatim up to CHAT_MEMORY_RECENT_TOKENS. When a new
+turn pushes it over that budget, the oldest turns are folded into a running summary by the
+LLM, and the summary is capped at CHAT_MEMORY_SUMMARY_TOKENS. The history sent with each prompt
+is therefore bounded however long the conversation gets. At most CHAT_SESSIONS_MAX sessions are
+kept, evicting the least recently used.
+
+Summarization runs on a background thread after the answer is returned; the session's next
+turn waits for it only if it is still running. Sessions live in the serving process, so with
+several workers a follow-up landing on another worker starts a fresh memory.
+"""
+import os
+import re
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+# Rough BPE count: words and punctuation marks (no tokenizer download needed)
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+summary_template = """
+Summarize this conversation between a user and a medical assistant about COVID-19 research.
+Keep the topics, facts and open questions a follow-up question could refer to, in at most
+{max_words} words. Start from the existing summary and add the new turns.
+
+Existing summary:
+{summary}
+
+New turns:
+{turns}
+
+Summary:
+"""
+
+
+def count_tokens(text: str) -> int:
+    return len(_TOKEN.findall(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """The longest prefix of `text` holding at most `max_tokens` tokens"""
+    if max_tokens <= 0:
+        return ""
+    matches = list(_TOKEN.finditer(text))
+    if len(matches) <= max_tokens:
+        return text
+    return text[:matches[max_tokens - 1].end()].rstrip() + " ..."
+
+
+def format_turns(turns) -> str:
+    return "\n".join(f"User: {question}\nAssistant: {answer}" for question, answer in turns)
+
+
+class ConversationMemory:
+    """Running summary plus the recent turns of one session"""
+
+    def __init__(self, recent_tokens: int, summary_tokens: int):
+        self.recent_tokens = recent_tokens
+        self.summary_tokens = summary_tokens
+        self.summary = ""
+        self.turns = deque()
+        self.turn_count = 0
+        self.compaction: Optional[Future] = None
+        self.lock = asyncio.Lock()
+
+    def _recent_size(self) -> int:
+        return sum(count_tokens(question) + count_tokens(answer) for question, answer in self.turns)
+
+    def history(self) -> str:
+        """The conversation so far, as it goes into the prompt ("" for a new session)"""
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of earlier turns: {self.summary}")
+        if self.turns:
+            parts.append(format_turns(self.turns))
+        return "\n".join(parts)
+
+    def last_question(self) -> Optional[str]:
+        return self.turns[-1][0] if self.turns else None
+
+    def add_turn(self, question: str, answer: str):
+        self.turns.append((question, answer))
+        self.turn_count += 1
+
+    def needs_compaction(self) -> bool:
+        return self._recent_size() > self.recent_tokens
+
+    def overflow(self) -> list:
+        """Remove and return the oldest turns beyond the recent-turn budget (always keeps the last turn)"""
+        folded = []
+        while len(self.turns) > 1 and self._recent_size() > self.recent_tokens:
+            folded.append(self.turns.popleft())
+        # A single oversized turn is kept, but clipped
+        if self.turns and self._recent_size() > self.recent_tokens:
+            question, answer = self.turns.pop()
+            budget = max(self.recent_tokens - count_tokens(question), self.recent_tokens // 2)
+            self.turns.append((truncate_tokens(question, self.recent_tokens // 2), truncate_tokens(answer, budget)))
+        return folded
+
+    def compact(self, summarize: Callable[[str], str]):
+        """Fold overflowing turns into the summary with `summarize(prompt)` (a blocking LLM call)"""
+        folded = self.overflow()
+        if not folded:
+            return
+        prompt = summary_template.format(
+            max_words=max(self.summary_tokens * 3 // 4, 1), summary=self.summary or "(none)", turns=format_turns(folded)
+        )
+        try:
+            summary = summarize(prompt).strip()
+        except Exception:
+            # Keep the gist without the LLM: the folded questions, appended to the old summary
+            summary = " ".join([self.summary] + [f"Asked: {question}" for question, _ in folded]).strip()
+        self.summary = truncate_tokens(summary, self.summary_tokens)
+
+    def stats(self) -> dict:
+        return {
+            "turns": self.turn_count,
+            "recent_turns": len(self.turns),
+            "recent_tokens": self._recent_size(),
+            "summary_tokens": count_tokens(self.summary),
+        }
+
+
+class ConversationStore:
+    """Sessions by id, least recently used evicted beyond `max_sessions`"""
+
+    def __init__(self, max_sessions: int = 1000, recent_tokens: int = 600, summary_tokens: int = 250):
+        self.max_sessions = max_sessions
+        self.recent_tokens = recent_tokens
+        self.summary_tokens = summary_tokens
+        self.evictions = 0
+        self._sessions: "OrderedDict[str, ConversationMemory]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> ConversationMemory:
+        """The session's memory, created if new; marks it most recently used"""
+        with self._lock:
+            memory = self._sessions.get(session_id)
+            if memory is None:
+                memory = self._sessions[session_id] = ConversationMemory(self.recent_tokens, self.summary_tokens)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._sessions.move_to_end(session_id)
+            return memory
+
+    def drop(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return session_id in self._sessions
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "evictions": self.evictions,
+                "recent_tokens": self.recent_tokens,
+                "summary_tokens": self.summary_tokens,
+            }
+
+
+_store: Optional[ConversationStore] = None
+_store_lock = threading.Lock()
+
+
+def get_conversation_store() -> ConversationStore:
+    """Shared store configured from CHAT_SESSIONS_MAX / CHAT_MEMORY_RECENT_TOKENS / _SUMMARY_TOKENS"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ConversationStore(
+                max_sessions=int(os.getenv("CHAT_SESSIONS_MAX", "1000")),
+                recent_tokens=int(os.getenv("CHAT_MEMORY_RECENT_TOKENS", "600")),
+                summary_tokens=int(os.getenv("CHAT_MEMORY_SUMMARY_TOKENS", "250")),
+            )
+        return _store
+
+
+def _reset_after_fork():
+    global _store, _store_lock
+    _store = None
+    _store_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
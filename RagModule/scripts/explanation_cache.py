@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Optional
+
+import pandas as pd
+
+CACHE_PATH = os.path.join(os.path.dirname(__file__), "../data/explanation_cache.sqlite")
+
+# Bump when the explanation prompt changes so stale explanations are not served
+PROMPT_VERSION = "1"
+
+# The categorical factors the explanation depends on; everything else (age, BMI, dates ...)
+# is left out of the signature so patients with the same risk profile share one explanation.
+PROFILE_FIELDS = [
+    "COVID_Strain",
+    "Vaccine_Type",
+    "Doses_Received",
+    "Preexisting_Condition",
+    "Severity",
+    "Smoking_Status",
+    "Hospitalized",
+]
+MISSING_VALUES = {"", "none", "nan", "null", "n/a"}
+
+
+def _bucket_doses(doses) -> str:
+    try:
+        doses = int(float(doses))
+    except (TypeError, ValueError):
+        return "0"
+    return "3+" if doses >= 3 else str(max(doses, 0))
+
+
+def _normalize_category(value) -> str:
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return "None"
+    value = str(value).strip()
+    return "None" if value.lower() in MISSING_VALUES else value
+
+
+def profile_signature(patient: dict, ml_prediction: Optional[str] = None) -> dict:
+    """Canonical, bucketed risk profile of one patient (plus the ML verdict when given)"""
+    profile = {
+        field: _bucket_doses(patient.get(field)) if field == "Doses_Received" else _normalize_category(patient.get(field))
+        for field in PROFILE_FIELDS
+    }
+    if ml_prediction is not None:
+        profile["ML_Prediction"] = _normalize_category(ml_prediction)
+    return profile
+
+
+def profile_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Vectorized profile_signature for a whole dataset (without the ML verdict)"""
+    profiles = pd.DataFrame(index=df.index)
+    for field in PROFILE_FIELDS:
+        if field == "Doses_Received":
+            doses = pd.to_numeric(df[field], errors="coerce").fillna(0).astype(int).clip(lower=0)
+            profiles[field] = doses.astype(str).where(doses < 3, "3+")
+        else:
+            values = df[field].astype("string").str.strip()
+            profiles[field] = values.where(~values.str.lower().isin(MISSING_VALUES), "None").fillna("None").astype(str)
+    return profiles
+
+
+def profile_key(profile: dict, provider: str) -> str:
+    payload = json.dumps(
+        {"profile": profile, "provider": provider, "prompt_version": PROMPT_VERSION},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ExplanationCache:
+    """SQLite-backed explanation store with TTL and least-recently-used eviction"""
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = 5000, ttl_seconds: Optional[float] = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS explanations (
+                   key TEXT PRIMARY KEY,
+                   profile TEXT NOT NULL,
+                   explanation TEXT NOT NULL,
+                   created_at REAL NOT NULL,
+                   last_used REAL NOT NULL,
+                   hits INTEGER NOT NULL DEFAULT 0
+               )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON explanations(last_used)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT explanation, created_at FROM explanations WHERE key = ?", (key,)
+            ).fetchone()
+            if row and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM explanations WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE explanations SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, profile: dict, explanation: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO explanations (key, profile, explanation, created_at, last_used, hits) "
+                "VALUES (?, ?, ?, ?, ?, 0)",
+                (key, json.dumps(profile, sort_keys=True), explanation, now, now),
+            )
+            # Evict least recently used entries beyond the size bound
+            self._conn.execute(
+                "DELETE FROM explanations WHERE key IN ("
+                "SELECT key FROM explanations ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM explanations WHERE key = ?", (key,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM explanations").fetchone()[0]
+
+    def stats(self) -> dict:
+        return {"entries": len(self), "hits": self.hits, "misses": self.misses, "max_entries": self.max_entries}
+
+
+_cache: Optional[ExplanationCache] = None
+_cache_lock = threading.Lock()
+
+
+def cache_enabled() -> bool:
+    return os.getenv("EXPLANATION_CACHE", "on").lower() not in ("0", "off", "false", "no")
+
+
+def get_explanation_cache() -> ExplanationCache:
+    """Shared cache configured from EXPLANATION_CACHE_PATH / _MAX_ENTRIES / _TTL_DAYS"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            ttl_days = os.getenv("EXPLANATION_CACHE_TTL_DAYS")
+            _cache = ExplanationCache(
+                path=os.getenv("EXPLANATION_CACHE_PATH", CACHE_PATH),
+                max_entries=int(os.getenv("EXPLANATION_CACHE_MAX_ENTRIES", "5000")),
+                ttl_seconds=float(ttl_days) * 86400 if ttl_days else None,
+            )
+        return _cache
+
+
+def _reset_after_fork():
+    # SQLite connections must not be carried across fork; each worker opens its own
+    global _cache, _cache_lock
+    _cache = None
+    _cache_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
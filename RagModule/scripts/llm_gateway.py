@@ -0,0 +1,287 @@
+import os
+import time
+import heapq
+import random
+import asyncio
+import inspect
+import functools
+import itertools
+import threading
+from typing import Awaitable, Callable, Dict, Optional
+
+from .llm_providers import ainvoke_llm, get_provider
+
+# Lower value = served first when callers are waiting for a free slot
+PRIORITY_PREDICTION = 0
+PRIORITY_CHAT = 10
+PRIORITY_BACKGROUND = 20
+
+# Provider errors worth retrying: rate limits, timeouts and transient server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = {"RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError"}
+
+
+class LLMGatewayError(RuntimeError):
+    """Base class for requests the gateway could not complete"""
+
+
+class CircuitOpenError(LLMGatewayError):
+    """The provider is failing; requests are rejected without calling it"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"LLM circuit breaker is open; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class GatewayOverloadedError(LLMGatewayError):
+    """No concurrency slot became free within the queue timeout"""
+
+
+class LLMRequestFailedError(LLMGatewayError):
+    """The provider call kept failing after all retry attempts"""
+
+
+def is_retryable_error(error: Exception) -> bool:
+    status_code = getattr(error, "status_code", None)
+    return (
+        status_code in RETRYABLE_STATUS_CODES
+        or type(error).__name__ in RETRYABLE_ERROR_NAMES
+        or isinstance(error, (TimeoutError, ConnectionError))
+    )
+
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive failures -> half-open single trial after a cool-down"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless the call may go to the provider"""
+        with self._lock:
+            if self.state == "closed":
+                return
+            remaining = self.opened_at + self.reset_timeout - self.clock()
+            if self.state == "open" and remaining <= 0:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return
+            raise CircuitOpenError(max(remaining, 0.0))
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial_running = False
+
+    def abort_call(self):
+        """The permitted call never reached the provider; let another caller run the trial"""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = self.clock()
+            self._trial_running = False
+
+
+class PrioritySlots:
+    """Bounded concurrency where waiting callers are admitted in (priority, arrival) order.
+
+    Used only from the gateway's event loop thread, so no locking is needed.
+    """
+
+    def __init__(self, limit: int):
+        self.available = limit
+        self._waiting = []
+        self._arrivals = itertools.count()
+
+    async def acquire(self, priority: int, timeout: Optional[float] = None) -> bool:
+        if self.available > 0 and not self.queued:
+            self.available -= 1
+            return True
+        granted = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (priority, next(self._arrivals), granted))
+        try:
+            await asyncio.wait_for(asyncio.shield(granted), timeout)
+            return True
+        except asyncio.TimeoutError:
+            if granted.done():
+                # The slot was handed over just as the timeout fired; pass it on
+                self.release()
+            else:
+                granted.cancel()
+            return False
+
+    def release(self):
+        # Hand the slot straight to the next live waiter, otherwise return it to the pool
+        while self._waiting:
+            _, _, granted = heapq.heappop(self._waiting)
+            if not granted.done():
+                granted.set_result(True)
+                return
+        self.available += 1
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, granted in self._waiting if not granted.done())
+
+
+class LLMGateway:
+    """Single entry point for LLM calls shared by /predict, /chat and offline jobs.
+
+    - at most `max_concurrency` provider calls in flight, queued by priority
+    - identical prompts already in flight are coalesced into one provider call
+    - retryable errors are retried with exponential backoff and jitter
+    - a circuit breaker fails fast while the provider keeps erroring
+
+    Provider calls run on the gateway's own event loop thread using the provider's native
+    async client. Async callers (`acall`, from any event loop) and sync callers (`call`, from
+    any thread) therefore share one limiter, one coalescing table and one breaker.
+    """
+
+    def __init__(self, invoke: Callable[[str], Awaitable[str]], max_concurrency: int = 8,
+                 queue_timeout: float = 30.0, max_attempts: int = 3, backoff_base: float = 0.5,
+                 backoff_max: float = 8.0, breaker: Optional[CircuitBreaker] = None, sleep=asyncio.sleep):
+        # Plain functions (e.g. custom blocking providers) are run in a worker thread
+        is_async = inspect.iscoroutinefunction(invoke) or inspect.iscoroutinefunction(getattr(invoke, "__call__", None))
+        self.invoke = invoke if is_async else functools.partial(asyncio.to_thread, invoke)
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.sleep = sleep
+        self.slots = PrioritySlots(max_concurrency)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        self._stats = {
+            "requests": 0, "provider_calls": 0, "coalesced": 0, "retries": 0, "failures": 0,
+            "circuit_rejections": 0, "queue_timeouts": 0, "in_flight": 0, "max_in_flight": 0,
+        }
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="llm-gateway", daemon=True).start()
+            return self._loop
+
+    def call(self, prompt: str, priority: int = PRIORITY_CHAT) -> str:
+        """Blocking call for threads and scripts (never from inside a running event loop)"""
+        return asyncio.run_coroutine_threadsafe(self._shared_call(prompt, priority), self._ensure_loop()).result()
+
+    async def acall(self, prompt: str, priority: int = PRIORITY_CHAT) -> str:
+        """Awaitable call usable from any event loop without blocking it"""
+        future = asyncio.run_coroutine_threadsafe(self._shared_call(prompt, priority), self._ensure_loop())
+        return await asyncio.wrap_future(future)
+
+    async def _shared_call(self, prompt: str, priority: int) -> str:
+        self._stats["requests"] += 1
+        task = self._inflight.get(prompt)
+        if task is None:
+            task = self._inflight[prompt] = asyncio.create_task(self._call_with_retries(prompt, priority))
+            task.add_done_callback(lambda _: self._inflight.pop(prompt, None))
+        else:
+            self._stats["coalesced"] += 1
+        # A cancelled caller must not cancel the provider call other callers are waiting on
+        return await asyncio.shield(task)
+
+    async def _call_with_retries(self, prompt: str, priority: int) -> str:
+        for attempt in range(self.max_attempts):
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                self._stats["circuit_rejections"] += 1
+                raise
+            if not await self.slots.acquire(priority, self.queue_timeout):
+                self.breaker.abort_call()
+                self._stats["queue_timeouts"] += 1
+                raise GatewayOverloadedError(f"No LLM slot free within {self.queue_timeout:.0f}s")
+
+            self._track_in_flight(+1)
+            try:
+                self._stats["provider_calls"] += 1
+                result = await self.invoke(prompt)
+            except Exception as e:
+                self._stats["failures"] += 1
+                if not is_retryable_error(e):
+                    # A rejected request (bad prompt, content filter) says nothing about the provider's
+                    # health, so it must not open the circuit for every other caller
+                    self.breaker.abort_call()
+                    raise LLMRequestFailedError(f"LLM request failed: {e}") from e
+                self.breaker.record_failure()
+                if attempt + 1 >= self.max_attempts:
+                    raise LLMRequestFailedError(f"LLM request failed: {e}") from e
+                delay = min(self.backoff_max, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.0)
+            else:
+                self.breaker.record_success()
+                return result
+            finally:
+                self._track_in_flight(-1)
+                self.slots.release()
+
+            self._stats["retries"] += 1
+            await self.sleep(delay)
+
+    def _track_in_flight(self, delta: int):
+        self._stats["in_flight"] += delta
+        self._stats["max_in_flight"] = max(self._stats["max_in_flight"], self._stats["in_flight"])
+
+    def stats(self) -> dict:
+        return {**self._stats, "queued": self.slots.queued, "circuit": self.breaker.state}
+
+
+_gateways: Dict[str, LLMGateway] = {}
+_gateways_lock = threading.Lock()
+
+
+def get_gateway(name: Optional[str] = None) -> LLMGateway:
+    """Return the shared gateway for the configured provider, sized from its settings"""
+    provider = get_provider(name)
+    with _gateways_lock:
+        if provider.name not in _gateways:
+            settings = provider.settings()
+            _gateways[provider.name] = LLMGateway(
+                invoke=functools.partial(ainvoke_llm, name=provider.name),
+                max_concurrency=settings.max_concurrency,
+                queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "30")),
+                max_attempts=settings.max_retries + 1,
+                backoff_base=float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5")),
+                backoff_max=float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "8")),
+                breaker=CircuitBreaker(
+                    failure_threshold=int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5")),
+                    reset_timeout=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30")),
+                ),
+            )
+        return _gateways[provider.name]
+
+
+def reset_gateways():
+    """Drop shared gateways (and their breaker state) so settings are re-read"""
+    with _gateways_lock:
+        _gateways.clear()
+
+
+def _reset_after_fork():
+    # A forked worker inherits gateways whose event loop thread does not exist in the child
+    global _gateways_lock
+    _gateways_lock = threading.Lock()
+    _gateways.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,233 @@
+import os
+import time
+import asyncio
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# Selects which backend answers every generation path of the RAG pipeline:
+#   azure - Azure OpenAI deployment (AZURE_* variables)
+#   local - any OpenAI-compatible HTTP server (vLLM, llama.cpp, Ollama, LM Studio ...)
+#   fake  - deterministic offline backend for tests, load tests and benchmarks
+DEFAULT_PROVIDER = "azure"
+
+
+class LLMUnavailableError(RuntimeError):
+    """Raised when the configured LLM provider cannot serve requests"""
+
+
+@dataclass(frozen=True)
+class ProviderSettings:
+    """Client tuning for one provider (pool size, timeout, retries, concurrency)"""
+    timeout: float
+    max_retries: int
+    max_connections: int
+    max_keepalive_connections: int
+    max_concurrency: int
+
+    @classmethod
+    def from_env(cls, prefix: str) -> "ProviderSettings":
+        """Read `<PREFIX>_LLM_<SETTING>`, falling back to `LLM_<SETTING>` and then the default"""
+        def setting(name, default, cast):
+            value = os.getenv(f"{prefix}_LLM_{name}") or os.getenv(f"LLM_{name}")
+            return cast(value) if value else default
+
+        return cls(
+            timeout=setting("TIMEOUT", 30.0, float),
+            max_retries=setting("MAX_RETRIES", 2, int),
+            max_connections=setting("MAX_CONNECTIONS", 20, int),
+            max_keepalive_connections=setting("MAX_KEEPALIVE_CONNECTIONS", 10, int),
+            max_concurrency=setting("MAX_CONCURRENCY", 8, int),
+        )
+
+    def http_limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+        )
+
+
+def fake_response(prompt: str) -> str:
+    """Deterministic answer derived from the prompt text, shaped like the real explanations"""
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    risk_level = ("Low", "Moderate", "High")[int(digest[:8], 16) % 3]
+    return (
+        f"Based on the research, the risk level is **{risk_level}**.\n\n"
+        f"According to the evidence, this is a deterministic offline response "
+        f"(fake LLM, prompt {digest[:12]})."
+    )
+
+
+class FakeChatModel(BaseChatModel):
+    """Offline chat model: no network, same prompt -> same answer, optional simulated latency"""
+    latency: float = 0.0
+    responder: Optional[Callable[[str], str]] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _respond(self, messages: List[BaseMessage]) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        text = (self.responder or fake_response)(prompt)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._respond(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._respond(messages)
+
+
+class LLMProvider:
+    """Base class: knows its required environment and how to build a LangChain chat model"""
+    name = ""
+    env_prefix = ""
+    required_env: tuple = ()
+
+    def settings(self) -> ProviderSettings:
+        return ProviderSettings.from_env(self.env_prefix)
+
+    def check_available(self):
+        missing = [var for var in self.required_env if not os.getenv(var)]
+        if missing:
+            raise LLMUnavailableError(
+                f"LLM provider '{self.name}' is missing environment variables: {', '.join(missing)}"
+            )
+
+    def build(self, settings: ProviderSettings) -> BaseChatModel:
+        raise NotImplementedError
+
+
+class AzureProvider(LLMProvider):
+    name = "azure"
+    env_prefix = "AZURE"
+    required_env = ("AZURE_API_KEY", "AZURE_API_VERSION", "AZURE_ENDPOINT", "DEPLOYMENT_NAME")
+
+    def build(self, settings):
+        from langchain_openai import AzureChatOpenAI
+
+        return AzureChatOpenAI(
+            azure_deployment=os.getenv("DEPLOYMENT_NAME"),
+            api_key=os.getenv("AZURE_API_KEY"),
+            azure_endpoint=os.getenv("AZURE_ENDPOINT"),
+            api_version=os.getenv("AZURE_API_VERSION"),
+            temperature=0,
+            timeout=settings.timeout,
+            # Retries with backoff are owned by llm_gateway so they are not stacked here
+            max_retries=0,
+            http_client=httpx.Client(limits=settings.http_limits(), timeout=settings.timeout),
+            http_async_client=httpx.AsyncClient(limits=settings.http_limits(), timeout=settings.timeout),
+        )
+
+
+class LocalProvider(LLMProvider):
+    name = "local"
+    env_prefix = "LOCAL"
+    required_env = ("LOCAL_LLM_BASE_URL",)
+
+    def build(self, settings):
+        from langchain_openai import ChatOpenAI
+
+        return ChatOpenAI(
+            model=os.getenv("LOCAL_LLM_MODEL", "local-model"),
+            base_url=os.getenv("LOCAL_LLM_BASE_URL"),
+            # Most local servers ignore the key, but the OpenAI client insists on one
+            api_key=os.getenv("LOCAL_LLM_API_KEY", "not-needed"),
+            temperature=0,
+            timeout=settings.timeout,
+            # Retries with backoff are owned by llm_gateway so they are not stacked here
+            max_retries=0,
+            http_client=httpx.Client(limits=settings.http_limits(), timeout=settings.timeout),
+            http_async_client=httpx.AsyncClient(limits=settings.http_limits(), timeout=settings.timeout),
+        )
+
+
+class FakeProvider(LLMProvider):
+    name = "fake"
+    env_prefix = "FAKE"
+
+    def build(self, settings):
+        return FakeChatModel(latency=float(os.getenv("FAKE_LLM_LATENCY_MS", "0")) / 1000)
+
+
+PROVIDERS: Dict[str, LLMProvider] = {
+    provider.name: provider for provider in (AzureProvider(), LocalProvider(), FakeProvider())
+}
+
+_models: Dict[str, BaseChatModel] = {}
+_lock = threading.Lock()
+
+
+def register_provider(provider: LLMProvider):
+    """Add (or replace) a provider so it can be selected through LLM_PROVIDER"""
+    PROVIDERS[provider.name] = provider
+    reset_llm_cache()
+
+
+def reset_llm_cache():
+    """Forget built clients so the next request picks up changed settings"""
+    with _lock:
+        _models.clear()
+
+
+def _reset_after_fork():
+    # HTTP connection pools must not be shared between forked workers
+    global _lock
+    _lock = threading.Lock()
+    _models.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_provider(name: Optional[str] = None) -> LLMProvider:
+    name = (name or os.getenv("LLM_PROVIDER") or DEFAULT_PROVIDER).lower()
+    if name not in PROVIDERS:
+        raise LLMUnavailableError(
+            f"Unknown LLM provider '{name}'. Choose one of: {', '.join(sorted(PROVIDERS))}"
+        )
+    return PROVIDERS[name]
+
+
+def check_llm_available(name: Optional[str] = None) -> LLMProvider:
+    """Per-request capability check; raises LLMUnavailableError instead of failing at import"""
+    provider = get_provider(name)
+    provider.check_available()
+    return provider
+
+
+def get_llm(name: Optional[str] = None) -> BaseChatModel:
+    """Return the (cached) chat model for the configured provider"""
+    provider = check_llm_available(name)
+    with _lock:
+        if provider.name not in _models:
+            _models[provider.name] = provider.build(provider.settings())
+        return _models[provider.name]
+
+
+def invoke_llm(prompt: str, name: Optional[str] = None) -> str:
+    """Send one prompt to the provider and return the text of the answer.
+
+    This is a single raw attempt; request paths go through llm_gateway, which adds
+    the concurrency limit, retries with backoff and the circuit breaker.
+    """
+    response = get_llm(name).invoke(prompt)
+    return response.content if hasattr(response, "content") else str(response)
+
+
+async def ainvoke_llm(prompt: str, name: Optional[str] = None) -> str:
+    """Async counterpart of invoke_llm using the provider's native async client"""
+    response = await get_llm(name).ainvoke(prompt)
+    return response.content if hasattr(response, "content") else str(response)
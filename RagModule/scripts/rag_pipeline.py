@@ -1,47 +1,90 @@
 import os
 import json
+import asyncio
+import functools
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
-from langchain_community.vectorstores import FAISS
 from langchain_huggingface import HuggingFaceEmbeddings
-from openai import AzureOpenAI
-from langchain_openai import AzureChatOpenAI
-from langchain.chains import RetrievalQA
+from langchain_core.embeddings import Embeddings
 from langchain.prompts import PromptTemplate
+from .llm_providers import LLMUnavailableError, check_llm_available, get_provider
+from .llm_gateway import LLMGatewayError, PRIORITY_BACKGROUND, PRIORITY_CHAT, PRIORITY_PREDICTION, get_gateway
+from .chunk_store import EMBEDDING_MODEL, load_vectorstore
+from .conversation_memory import count_tokens, get_conversation_store
+from .explanation_cache import cache_enabled, get_explanation_cache, profile_key, profile_signature
+
+try:
+    import fcntl
+except ImportError:  # Windows: no multi-process serving mode there
+    fcntl = None
 
 load_dotenv()
 
 LOG_PATH = os.path.join(os.path.dirname(__file__), "../data/qna_history.json")
 INDEX_PATH = os.path.join(os.path.dirname(__file__), "../vectorstore/faiss_pubmed")
 
-# Validate required environment variables
-REQUIRED_ENV_VARS = [
-    "AZURE_API_KEY",
-    "AZURE_API_VERSION",
-    "AZURE_ENDPOINT",
-    "DEPLOYMENT_NAME"
-]
-missing_vars = [var for var in REQUIRED_ENV_VARS if not os.getenv(var)]
-if missing_vars:
-    raise EnvironmentError(f"Missing required environment variables: {', '.join(missing_vars)}")
-
-# Validate vectorstore exists
-if not os.path.exists(INDEX_PATH):
-    raise FileNotFoundError(f"Vector index not found at {INDEX_PATH}. Please generate it first.")
-
-# Initialize Azure LLM
-llm = AzureChatOpenAI(
-    azure_deployment=os.getenv("DEPLOYMENT_NAME"),
-    api_key=os.getenv("AZURE_API_KEY"),
-    azure_endpoint=os.getenv("AZURE_ENDPOINT"),
-    api_version=os.getenv("AZURE_API_VERSION"),
-    temperature=0,
+# The LLM provider (LLM_PROVIDER, see llm_providers.py) and the vector store are resolved
+# lazily on the first request, so importing this module never needs credentials or the index.
+_embeddings = None
+_embeddings_lock = threading.Lock()
+_vectorstore = None
+_vectorstore_lock = threading.Lock()
+_retriever = None
+_retriever_lock = threading.Lock()
+_log_lock = threading.Lock()
+
+# Retrieval (query embedding + FAISS search) blocks; the async paths run it on a dedicated pool
+# so it never stalls the event loop or competes with the server's default threadpool.
+RETRIEVAL_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv("RAG_RETRIEVAL_WORKERS", "4")),
+    thread_name_prefix="rag-retrieval",
 )
 
-# Initialize Vector Store
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-vectorstore = FAISS.load_local(INDEX_PATH, embeddings, allow_dangerous_deserialization=True)
-retriever = vectorstore.as_retriever(search_kwargs={"k": 3}) # Limit to top 3 results
+# Folds old chat turns into each session's running summary (see conversation_memory.py)
+MEMORY_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="chat-memory")
+
+def get_embeddings() -> HuggingFaceEmbeddings:
+    """Load the MiniLM sentence encoder on first use (this is what imports torch)"""
+    global _embeddings
+    if _embeddings is None:
+        with _embeddings_lock:
+            if _embeddings is None:
+                _embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    return _embeddings
+
+class _SharedEmbeddings(Embeddings):
+    """Resolves get_embeddings() at the first query, so the index loads without waiting for the encoder"""
+
+    def embed_documents(self, texts):
+        return get_embeddings().embed_documents(texts)
+
+    def embed_query(self, text):
+        return get_embeddings().embed_query(text)
+
+def get_vectorstore():
+    """Load the FAISS index on first use"""
+    global _vectorstore
+    if _vectorstore is None:
+        with _vectorstore_lock:
+            if _vectorstore is None:
+                # Validate vectorstore exists
+                if not os.path.exists(INDEX_PATH):
+                    raise FileNotFoundError(f"Vector index not found at {INDEX_PATH}. Please generate it first.")
+                _vectorstore = load_vectorstore(INDEX_PATH, _SharedEmbeddings())
+    return _vectorstore
+
+def get_retriever():
+    """Top-3 retriever over the FAISS index, loading the index and the encoder on first use"""
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                get_embeddings()
+                _retriever = get_vectorstore().as_retriever(search_kwargs={"k": 3}) # Limit to top 3 results
+    return _retriever
 
 # Define Prompt Template
 template = """
@@ -69,12 +112,75 @@ Question:
 """
 prompt = PromptTemplate(template=template, input_variables=["context", "question"])
 
-# Initialize QA Chain
-qa_chain = RetrievalQA.from_chain_type(
-    llm,
-    retriever=retriever,
-    chain_type_kwargs={"prompt": prompt}
-)
+chat_template = """
+You are a medical assistant answering questions about COVID-19 using scientific research evidence.
+
+Answer the user's question based ONLY on the scientific evidence provided below.
+Be concise and accurate in your response.
+If the evidence doesn't contain information to answer the question, admit that you don't know.
+
+Scientific evidence:
+{context}
+
+Question:
+{question}
+"""
+chat_prompt = PromptTemplate(template=chat_template, input_variables=["context", "question"])
+
+conversation_template = """
+You are a medical assistant answering questions about COVID-19 using scientific research evidence.
+
+Answer the user's latest question based ONLY on the scientific evidence provided below.
+Use the conversation so far only to work out what the question refers to.
+Be concise and accurate in your response.
+If the evidence doesn't contain information to answer the question, admit that you don't know.
+
+Conversation so far:
+{history}
+
+Scientific evidence:
+{context}
+
+Question:
+{question}
+"""
+conversation_prompt = PromptTemplate(template=conversation_template, input_variables=["history", "context", "question"])
+
+def retrieve_context(query: str) -> str:
+    """Retrieve the top documents for a query and join them into one evidence block"""
+    docs = get_retriever().invoke(query)
+    return "\n\n".join(doc.page_content for doc in docs)
+
+async def aretrieve_context(query: str) -> str:
+    """retrieve_context on the retrieval pool, awaitable from the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(RETRIEVAL_EXECUTOR, retrieve_context, query)
+
+def answer_with_evidence(prompt_template: PromptTemplate, question: str, priority: int = PRIORITY_CHAT) -> str:
+    """Stuff the retrieved evidence into the prompt and ask the LLM through the shared gateway"""
+    check_llm_available()
+    context = retrieve_context(question)
+    return get_gateway().call(prompt_template.format(context=context, question=question), priority)
+
+async def aanswer_with_evidence(prompt_template: PromptTemplate, question: str, priority: int = PRIORITY_CHAT) -> str:
+    """Async answer_with_evidence: pooled retrieval, native async LLM call"""
+    check_llm_available()
+    context = await aretrieve_context(question)
+    return await get_gateway().acall(prompt_template.format(context=context, question=question), priority)
+
+@contextmanager
+def _log_file_lock():
+    """Exclusive lock on the log across processes (gunicorn workers share the file)"""
+    os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
+    if fcntl is None:
+        yield
+        return
+    with open(LOG_PATH + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
 
 def log_qna(question: str, answer: str):
     """Log Q&A to JSON file"""
@@ -83,16 +189,17 @@ def log_qna(question: str, answer: str):
         "question": question,
         "answer": answer
     }
-    if os.path.exists(LOG_PATH):
-        with open(LOG_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    else:
-        data = []
-        os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
-    
-    data.append(record)
-    with open(LOG_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    # Requests run concurrently; serialize the read-modify-write of the log file
+    with _log_lock, _log_file_lock():
+        if os.path.exists(LOG_PATH):
+            with open(LOG_PATH, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        else:
+            data = []
+
+        data.append(record)
+        with open(LOG_PATH, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
 
 def build_query(patient: dict) -> str:
     """Convert ALL relevant patient data into a detailed query"""
@@ -129,7 +236,7 @@ def generate_explanation(patient: dict) -> str:
     """Generate explanation using RAG system only"""
     query = build_query(patient)
     try:
-        response = qa_chain.invoke(query)["result"]
+        response = answer_with_evidence(prompt, query, PRIORITY_PREDICTION)
         formatted_response = f"[ RAG Medical Literature ]\n{response}"
         log_qna(query, formatted_response)
         return formatted_response
@@ -140,73 +247,65 @@ def generate_explanation(patient: dict) -> str:
 
 # Function to generate chat response using RAG system secondary to the main function & second page in COVID_Chatbot.py (streamlit app)
 def generate_chat_response(question: str) -> str:
-    if not hasattr(generate_chat_response, "qa_chain"):
-        embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-        vectorstore = FAISS.load_local(INDEX_PATH, embeddings, allow_dangerous_deserialization=True)
-        
-        llm = AzureChatOpenAI(
-            azure_deployment=os.getenv("DEPLOYMENT_NAME"),
-            api_key=os.getenv("AZURE_API_KEY"),
-            azure_endpoint=os.getenv("AZURE_ENDPOINT"),
-            api_version=os.getenv("AZURE_API_VERSION"),
-            temperature=0
-        )
-        
-        prompt_template = """
-        You are a medical assistant answering questions about COVID-19 using scientific research evidence.
-        
-        Answer the user's question based ONLY on the scientific evidence provided below.
-        Be concise and accurate in your response.
-        If the evidence doesn't contain information to answer the question, admit that you don't know.
-        
-        Scientific evidence:
-        {context}
-        
-        Question:
-        {question}
-        """
-        
-        prompt = PromptTemplate(
-            template=prompt_template,
-            input_variables=["context", "question"]
-        )
-        
-        generate_chat_response.qa_chain = RetrievalQA.from_chain_type(
-            llm,
-            retriever=vectorstore.as_retriever(search_kwargs={"k": 3}),
-            chain_type_kwargs={"prompt": prompt}
-        )
-    
+    """Answer a research question; LLM outages are raised so the API can return 503"""
     try:
-        result = generate_chat_response.qa_chain.invoke(question)["result"]
+        result = answer_with_evidence(chat_prompt, question)
         log_qna(question, result)
         return result
+    except (LLMGatewayError, LLMUnavailableError):
+        raise
     except Exception as e:
         return f"Error generating response: {str(e)}"
-    
-def generate_ml_aware_response(patient: dict, ml_prediction: str = None) -> str:
-    """Generate explanation combining ML prediction and RAG evidence"""
-    query_text = build_query(patient)
-    
-    # Provide a default value if ml_prediction is None
-    if ml_prediction is None:
-        ml_prediction = "Unknown"
-    
+
+async def agenerate_chat_response(question: str) -> str:
+    """Async generate_chat_response used by the /chat endpoint"""
     try:
-        # Directly retrieve relevant documents
-        docs = retriever.invoke(query_text)
-        
-        # Combine document content into context
-        context_text = "\n\n".join([doc.page_content for doc in docs])
-        
-        # Create the complete prompt as a string with all variables directly included
-        ml_aware_prompt = f"""
+        result = await aanswer_with_evidence(chat_prompt, question)
+        await asyncio.to_thread(log_qna, question, result)
+        return result
+    except (LLMGatewayError, LLMUnavailableError):
+        raise
+    except Exception as e:
+        return f"Error generating response: {str(e)}"
+
+async def agenerate_conversation_response(question: str, session_id: str) -> tuple:
+    """/chat within a session: (answer, memory stats) with the session's bounded history in the prompt"""
+    memory = get_conversation_store().get(session_id)
+    async with memory.lock:
+        if memory.compaction is not None and not memory.compaction.done():
+            await asyncio.wrap_future(memory.compaction)
+        try:
+            check_llm_available()
+            # Follow-ups ("and after a booster?") are retrieved together with the previous question
+            previous = memory.last_question()
+            context = await aretrieve_context(f"{previous}\n{question}" if previous else question)
+            history = memory.history()
+            if history:
+                prompt_text = conversation_prompt.format(history=history, context=context, question=question)
+            else:
+                prompt_text = chat_prompt.format(context=context, question=question)
+            result = await get_gateway().acall(prompt_text, PRIORITY_CHAT)
+        except (LLMGatewayError, LLMUnavailableError):
+            raise
+        except Exception as e:
+            return f"Error generating response: {str(e)}", memory.stats()
+
+        memory.add_turn(question, result)
+        # Read before the compaction starts: it pops turns and rewrites the summary on another thread
+        stats = {**memory.stats(), "prompt_tokens": count_tokens(prompt_text)}
+        if memory.needs_compaction():
+            summarize = functools.partial(get_gateway().call, priority=PRIORITY_BACKGROUND)
+            memory.compaction = MEMORY_EXECUTOR.submit(memory.compact, summarize)
+    await asyncio.to_thread(log_qna, question, result)
+    return result, stats
+
+ml_aware_template = """
 You are a medical assistant explaining COVID-19 reinfection risk using research evidence.
 The ML model has predicted: {ml_prediction} risk for this patient.
 
 Patient details:
 {query_text}
-- Age, Gender, Vaccine Type, Doses Received, Preexisting Condition, COVID Strain, Symptoms, Severity, Hospitalization Status, ICU Admission, Ventilator Support, BMI, Smoking Status, last infection date and last dose date are included in the question
+- {details_note}
 - Use the patient's profile to tailor the explanation
 
 Scientific evidence:
@@ -223,21 +322,121 @@ Based on the research, the risk level is **[Risk Level]**.
 ML Prediction: {ml_prediction} risk.
 According to the evidence, [explanation with patient-specific factors].
 """
-        
-        # Call the LLM directly without using RetrievalQA
-        response = llm.invoke(ml_aware_prompt)
-        
-        # Format the response
-        if hasattr(response, 'content'):
-            result = response.content
-        else:
-            result = str(response)
-            
-        formatted_response = f"[ Integrated Analysis ]\n{result}"
+PATIENT_DETAILS_NOTE = "Age, Gender, Vaccine Type, Doses Received, Preexisting Condition, COVID Strain, Symptoms, Severity, Hospitalization Status, ICU Admission, Ventilator Support, BMI, Smoking Status, last infection date and last dose date are included in the question"
+PROFILE_DETAILS_NOTE = "Vaccine Type, Doses Received, Preexisting Condition, COVID Strain, Severity, Hospitalization Status and Smoking Status are included in the question"
+
+def build_profile_query(profile: dict) -> str:
+    """Describe a bucketed risk profile (see explanation_cache.profile_signature) as a query"""
+    return (
+        f"COVID-19 reinfection risk assessment considering:\n"
+        f"1. Vaccine: {profile['Vaccine_Type']} ({profile['Doses_Received']} doses), "
+        f"Conditions: {profile['Preexisting_Condition']}, "
+        f"Strain: {profile['COVID_Strain']}, "
+        f"Severity: {profile['Severity']}\n"
+        f"2. Hospitalized: {profile['Hospitalized']}, "
+        f"Smoking: {profile['Smoking_Status']}"
+    )
+
+def _ml_aware_prompt(query_text: str, ml_prediction: str, details_note: str, context_text: str) -> str:
+    return ml_aware_template.format(
+        ml_prediction=ml_prediction,
+        query_text=query_text,
+        details_note=details_note,
+        context_text=context_text,
+    )
+
+def _ml_aware_explanation(query_text: str, ml_prediction: str, details_note: str, priority: int) -> str:
+    """Retrieve evidence for the query and ask the LLM for the integrated explanation"""
+    check_llm_available()
+
+    # Directly retrieve relevant documents and combine their content into context
+    context_text = retrieve_context(query_text)
+    # Call the LLM through the shared gateway; predictions are queued ahead of chat
+    result = get_gateway().call(_ml_aware_prompt(query_text, ml_prediction, details_note, context_text), priority)
+    return f"[ Integrated Analysis ]\n{result}"
+
+async def _aml_aware_explanation(query_text: str, ml_prediction: str, details_note: str, priority: int) -> str:
+    check_llm_available()
+    context_text = await aretrieve_context(query_text)
+    result = await get_gateway().acall(_ml_aware_prompt(query_text, ml_prediction, details_note, context_text), priority)
+    return f"[ Integrated Analysis ]\n{result}"
+
+def generate_profile_explanation(profile: dict, priority: int = PRIORITY_PREDICTION) -> str:
+    """Explanation for a risk profile (including ML_Prediction), cached for every matching patient"""
+    key = profile_key(profile, get_provider().name)
+    cache = get_explanation_cache()
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    query_text = build_profile_query(profile)
+    formatted_response = _ml_aware_explanation(query_text, profile["ML_Prediction"], PROFILE_DETAILS_NOTE, priority)
+    log_qna(f"ML: {profile['ML_Prediction']} - {query_text}", formatted_response)
+    cache.put(key, profile, formatted_response)
+    return formatted_response
+
+async def agenerate_profile_explanation(profile: dict, priority: int = PRIORITY_PREDICTION) -> str:
+    """Async generate_profile_explanation; SQLite and log file I/O run off the event loop"""
+    key = profile_key(profile, get_provider().name)
+    cache = get_explanation_cache()
+    cached = await asyncio.to_thread(cache.get, key)
+    if cached is not None:
+        return cached
+
+    query_text = build_profile_query(profile)
+    formatted_response = await _aml_aware_explanation(query_text, profile["ML_Prediction"], PROFILE_DETAILS_NOTE, priority)
+    await asyncio.to_thread(log_qna, f"ML: {profile['ML_Prediction']} - {query_text}", formatted_response)
+    await asyncio.to_thread(cache.put, key, profile, formatted_response)
+    return formatted_response
+
+def generate_ml_aware_response(patient: dict, ml_prediction: str = None) -> str:
+    """Generate explanation combining ML prediction and RAG evidence.
+
+    With the explanation cache on (EXPLANATION_CACHE, default on) the explanation is built
+    for the patient's risk profile, so repeat profiles skip retrieval and the LLM entirely.
+
+    LLMGatewayError / LLMUnavailableError propagate so the caller can fall back to
+    a prediction-only response instead of returning the error text as an explanation.
+    """
+    # Provide a default value if ml_prediction is None
+    if ml_prediction is None:
+        ml_prediction = "Unknown"
+
+    query_text = build_query(patient)
+    try:
+        if cache_enabled():
+            return generate_profile_explanation(profile_signature(patient, ml_prediction))
+
+        formatted_response = _ml_aware_explanation(query_text, ml_prediction, PATIENT_DETAILS_NOTE, PRIORITY_PREDICTION)
         log_qna(f"ML: {ml_prediction} - {query_text}", formatted_response)
         return formatted_response
-        
+
+    except (LLMGatewayError, LLMUnavailableError) as e:
+        log_qna(query_text, f"LLM unavailable: {str(e)}")
+        raise
     except Exception as e:
         error_msg = f"Integration error: {str(e)}"
         log_qna(query_text, error_msg)
-        return f"[ Integrated Analysis ]\n{error_msg}"
\ No newline at end of file
+        return f"[ Integrated Analysis ]\n{error_msg}"
+
+async def agenerate_ml_aware_response(patient: dict, ml_prediction: str = None) -> str:
+    """Async generate_ml_aware_response used by the /predict endpoint"""
+    if ml_prediction is None:
+        ml_prediction = "Unknown"
+
+    query_text = build_query(patient)
+    try:
+        if cache_enabled():
+            return await agenerate_profile_explanation(profile_signature(patient, ml_prediction))
+
+        formatted_response = await _aml_aware_explanation(query_text, ml_prediction, PATIENT_DETAILS_NOTE, PRIORITY_PREDICTION)
+        await asyncio.to_thread(log_qna, f"ML: {ml_prediction} - {query_text}", formatted_response)
+        return formatted_response
+
+    except (LLMGatewayError, LLMUnavailableError) as e:
+        await asyncio.to_thread(log_qna, query_text, f"LLM unavailable: {str(e)}")
+        raise
+    except Exception as e:
+        error_msg = f"Integration error: {str(e)}"
+        await asyncio.to_thread(log_qna, query_text, error_msg)
+        return f"[ Integrated Analysis ]\n{error_msg}"
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+import pandas as pd
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from scripts.chunk_store import load_chunk_store
+from scripts.build_vectorstore import CHUNK_OVERLAP, CHUNK_SIZE, DATA_PATH, build_index, tune_batch_size
+from scripts.embedding_cache import EmbeddingCache
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    calls: list = []
+
+    def embed_documents(self, texts):
+        self.calls.append(len(texts))
+        return super().embed_documents(texts)
+
+
+def sample_abstracts(tmp_path, rows=60):
+    path = tmp_path / "abstracts.csv"
+    pd.read_csv(DATA_PATH).head(rows).to_csv(path, index=False)
+    return path
+
+
+def stored(vectorstore):
+    vectors = vectorstore.index.reconstruct_n(0, vectorstore.index.ntotal)
+    documents = [vectorstore.docstore.search(vectorstore.index_to_docstore_id[i]) for i in range(len(vectors))]
+    return vectors, [(d.page_content, d.metadata) for d in documents]
+
+
+def test_parallel_build_matches_a_sequential_from_documents_build(tmp_path):
+    path = sample_abstracts(tmp_path)
+    embeddings = DeterministicFakeEmbedding(size=32)
+    parallel, stats = build_index(str(path), None, embeddings, "fake", workers=2, batch_size=16)
+
+    df = pd.read_csv(path)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    chunks = splitter.split_documents(
+        [Document(page_content=row["text"], metadata={"pmid": row["pmid"]}) for _, row in df.iterrows()]
+    )
+    sequential = FAISS.from_documents(chunks, embeddings)
+
+    vectors, documents = stored(parallel)
+    expected_vectors, expected_documents = stored(sequential)
+    assert stats["chunks"] == len(chunks) == parallel.index.ntotal
+    assert documents == expected_documents
+    assert np.array_equal(vectors, expected_vectors)
+
+
+def test_rebuild_only_embeds_changed_chunks(tmp_path):
+    path = sample_abstracts(tmp_path, rows=20)
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"))
+    embeddings = CountingEmbedding(size=32)
+    first, stats = build_index(str(path), str(tmp_path / "index"), embeddings, "fake", workers=1, batch_size=8, cache=cache)
+    assert max(embeddings.calls) <= 8 and stats["embedded"] == len(cache)
+
+    df = pd.read_csv(path)
+    df.loc[0, "text"] = "An abstract about reinfection after booster doses."
+    df.to_csv(path, index=False)
+    embeddings.calls.clear()
+    second, stats = build_index(str(path), None, embeddings, "fake", workers=1, batch_size=8, cache=cache)
+    assert stats["embedded"] == sum(embeddings.calls) == 1
+    assert second.index.ntotal == stats["chunks"]
+
+    reloaded = load_chunk_store(str(tmp_path / "index"), embeddings)
+    assert stored(reloaded)[1] == stored(first)[1]
+    cache.close()
+
+
+class FailingEmbedding(DeterministicFakeEmbedding):
+    """Crashes on its second batch, after the new store has chunks in it"""
+    batches: int = 0
+
+    def embed_documents(self, texts):
+        self.batches += 1
+        if self.batches > 1:
+            raise RuntimeError("encoder crashed")
+        return super().embed_documents(texts)
+
+
+def test_failed_rebuild_leaves_the_live_index_untouched(tmp_path):
+    path = sample_abstracts(tmp_path, rows=20)
+    live = tmp_path / "index"
+    first, _ = build_index(str(path), str(live), DeterministicFakeEmbedding(size=32), "fake", workers=1, batch_size=8)
+
+    with pytest.raises(RuntimeError, match="encoder crashed"):
+        build_index(str(path), str(live), FailingEmbedding(size=32), "fake", workers=1, batch_size=8)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["abstracts.csv", "index"]
+    assert stored(load_chunk_store(str(live), DeterministicFakeEmbedding(size=32)))[1] == stored(first)[1]
+
+
+class EncoderBatchEmbedding(DeterministicFakeEmbedding):
+    """Records the encoder batch size in effect for every call, like HuggingFaceEmbeddings' encode_kwargs"""
+
+    encode_kwargs: dict = {}
+    encoder_batch_sizes: list = []
+
+    def embed_documents(self, texts):
+        self.encoder_batch_sizes.append(self.encode_kwargs["batch_size"])
+        return super().embed_documents(texts)
+
+
+def test_tuning_sets_each_candidate_on_the_encoder(tmp_path):
+    embeddings = EncoderBatchEmbedding(size=32, encode_kwargs={"batch_size": 64}, encoder_batch_sizes=[])
+    best = tune_batch_size(embeddings, [f"chunk {i}" for i in range(128)], candidates=(8, 16, 32))
+    assert set(embeddings.encoder_batch_sizes) == {8, 16, 32}
+    assert embeddings.encode_kwargs["batch_size"] == best
+
+    # The build then encodes with the tuned size
+    embeddings.encoder_batch_sizes.clear()
+    _, stats = build_index(str(sample_abstracts(tmp_path, rows=20)), None, embeddings, "fake", workers=1, batch_size=None)
+    assert embeddings.encoder_batch_sizes[-1] == stats["batch_size"] == embeddings.encode_kwargs["batch_size"]
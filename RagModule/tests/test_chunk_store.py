@@ -0,0 +1,42 @@
+import sqlite3
+
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from scripts.chunk_store import PositionIds, SQLiteDocstore, load_chunk_store, load_vectorstore, save_chunk_store
+
+TEXTS = [f"Abstract {i} on reinfection after {i % 4} doses." for i in range(50)]
+EMBEDDINGS = DeterministicFakeEmbedding(size=16)
+
+
+def test_pickled_index_converts_to_identical_search_results(tmp_path):
+    legacy = FAISS.from_texts(TEXTS, EMBEDDINGS, metadatas=[{"pmid": i} for i in range(len(TEXTS))])
+    legacy.save_local(str(tmp_path))
+    save_chunk_store(FAISS.load_local(str(tmp_path), EMBEDDINGS, allow_dangerous_deserialization=True), str(tmp_path))
+    assert not (tmp_path / "index.pkl").exists()
+
+    store = load_vectorstore(str(tmp_path), EMBEDDINGS)
+    assert isinstance(store.docstore, SQLiteDocstore) and len(store.index_to_docstore_id) == len(TEXTS)
+    for query in TEXTS[:5] + ["booster doses"]:
+        expected = legacy.similarity_search_with_score(query, k=3)
+        found = store.similarity_search_with_score(query, k=3)
+        assert [(d.id, d.page_content, d.metadata, s) for d, s in found] == \
+               [(d.id, d.page_content, d.metadata, s) for d, s in expected]
+
+
+def test_pickled_index_still_loads_with_a_warning(tmp_path):
+    FAISS.from_texts(TEXTS, EMBEDDINGS).save_local(str(tmp_path))
+    with pytest.warns(UserWarning, match="chunk_store"):
+        store = load_vectorstore(str(tmp_path), EMBEDDINGS)
+    assert store.index.ntotal == len(TEXTS)
+
+
+def test_chunk_store_is_read_only_and_append_only(tmp_path):
+    save_chunk_store(FAISS.from_texts(TEXTS, EMBEDDINGS), str(tmp_path))
+    store = load_chunk_store(str(tmp_path), EMBEDDINGS, mmap=False)
+    assert store.docstore.search(len(TEXTS)) == f"ID {len(TEXTS)} not found."
+    with pytest.raises(sqlite3.OperationalError):
+        store.add_texts(["one more"])
+    with pytest.raises(ValueError):
+        PositionIds(3).update({5: "x"})
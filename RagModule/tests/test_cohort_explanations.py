@@ -0,0 +1,145 @@
+import re
+import json
+import asyncio
+import hashlib
+
+import pandas as pd
+from langchain_core.documents import Document
+
+from scripts import cohort_explanations, rag_pipeline, warm_explanation_cache
+from scripts.cohort_explanations import RateLimiter, explain_cohort, group_patients, load_cohort, parse_cohort_response
+from scripts.llm_gateway import reset_gateways
+from scripts import llm_providers
+from scripts.llm_providers import FakeChatModel, FakeProvider, reset_llm_cache
+
+
+class CountingRetriever:
+    def __init__(self):
+        self.queries = []
+
+    def invoke(self, query):
+        self.queries.append(query)
+        return [Document(page_content="Boosters lower reinfection risk.")]
+
+
+def cohort(tmp_path, rows=60):
+    path = tmp_path / "cohort.csv"
+    pd.read_csv(warm_explanation_cache.DATA_PATH, nrows=rows).to_csv(path, index=False)
+    return load_cohort(str(path), prediction_column="Reinfection")
+
+
+def test_patients_without_a_prediction_are_scored_with_the_model(tmp_path):
+    path = tmp_path / "cohort.csv"
+    df = pd.read_csv(warm_explanation_cache.DATA_PATH, nrows=40)
+    df.to_csv(path, index=False)
+    scored = load_cohort(str(path))
+    assert set(scored["ML_Prediction"]) <= {"Yes", "No"}
+
+    df["ML_Prediction"] = ["Yes"] * 20 + [None] * 20
+    df.to_csv(path, index=False)
+    partial = load_cohort(str(path))
+    assert (partial["ML_Prediction"][:20] == "Yes").all()
+    assert partial["ML_Prediction"][20:].tolist() == scored["ML_Prediction"][20:].tolist()
+
+
+PATIENT_SECTION = re.compile(r"^\[patient ([^\]]+)\]$", re.MULTILINE)
+
+
+def cohort_response(prompt):
+    """The JSON array the runner asks for, one deterministic entry per [patient <id>] section"""
+    return json.dumps([
+        {
+            "patient": patient,
+            "risk_level": ("Low", "Moderate", "High")[hashlib.sha256(f"{prompt}{patient}".encode()).digest()[0] % 3],
+            "explanation": f"According to the evidence, this is an offline response for patient {patient}.",
+        }
+        for patient in PATIENT_SECTION.findall(prompt)
+    ])
+
+
+class CohortFakeProvider(FakeProvider):
+    def build(self, settings):
+        return FakeChatModel(responder=cohort_response)
+
+
+def use_fake_llm(monkeypatch):
+    monkeypatch.setenv("LLM_PROVIDER", "fake")
+    monkeypatch.setitem(llm_providers.PROVIDERS, "fake", CohortFakeProvider())
+    retriever = CountingRetriever()
+    monkeypatch.setattr(rag_pipeline, "_retriever", retriever)
+    reset_llm_cache()
+    reset_gateways()
+    return retriever
+
+
+async def run(df, output, **options):
+    return await explain_cohort(df, str(output), **options)
+
+
+def test_groups_share_retrieval_and_runs_resume(monkeypatch, tmp_path):
+    retriever = use_fake_llm(monkeypatch)
+    df = cohort(tmp_path)
+    output = tmp_path / "explanations.jsonl"
+
+    summary = asyncio.run(run(df.head(40), output, patients_per_prompt=4))
+    assert summary["explained"] == 40 and summary["failed"] == 0
+    assert len(retriever.queries) == summary["groups"] < 40
+    assert summary["prompts"] == sum(len(batches) for _, batches in group_patients(df.head(40), 4))
+
+    # A second run over the full cohort only explains the 20 new patients
+    summary = asyncio.run(run(df, output, patients_per_prompt=4))
+    assert summary["already_done"] == 40 and summary["explained"] == 20
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(r["patient_id"] for r in records) == sorted(df["patient_id"])
+    assert {r["risk_level"] for r in records} <= {"Low", "Moderate", "High"}
+    assert all(r["ML_Prediction"] in ("Yes", "No") for r in records)
+
+
+def test_patients_missing_from_the_answer_are_retried_next_run(monkeypatch, tmp_path):
+    use_fake_llm(monkeypatch)
+    df = cohort(tmp_path, rows=12)
+    dropped = df["patient_id"].iloc[0]
+
+    class PartialGateway:
+        async def acall(self, prompt, priority):
+            answer = json.loads(cohort_response(prompt))
+            return "```json\n" + json.dumps([entry for entry in answer if entry["patient"] != dropped]) + "\n```"
+
+        def stats(self):
+            return {}
+
+    monkeypatch.setattr(cohort_explanations, "get_gateway", lambda: PartialGateway())
+    output = tmp_path / "explanations.jsonl"
+    summary = asyncio.run(run(df, output))
+    assert summary["explained"] == 11 and summary["failed"] == 1
+
+    monkeypatch.undo()
+    use_fake_llm(monkeypatch)
+    summary = asyncio.run(run(df, output))
+    assert summary["already_done"] == 11 and summary["explained"] == 1
+    assert dropped in {json.loads(line)["patient_id"] for line in output.read_text().splitlines()}
+
+
+def test_parse_keeps_only_well_formed_entries():
+    text = 'Here you go: [{"patient": "1", "risk_level": "high", "explanation": "Because."}, ' \
+           '{"patient": "2", "risk_level": "Severe", "explanation": "x"}, {"patient": "9", "risk_level": "Low", ' \
+           '"explanation": "y"}, {"patient": "3", "risk_level": "Low", "explanation": " "}]'
+    assert parse_cohort_response(text, ["1", "2", "3"]) == {"1": {"risk_level": "High", "explanation": "Because."}}
+    assert parse_cohort_response("no json here", ["1"]) == {}
+
+
+def test_rate_limiter_spaces_requests():
+    now, sleeps = [100.0], []
+
+    async def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    limiter = RateLimiter(120, clock=lambda: now[0], sleep=sleep)
+
+    async def acquire_four():
+        for _ in range(4):
+            await limiter.acquire()
+
+    asyncio.run(acquire_four())
+    assert sleeps == [0.5, 0.5, 0.5]
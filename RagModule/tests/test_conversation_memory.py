@@ -0,0 +1,141 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.documents import Document
+
+from scripts import conversation_memory, rag_pipeline
+from scripts.conversation_memory import ConversationMemory, ConversationStore, count_tokens
+from scripts.llm_gateway import reset_gateways
+from scripts.llm_providers import reset_llm_cache
+
+QUESTIONS = [
+    "How effective are vaccines against new variants?",
+    "And does that change after a booster dose?",
+    "What about people over 65?",
+    "How long does that protection last?",
+]
+
+
+class RecordingRetriever:
+    def __init__(self):
+        self.queries = []
+
+    def invoke(self, query):
+        self.queries.append(query)
+        return [Document(page_content="Boosters restored protection against Omicron for several months.")]
+
+
+def use_fake_llm(monkeypatch, tmp_path, store):
+    monkeypatch.setenv("LLM_PROVIDER", "fake")
+    monkeypatch.setattr(rag_pipeline, "LOG_PATH", str(tmp_path / "qna_history.json"))
+    monkeypatch.setattr(conversation_memory, "_store", store)
+    retriever = RecordingRetriever()
+    monkeypatch.setattr(rag_pipeline, "_retriever", retriever)
+    reset_llm_cache()
+    reset_gateways()
+    return retriever
+
+
+def converse(session_id, turns):
+    async def run():
+        stats = []
+        for i in range(turns):
+            _, memory = await rag_pipeline.agenerate_conversation_response(QUESTIONS[i % len(QUESTIONS)], session_id)
+            stats.append(memory)
+        return stats
+
+    return asyncio.run(run())
+
+
+def test_prompt_tokens_stay_flat_as_the_conversation_grows(monkeypatch, tmp_path):
+    store = ConversationStore(recent_tokens=150, summary_tokens=60)
+    use_fake_llm(monkeypatch, tmp_path, store)
+    stats = converse("long", 60)
+
+    prompt_tokens = [turn["prompt_tokens"] for turn in stats]
+    assert prompt_tokens[1] > prompt_tokens[0]  # the history is in the prompt from the second turn
+    assert max(prompt_tokens[30:]) <= max(prompt_tokens[:15])
+    memory = store.get("long")
+    memory.compaction.result()
+    assert memory.turn_count == 60 and len(memory.turns) < 60
+    assert 0 < count_tokens(memory.summary) <= 60
+
+
+class HeldCompaction:
+    """Runs compactions on a thread and holds them inside the summary call until released"""
+
+    def __init__(self):
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        self.summarizing = threading.Event()
+        self.release = threading.Event()
+        self.submitted = 0
+
+    def submit(self, compact, summarize):
+        def held(prompt):
+            self.summarizing.set()
+            self.release.wait(10)
+            return summarize(prompt)
+
+        self.submitted += 1
+        future = self.pool.submit(compact, held)
+        # The oldest turns are already popped when the summary call starts
+        self.summarizing.wait(10)
+        return future
+
+
+def test_stats_are_read_before_compaction_runs(monkeypatch, tmp_path):
+    store = ConversationStore(recent_tokens=150, summary_tokens=60)
+    use_fake_llm(monkeypatch, tmp_path, store)
+    executor = HeldCompaction()
+    monkeypatch.setattr(rag_pipeline, "MEMORY_EXECUTOR", executor)
+
+    async def run():
+        for i in range(20):
+            _, stats = await rag_pipeline.agenerate_conversation_response(QUESTIONS[i % len(QUESTIONS)], "held")
+            if executor.submitted:
+                return stats, i + 1
+
+    stats, turns = asyncio.run(run())
+    memory = store.get("held")
+    try:
+        # The compaction is mid-flight with fewer turns; the response describes the turns it was built from
+        assert len(memory.turns) < turns
+        assert stats["turns"] == stats["recent_turns"] == turns
+        assert stats["recent_tokens"] > 150 and stats["summary_tokens"] == 0
+    finally:
+        executor.release.set()
+    memory.compaction.result()
+    assert memory.summary
+
+
+def test_follow_ups_are_retrieved_with_the_previous_question(monkeypatch, tmp_path):
+    store = ConversationStore()
+    retriever = use_fake_llm(monkeypatch, tmp_path, store)
+    converse("follow-up", 2)
+    assert retriever.queries == [QUESTIONS[0], f"{QUESTIONS[0]}\n{QUESTIONS[1]}"]
+    assert QUESTIONS[0] in store.get("follow-up").history()
+
+
+def test_failed_summaries_fall_back_to_the_folded_questions():
+    memory = ConversationMemory(recent_tokens=30, summary_tokens=40)
+    for question in QUESTIONS:
+        memory.add_turn(question, "According to the evidence, protection wanes after four to six months.")
+
+    def unavailable(prompt):
+        raise RuntimeError("LLM down")
+
+    memory.compact(unavailable)
+    assert len(memory.turns) == 1 and memory.summary.startswith(f"Asked: {QUESTIONS[0]}")
+    assert count_tokens(memory.summary) <= 41  # the cap plus the "..." marker
+
+
+def test_least_recently_used_sessions_are_evicted():
+    store = ConversationStore(max_sessions=2)
+    first = store.get("a")
+    store.get("b")
+    assert store.get("a") is first
+    store.get("c")
+    assert "b" not in store and "a" in store and "c" in store
+    assert store.stats()["evictions"] == 1
+    assert store.drop("a") and not store.drop("a")
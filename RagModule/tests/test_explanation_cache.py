@@ -0,0 +1,103 @@
+import pandas as pd
+from langchain_core.documents import Document
+
+from scripts import explanation_cache, rag_pipeline, warm_explanation_cache
+from scripts.explanation_cache import ExplanationCache, profile_frame, profile_signature
+from scripts.llm_gateway import reset_gateways
+from scripts.llm_providers import reset_llm_cache
+
+PATIENT = {
+    "Age": 45, "Gender": "Male", "COVID_Strain": "Omicron", "Vaccine_Type": "Pfizer", "Doses_Received": 2,
+    "Preexisting_Condition": "Diabetes", "Severity": "Moderate", "Smoking_Status": "Former",
+    "Hospitalized": "Yes", "BMI": 25.3, "Date_of_Infection": "2023-04-15T00:00:00.000Z",
+}
+
+
+class CountingRetriever:
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, query):
+        self.calls += 1
+        return [Document(page_content="Vaccination lowers reinfection risk.")]
+
+
+def use_offline_pipeline(monkeypatch, tmp_path):
+    monkeypatch.setenv("LLM_PROVIDER", "fake")
+    monkeypatch.setenv("EXPLANATION_CACHE", "on")
+    monkeypatch.setattr(rag_pipeline, "LOG_PATH", str(tmp_path / "qna_history.json"))
+    monkeypatch.setattr(explanation_cache, "_cache", ExplanationCache(str(tmp_path / "cache.sqlite")))
+    retriever = CountingRetriever()
+    monkeypatch.setattr(rag_pipeline, "_retriever", retriever)
+    reset_llm_cache()
+    reset_gateways()
+    return retriever
+
+
+def test_signature_buckets_profile_fields():
+    profile = profile_signature(PATIENT, "Yes")
+    older = profile_signature({**PATIENT, "Age": 80, "BMI": 35.0}, "Yes")
+    boosted = profile_signature({**PATIENT, "Doses_Received": 4}, "Yes")
+    unvaccinated = profile_signature({**PATIENT, "Vaccine_Type": float("nan"), "Doses_Received": 0})
+
+    assert profile == older
+    assert boosted["Doses_Received"] == "3+"
+    assert unvaccinated["Vaccine_Type"] == "None" and "ML_Prediction" not in unvaccinated
+
+
+def test_profile_frame_matches_signature():
+    df = pd.read_csv(warm_explanation_cache.DATA_PATH, nrows=300)
+    frame = profile_frame(df)
+    for i, row in df.iterrows():
+        assert frame.loc[i].to_dict() == profile_signature(row.to_dict())
+
+
+def test_cache_persists_and_evicts_least_recently_used(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ExplanationCache(path, max_entries=2)
+    cache.put("a", {}, "A")
+    cache.put("b", {}, "B")
+    assert cache.get("a") == "A"  # "b" is now least recently used
+    cache.put("c", {}, "C")
+
+    reopened = ExplanationCache(path, max_entries=2)
+    assert reopened.get("a") == "A" and reopened.get("c") == "C"
+    assert reopened.get("b") is None
+
+
+def test_repeat_profile_skips_retrieval_and_llm(monkeypatch, tmp_path):
+    retriever = use_offline_pipeline(monkeypatch, tmp_path)
+
+    first = rag_pipeline.generate_ml_aware_response(PATIENT, "Yes")
+    # Different age and BMI, same risk profile
+    second = rag_pipeline.generate_ml_aware_response({**PATIENT, "Age": 70, "BMI": 31.0}, "Yes")
+    third = rag_pipeline.generate_ml_aware_response(PATIENT, "No")
+
+    assert first == second and first.startswith("[ Integrated Analysis ]")
+    assert third != first
+    assert retriever.calls == 2
+
+
+def test_warm_up_pregenerates_common_profiles(monkeypatch, tmp_path):
+    retriever = use_offline_pipeline(monkeypatch, tmp_path)
+
+    summary = warm_explanation_cache.warm_cache(top=5, workers=2)
+    assert summary["generated"] == 10 and summary["failed"] == 0
+
+    # A second run finds everything cached
+    assert warm_explanation_cache.warm_cache(top=5, workers=2)["already_cached"] == 10
+    assert retriever.calls == 10
+
+
+def test_warm_up_counts_only_existing_profiles(monkeypatch, tmp_path):
+    use_offline_pipeline(monkeypatch, tmp_path)
+    data = tmp_path / "patients.csv"
+    pd.DataFrame([PATIENT, {**PATIENT, "Age": 70}, {**PATIENT, "Severity": "Mild"}]).to_csv(data, index=False)
+
+    summary = warm_explanation_cache.warm_cache(str(data), top=50, workers=2)
+    assert summary["profiles"] == 4 and summary["generated"] == 4
+    assert summary["patients_covered"] == 1.0
+
+    summary = warm_explanation_cache.warm_cache(str(data), top=1, workers=2)
+    assert summary["profiles"] == 2 and summary["already_cached"] == 2
+    assert summary["patients_covered"] == round(2 / 3, 3)
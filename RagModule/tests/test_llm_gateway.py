@@ -0,0 +1,216 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from scripts.llm_gateway import (
+    CircuitBreaker,
+    CircuitOpenError,
+    LLMGateway,
+    LLMRequestFailedError,
+    PRIORITY_CHAT,
+    PRIORITY_PREDICTION,
+)
+from scripts.llm_providers import FakeChatModel
+
+
+class RateLimitError(Exception):
+    """Stand-in for openai.RateLimitError (matched by name, like the real one)"""
+    status_code = 429
+
+
+class CountingLLM:
+    """Fake async LLM that records how many calls overlap"""
+
+    def __init__(self, latency=0.01):
+        self.model = FakeChatModel(latency=latency)
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+
+    async def __call__(self, prompt):
+        self.calls += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            return (await self.model.ainvoke(prompt)).content
+        finally:
+            self.active -= 1
+
+
+def test_concurrency_is_bounded():
+    llm = CountingLLM()
+    gateway = LLMGateway(llm, max_concurrency=4)
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(lambda i: gateway.call(f"prompt {i}"), range(64)))
+
+    assert len(set(results)) == 64
+    assert llm.max_active <= 4
+    assert gateway.stats()["max_in_flight"] <= 4
+
+
+def test_identical_prompts_are_coalesced():
+    llm = CountingLLM(latency=0.1)
+    gateway = LLMGateway(llm, max_concurrency=4)
+
+    async def burst():
+        # Async callers on their own event loop share the gateway with threaded callers
+        return await asyncio.gather(*(gateway.acall("same prompt") for _ in range(8)))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        threaded = [pool.submit(gateway.call, "same prompt") for _ in range(8)]
+        results = asyncio.run(burst()) + [future.result() for future in threaded]
+
+    assert len(set(results)) == 1
+    assert llm.calls == 1
+    assert gateway.stats()["coalesced"] == 15
+
+
+def test_predictions_are_served_before_chat():
+    order = []
+
+    async def invoke(prompt):
+        order.append(prompt)
+        if prompt == "blocker":
+            await asyncio.sleep(0.3)
+        return prompt
+
+    gateway = LLMGateway(invoke, max_concurrency=1)
+    blocker = threading.Thread(target=gateway.call, args=("blocker",))
+    blocker.start()
+    time.sleep(0.05)
+
+    # Chat arrives first, but the prediction queued behind it is admitted first
+    waiters = [
+        threading.Thread(target=gateway.call, args=("chat", PRIORITY_CHAT)),
+        threading.Thread(target=gateway.call, args=("prediction", PRIORITY_PREDICTION)),
+    ]
+    for waiter in waiters:
+        waiter.start()
+        time.sleep(0.05)
+    for thread in [blocker, *waiters]:
+        thread.join()
+
+    assert order == ["blocker", "prediction", "chat"]
+
+
+def test_rate_limits_are_retried_with_backoff():
+    attempts = []
+    sleeps = []
+
+    async def invoke(prompt):
+        attempts.append(prompt)
+        if len(attempts) < 3:
+            raise RateLimitError("429 Too Many Requests")
+        return "ok"
+
+    async def record_sleep(delay):
+        sleeps.append(delay)
+
+    gateway = LLMGateway(invoke, max_attempts=3, backoff_base=0.5, sleep=record_sleep)
+
+    assert gateway.call("prompt") == "ok"
+    assert len(attempts) == 3
+    assert len(sleeps) == 2 and sleeps[1] > sleeps[0] * 0.5
+    assert gateway.stats()["retries"] == 2
+
+
+def test_circuit_breaker_fails_fast_and_recovers():
+    now = [0.0]
+    calls = []
+
+    async def invoke(prompt):
+        calls.append(prompt)
+        if prompt.startswith("bad"):
+            raise RateLimitError("429 Too Many Requests")
+        return "ok"
+
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=lambda: now[0])
+    gateway = LLMGateway(invoke, max_attempts=1, breaker=breaker)
+
+    for i in range(3):
+        try:
+            gateway.call(f"bad {i}")
+        except LLMRequestFailedError:
+            pass
+    assert breaker.state == "open"
+
+    # Open: rejected without touching the provider
+    try:
+        gateway.call("good")
+        assert False, "expected CircuitOpenError"
+    except CircuitOpenError as e:
+        assert e.retry_after == 10
+    assert len(calls) == 3
+
+    # After the cool-down a single trial call closes the circuit again
+    now[0] = 11
+    assert gateway.call("good") == "ok"
+    assert breaker.state == "closed"
+
+
+class BadRequestError(Exception):
+    """Stand-in for openai.BadRequestError: the provider rejected this prompt"""
+    status_code = 400
+
+
+def test_rejected_prompts_do_not_open_the_circuit():
+    now = [0.0]
+
+    async def invoke(prompt):
+        if prompt.startswith("filtered"):
+            raise BadRequestError("400 content filter")
+        if prompt.startswith("bad"):
+            raise RateLimitError("429 Too Many Requests")
+        return "ok"
+
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+    gateway = LLMGateway(invoke, max_attempts=3, breaker=breaker)
+    for i in range(5):
+        try:
+            gateway.call(f"filtered {i}")
+            assert False, "expected LLMRequestFailedError"
+        except LLMRequestFailedError:
+            pass
+    assert breaker.state == "closed" and gateway.stats()["retries"] == 0
+    assert gateway.call("good") == "ok"
+
+    # A rejected half-open trial releases the probe for the next caller
+    gateway = LLMGateway(invoke, max_attempts=1, breaker=breaker)
+    for i in range(2):
+        try:
+            gateway.call(f"bad {i}")
+        except LLMRequestFailedError:
+            pass
+    assert breaker.state == "open"
+    now[0] = 11
+    try:
+        gateway.call("filtered again")
+    except LLMRequestFailedError:
+        pass
+    assert gateway.call("good") == "ok" and breaker.state == "closed"
+
+
+def test_burst_load_with_fake_llm():
+    """Local load test: a mixed burst of predictions and chats against a 50 ms fake LLM"""
+    llm = CountingLLM(latency=0.05)
+    gateway = LLMGateway(llm, max_concurrency=8)
+    # 200 requests over 40 distinct prompts, e.g. clinics resubmitting the same patients
+    requests = [(f"patient {i % 40}", PRIORITY_PREDICTION if i % 2 else PRIORITY_CHAT) for i in range(200)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=100) as pool:
+        list(pool.map(lambda request: gateway.call(*request), requests))
+    elapsed = time.perf_counter() - start
+
+    stats = gateway.stats()
+    print(f"\n{len(requests)} requests in {elapsed:.2f}s ({len(requests) / elapsed:.0f} req/s), "
+          f"provider calls: {llm.calls}, coalesced: {stats['coalesced']}, max in flight: {llm.max_active}")
+    assert llm.max_active <= 8
+    assert llm.calls + stats["coalesced"] == len(requests)
+    assert llm.calls < len(requests)
+
+
+if __name__ == "__main__":
+    test_burst_load_with_fake_llm()
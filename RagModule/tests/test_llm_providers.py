@@ -0,0 +1,69 @@
+import importlib
+import os
+
+from scripts import llm_providers
+from scripts.llm_providers import (
+    LLMUnavailableError,
+    ProviderSettings,
+    check_llm_available,
+    invoke_llm,
+    reset_llm_cache,
+)
+
+AZURE_VARS = ["AZURE_API_KEY", "AZURE_API_VERSION", "AZURE_ENDPOINT", "DEPLOYMENT_NAME"]
+
+
+def test_pipeline_imports_without_azure_credentials(monkeypatch):
+    for var in AZURE_VARS:
+        monkeypatch.delenv(var, raising=False)
+    monkeypatch.setenv("LLM_PROVIDER", "azure")
+
+    rag_pipeline = importlib.import_module("scripts.rag_pipeline")
+
+    # The missing configuration is only reported when a request needs the LLM
+    for request in (check_llm_available, lambda: rag_pipeline.generate_chat_response("Is reinfection common?")):
+        try:
+            request()
+            assert False, "expected LLMUnavailableError"
+        except LLMUnavailableError as e:
+            assert "AZURE_API_KEY" in str(e)
+
+
+def test_fake_provider_is_deterministic(monkeypatch):
+    monkeypatch.setenv("LLM_PROVIDER", "fake")
+    reset_llm_cache()
+
+    first = invoke_llm("COVID-19 reinfection risk assessment considering: Omicron")
+    second = invoke_llm("COVID-19 reinfection risk assessment considering: Omicron")
+    other = invoke_llm("COVID-19 reinfection risk assessment considering: Delta")
+
+    assert first == second
+    assert first != other
+    assert first.startswith("Based on the research, the risk level is **")
+
+
+def test_settings_are_configurable_per_provider(monkeypatch):
+    monkeypatch.setenv("LLM_TIMEOUT", "12")
+    monkeypatch.setenv("LLM_MAX_CONCURRENCY", "4")
+    monkeypatch.setenv("LOCAL_LLM_TIMEOUT", "90")
+
+    local = ProviderSettings.from_env("LOCAL")
+    azure = ProviderSettings.from_env("AZURE")
+
+    assert local.timeout == 90.0
+    assert azure.timeout == 12.0
+    assert local.max_concurrency == azure.max_concurrency == 4
+
+
+def test_unknown_provider_is_reported(monkeypatch):
+    monkeypatch.setenv("LLM_PROVIDER", "does-not-exist")
+    try:
+        llm_providers.get_llm()
+        assert False, "expected LLMUnavailableError"
+    except LLMUnavailableError as e:
+        assert "azure" in str(e) and "fake" in str(e)
+
+
+if __name__ == "__main__":
+    os.environ["LLM_PROVIDER"] = "fake"
+    print(invoke_llm("How does vaccination impact reinfection rates?"))
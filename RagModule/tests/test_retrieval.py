@@ -1,12 +1,14 @@
-from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
 import os
 
+from langchain_huggingface import HuggingFaceEmbeddings
+
+from scripts.chunk_store import load_vectorstore
+
 INDEX_PATH = os.path.join(os.path.dirname(__file__), "../vectorstore/faiss_pubmed")
 
 def test_retrieval(query: str):
     embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    vectorstore = FAISS.load_local(INDEX_PATH, embeddings, allow_dangerous_deserialization=True)
+    vectorstore = load_vectorstore(INDEX_PATH, embeddings)
 
     results = vectorstore.similarity_search(query, k=3)
     for r in results:
@@ -0,0 +1,128 @@
+"""Throughput of JSON /predict versus Arrow IPC /predict/arrow at growing batch sizes.
+
+"in-process" times the server-side work for one batch:
+- JSON: parse the body, validate it into PatientFeatures objects, build the features, predict
+- Arrow: read the IPC stream, validate it per column, build the features, predict
+
+"http" times full requests against a uvicorn subprocess (fake LLM, stub retriever, see
+offline.py). JSON /predict also writes an explanation for the first patient, which the
+Arrow endpoint does not.
+
+    python benchmarks/arrow_vs_json.py --batch-sizes 1,100,1000,10000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+import httpx
+
+import concurrency
+from offline import add_import_paths, sample_patients
+
+
+def to_arrow(records: list) -> bytes:
+    import pyarrow as pa
+
+    table = pa.Table.from_pylist(records)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def median_seconds(fn, min_seconds: float) -> float:
+    fn()  # warm-up
+    timings = []
+    while sum(timings) < min_seconds or len(timings) < 3:
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def in_process(batches: dict, min_seconds: float) -> list:
+    from typing import List
+
+    from pydantic import TypeAdapter
+
+    from app.arrow_input import arrow_feature_frame
+    from app.model_interface import predict_frame
+    from app.preprocessing import build_feature_frame
+    from app.schemas import PatientFeatures
+
+    adapter = TypeAdapter(List[PatientFeatures])
+    results = []
+    for size, (json_body, arrow_body) in batches.items():
+        json_s = median_seconds(lambda: predict_frame(build_feature_frame(adapter.validate_json(json_body))), min_seconds)
+        arrow_s = median_seconds(lambda: predict_frame(arrow_feature_frame(arrow_body)), min_seconds)
+        results.append({"mode": "in-process", "batch_size": size, "json_ms": json_s * 1000, "arrow_ms": arrow_s * 1000})
+    return results
+
+
+def over_http(batches: dict, min_seconds: float) -> list:
+    port = concurrency.free_port()
+    server = subprocess.Popen(
+        [sys.executable, concurrency.__file__, "--serve", str(port), "--llm-latency-ms", "0", "--retrieval-latency-ms", "0"],
+        env=os.environ.copy(),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    results = []
+    try:
+        concurrency.wait_until_up(base_url)
+        with httpx.Client(base_url=base_url, timeout=300) as client:
+            def post(path, body, content_type):
+                response = client.post(path, content=body, headers={"Content-Type": content_type})
+                response.raise_for_status()
+
+            for size, (json_body, arrow_body) in batches.items():
+                json_s = median_seconds(lambda: post("/predict", json_body, "application/json"), min_seconds)
+                arrow_s = median_seconds(
+                    lambda: post("/predict/arrow", arrow_body, "application/vnd.apache.arrow.stream"), min_seconds
+                )
+                results.append({"mode": "http", "batch_size": size, "json_ms": json_s * 1000, "arrow_ms": arrow_s * 1000})
+    finally:
+        server.terminate()
+        server.wait()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", default="1,100,1000,10000")
+    parser.add_argument("--min-seconds", type=float, default=1.0, help="measurement time per format and size")
+    parser.add_argument("--skip-http", action="store_true", help="only measure the in-process pipeline")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    add_import_paths()
+    batches = {}
+    for size in [int(x) for x in args.batch_sizes.split(",")]:
+        records = sample_patients(size)
+        batches[size] = (json.dumps(records).encode(), to_arrow(records))
+
+    results = in_process(batches, args.min_seconds)
+    if not args.skip_http:
+        results += over_http(batches, args.min_seconds)
+
+    print(f"{'mode':<12}{'batch':>8}{'JSON kB':>10}{'Arrow kB':>10}{'JSON ms':>10}{'Arrow ms':>10}"
+          f"{'JSON rows/s':>13}{'Arrow rows/s':>14}{'speedup':>9}")
+    for r in results:
+        json_body, arrow_body = batches[r["batch_size"]]
+        r["json_kb"], r["arrow_kb"] = round(len(json_body) / 1024, 1), round(len(arrow_body) / 1024, 1)
+        r["json_rows_per_s"] = round(r["batch_size"] / r["json_ms"] * 1000)
+        r["arrow_rows_per_s"] = round(r["batch_size"] / r["arrow_ms"] * 1000)
+        r["speedup"] = round(r["json_ms"] / r["arrow_ms"], 1)
+        r["json_ms"], r["arrow_ms"] = round(r["json_ms"], 2), round(r["arrow_ms"], 2)
+        print(f"{r['mode']:<12}{r['batch_size']:>8}{r['json_kb']:>10}{r['arrow_kb']:>10}{r['json_ms']:>10}"
+              f"{r['arrow_ms']:>10}{r['json_rows_per_s']:>13}{r['arrow_rows_per_s']:>14}{r['speedup']:>9}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
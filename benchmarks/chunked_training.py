@@ -0,0 +1,123 @@
+"""Peak memory of chunked vs in-memory training as the dataset grows.
+
+Writes the engineered dataset tiled to each --rows size as Parquet (one block at a time, so
+generating it is itself out-of-core), then trains on it in a fresh interpreter per run and
+reports that process's peak RSS:
+
+- chunked: data_pipeline.chunked_training (partial_fit passes plus a reservoir-sampled histogram GBDT)
+- in-memory: the same scaler and models fit on the whole table loaded with pandas
+
+Chunked peak RSS should stay flat as rows grow; in-memory grows with the table.
+
+    python -m data_pipeline --smote-ratio 0   # builds data/pipeline/features/engineered.parquet
+    python benchmarks/chunked_training.py --rows 50000,200000,800000 --batch-rows 50000
+"""
+import sys
+import json
+import time
+import argparse
+import subprocess
+import tempfile
+from pathlib import Path
+
+from offline import REPO_ROOT
+
+ENGINEERED_PATH = REPO_ROOT / "data" / "pipeline" / "features" / "engineered.parquet"
+WRITE_BLOCK_ROWS = 100_000
+
+
+def write_tiled(source: Path, rows: int, path: Path):
+    """`rows` rows of `source` repeated, written in blocks of WRITE_BLOCK_ROWS"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    base = pq.read_table(source)
+    block = pa.concat_tables([base] * max(1, WRITE_BLOCK_ROWS // base.num_rows))
+    with pq.ParquetWriter(path, block.schema) as writer:
+        written = 0
+        while written < rows:
+            part = block.slice(0, min(block.num_rows, rows - written))
+            writer.write_table(part)
+            written += part.num_rows
+
+
+def run_in_memory(table: str, random_state: int = 42) -> dict:
+    """Baseline: load everything, then fit the same scaler and models with fit()"""
+    import numpy as np
+    import pandas as pd
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.naive_bayes import GaussianNB
+    from sklearn.preprocessing import StandardScaler
+
+    from data_pipeline.chunked_training import peak_rss_mb
+    from data_pipeline.stages import TARGET
+
+    df = pd.read_parquet(table)
+    X, y = df.drop(columns=[TARGET]).to_numpy(dtype=np.float64), df[TARGET].to_numpy()
+    X = StandardScaler().fit_transform(X)
+    SGDClassifier(loss="log_loss", max_iter=5, tol=None, class_weight="balanced", random_state=random_state).fit(X, y)
+    GaussianNB().fit(X, y)
+    HistGradientBoostingClassifier(class_weight="balanced", random_state=random_state).fit(X, y)
+    return {"peak_rss_mb": round(peak_rss_mb(), 1)}
+
+
+def run_chunked(table: str, batch_rows: int, sample_rows: int) -> dict:
+    from data_pipeline.chunked_training import TrainingData, table_columns, train_chunked
+    from data_pipeline.stages import TARGET
+
+    features = [c for c in table_columns(table) if c != TARGET]
+    result = train_chunked(TrainingData(table, features, batch_rows), sample_rows=sample_rows)
+    return {"peak_rss_mb": result["peak_rss_mb"], "accuracy": {k: round(m["Accuracy"], 4) for k, m in result["metrics"].items()}}
+
+
+def measure_subprocess(mode: str, table: Path, args) -> dict:
+    start = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", mode, str(table),
+         "--batch-rows", str(args.batch_rows), "--sample-rows", str(args.sample_rows)],
+        check=True, capture_output=True, text=True, cwd=REPO_ROOT,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1]) | {"seconds": round(time.perf_counter() - start, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="50000,200000,800000", help="comma-separated table sizes")
+    parser.add_argument("--batch-rows", type=int, default=50_000)
+    parser.add_argument("--sample-rows", type=int, default=200_000)
+    parser.add_argument("--modes", default="chunked,in-memory")
+    parser.add_argument("--source", default=str(ENGINEERED_PATH), help="table to tile")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "TABLE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.insert(0, str(REPO_ROOT))
+        mode, table = args.child
+        result = run_chunked(table, args.batch_rows, args.sample_rows) if mode == "chunked" else run_in_memory(table)
+        print(json.dumps(result))
+        return
+
+    if not Path(args.source).exists():
+        sys.exit(f"{args.source} not found; run `python -m data_pipeline --smote-ratio 0` first")
+
+    results = []
+    print(f"{'rows':>10}{'file MB':>10}{'mode':>12}{'peak RSS MB':>14}{'seconds':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in (int(n) for n in args.rows.split(",")):
+            table = Path(tmp) / f"tiled_{rows}.parquet"
+            write_tiled(Path(args.source), rows, table)
+            for mode in args.modes.split(","):
+                result = {"rows": rows, "file_mb": round(table.stat().st_size / 2**20, 1), "mode": mode,
+                          **measure_subprocess(mode, table, args)}
+                results.append(result)
+                print(f"{rows:>10}{result['file_mb']:>10}{mode:>12}{result['peak_rss_mb']:>14}{result['seconds']:>10}")
+            table.unlink()
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Cohort explanation throughput: one prompt per patient vs grouped multi-patient prompts.
+
+Both modes run against the fake LLM provider and the stub retriever (see offline.py). The fake
+LLM waits --llm-latency-ms per request plus --ms-per-patient for every explanation it writes,
+so a packed prompt pays for its longer answer:
+
+- per-patient: agenerate_ml_aware_response for every patient (what one /predict call per
+  patient does, explanation cache off), --concurrency at a time
+- cohort: RagModule.scripts.cohort_explanations at each --patients-per-prompt
+
+    python benchmarks/cohort_explanations.py --patients 400 --patients-per-prompt 1,4,8,16
+"""
+import re
+import json
+import time
+import hashlib
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+
+from offline import DATASET_PATH, use_offline_rag
+
+# Section headers of the runner's multi-patient prompts (see cohort_explanations.patient_details)
+PATIENT_SECTION = re.compile(r"^\[patient ([^\]]+)\]$", re.MULTILINE)
+
+
+def use_generation_time_fake(latency: float, per_patient: float):
+    """Replace the fake provider with one whose latency grows with the number of patients answered"""
+    from RagModule.scripts.llm_gateway import reset_gateways
+    from RagModule.scripts.llm_providers import FakeChatModel, FakeProvider, fake_response, register_provider
+
+    class GenerationTimeFake(FakeChatModel):
+        per_patient: float = 0.0
+
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+            patients = len(PATIENT_SECTION.findall("\n".join(str(m.content) for m in messages)))
+            await asyncio.sleep(self.latency + self.per_patient * max(patients, 1))
+            return self._respond(messages)
+
+    class GenerationTimeProvider(FakeProvider):
+        def build(self, settings):
+            return GenerationTimeFake(latency=latency, per_patient=per_patient, responder=respond)
+
+    def respond(prompt: str) -> str:
+        # Cohort prompts get the JSON array the runner asks for, single-patient prompts the usual answer
+        patients = PATIENT_SECTION.findall(prompt)
+        if not patients:
+            return fake_response(prompt)
+        return json.dumps([
+            {
+                "patient": patient,
+                "risk_level": ("Low", "Moderate", "High")[hashlib.sha256(f"{prompt}{patient}".encode()).digest()[0] % 3],
+                "explanation": f"According to the evidence, this is a deterministic offline response for patient {patient}.",
+            }
+            for patient in patients
+        ])
+
+    register_provider(GenerationTimeProvider())
+    reset_gateways()
+
+
+async def per_patient(rag, df, concurrency: int) -> float:
+    slots = asyncio.Semaphore(concurrency)
+    patients = df.drop(columns=["patient_id"]).to_dict("records")
+
+    async def explain(patient):
+        async with slots:
+            await rag.agenerate_ml_aware_response(patient, patient["ML_Prediction"])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(explain(patient) for patient in patients))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=400)
+    parser.add_argument("--patients-per-prompt", default="1,4,8,16")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency-ms", type=float, default=200)
+    parser.add_argument("--ms-per-patient", type=float, default=50)
+    parser.add_argument("--retrieval-latency-ms", type=float, default=20)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    rag = use_offline_rag(retrieval_latency_ms=args.retrieval_latency_ms)
+    use_generation_time_fake(args.llm_latency_ms / 1000, args.ms_per_patient / 1000)
+    from RagModule.scripts.cohort_explanations import explain_cohort, load_cohort
+
+    df = load_cohort(str(DATASET_PATH), prediction_column="Reinfection").head(args.patients)
+    results = []
+    seconds = asyncio.run(per_patient(rag, df, args.concurrency))
+    results.append({"mode": "per-patient", "prompts": len(df), "seconds": round(seconds, 2),
+                    "patients_per_sec": round(len(df) / seconds, 1)})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(n) for n in args.patients_per_prompt.split(",")):
+            summary = asyncio.run(explain_cohort(
+                df, str(Path(tmp) / f"cohort_{size}.jsonl"), patients_per_prompt=size, concurrency=args.concurrency))
+            assert summary["explained"] == len(df), summary
+            results.append({"mode": f"cohort x{size}", "prompts": summary["prompts"], "seconds": summary["seconds"],
+                            "patients_per_sec": summary["patients_per_sec"]})
+
+    print(f"{'mode':>14}{'prompts':>10}{'seconds':>10}{'patients/s':>12}")
+    for result in results:
+        print(f"{result['mode']:>14}{result['prompts']:>10}{result['seconds']:>10}{result['patients_per_sec']:>12}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
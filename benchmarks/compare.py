@@ -0,0 +1,75 @@
+"""Compare two benchmarks/suite.py result files and flag regressions.
+
+A case regresses when its median got slower by more than --threshold (relative) and by more
+than --min-delta-ms (absolute, so microsecond cases do not fail on timer noise). Exits with
+status 1 if any case regressed, so it can gate CI.
+
+    python benchmarks/compare.py baseline.json current.json --threshold 0.15
+"""
+import sys
+import json
+import argparse
+
+
+def case_key(result: dict) -> tuple:
+    return result["name"], json.dumps(result["params"], sort_keys=True)
+
+
+def compare(baseline: dict, current: dict, threshold: float, min_delta_ms: float, metric: str = "median_ms") -> list:
+    """One row per case present in both files: (name, params, before, after, ratio, status)"""
+    before = {case_key(r): r for r in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        key = case_key(result)
+        if key not in before:
+            rows.append((*key, None, result[metric], None, "new"))
+            continue
+        old, new = before.pop(key)[metric], result[metric]
+        ratio = new / old if old else float("inf")
+        if ratio > 1 + threshold and new - old > min_delta_ms:
+            status = "REGRESSION"
+        elif ratio < 1 - threshold and old - new > min_delta_ms:
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append((*key, old, new, ratio, status))
+    rows += [(*key, r[metric], None, None, "missing") for key, r in before.items()]
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.15, help="relative slowdown that counts as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05, help="ignore absolute changes below this")
+    parser.add_argument("--metric", choices=["median_ms", "p95_ms", "min_ms", "mean_ms"], default="median_ms")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    for label, data in (("baseline", baseline), ("current", current)):
+        meta = data["meta"]
+        print(f"{label:<9} {(meta.get('git_commit') or '?')[:12]}{' (dirty)' if meta.get('git_dirty') else ''}"
+              f"  {meta.get('timestamp')}  {meta.get('platform')}")
+    if baseline["meta"].get("platform") != current["meta"].get("platform"):
+        print("warning: results come from different platforms")
+
+    rows = compare(baseline, current, args.threshold, args.min_delta_ms, args.metric)
+    print(f"\n{'case':<24}{'params':<34}{'before':>11}{'after':>11}{'change':>9}  status")
+    for name, params, old, new, ratio, status in rows:
+        label = ", ".join(f"{k}={v}" for k, v in json.loads(params).items())
+        change = f"{(ratio - 1) * 100:+.1f}%" if ratio is not None else ""
+        print(f"{name:<24}{label:<34}{old if old is not None else '':>11}{new if new is not None else '':>11}"
+              f"{change:>9}  {status}")
+
+    regressions = sum(row[-1] == "REGRESSION" for row in rows)
+    print(f"\n{regressions} regression(s) above {args.threshold:.0%} in {args.metric}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
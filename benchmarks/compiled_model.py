@@ -0,0 +1,63 @@
+"""Inference latency of the sklearn and compiled model backends at batch sizes 1 to 100k.
+
+Both backends start from the same unscaled feature matrix (rows of X_test, tiled up to the
+batch size): sklearn runs `scaler.transform` + `model.predict`, the compiled backend runs
+`CompiledTreeModel.predict` with the scaler already folded into its thresholds.
+
+    python benchmarks/compiled_model.py --batch-sizes 1,10,100,1000,10000,100000
+"""
+import json
+import argparse
+import statistics
+
+import numpy as np
+import pandas as pd
+
+from offline import REPO_ROOT, add_import_paths, measure
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", default="1,10,100,1000,10000,100000")
+    parser.add_argument("--min-seconds", type=float, default=1.0, help="measurement time per backend and size")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    add_import_paths()
+    from app.compiled_model import compile_model
+    from app.model_interface import model
+    from app.preprocessing import scaler
+
+    compiled = compile_model(model, scaler)
+    features = list(scaler.feature_names_in_)
+    X_test = pd.read_csv(REPO_ROOT / "data" / "splitted_data" / "X_test.csv")[features]
+    print(f"{type(model).__name__}: {compiled.n_trees} trees, {compiled.n_nodes} nodes, depth {compiled.max_depth}")
+
+    results = []
+    print(f"{'batch':>8}{'sklearn ms':>13}{'compiled ms':>13}{'speedup':>9}{'compiled rows/s':>17}{'identical':>11}")
+    for batch in [int(x) for x in args.batch_sizes.split(",")]:
+        frame = X_test.iloc[np.arange(batch) % len(X_test)].reset_index(drop=True)
+        raw = frame.to_numpy(dtype=np.float64)
+
+        sklearn_ms = statistics.median(measure(lambda: model.predict(scaler.transform(frame)), args.min_seconds)) * 1000
+        compiled_ms = statistics.median(measure(lambda: compiled.predict(raw), args.min_seconds)) * 1000
+        identical = bool(np.array_equal(compiled.predict(raw), model.predict(scaler.transform(frame))))
+
+        r = {
+            "batch_size": batch,
+            "sklearn_ms": round(sklearn_ms, 3),
+            "compiled_ms": round(compiled_ms, 3),
+            "speedup": round(sklearn_ms / compiled_ms, 1),
+            "compiled_rows_per_s": round(batch / compiled_ms * 1000),
+            "identical": identical,
+        }
+        results.append(r)
+        print(f"{batch:>8}{r['sklearn_ms']:>13}{r['compiled_ms']:>13}{r['speedup']:>9}"
+              f"{r['compiled_rows_per_s']:>17}{str(identical):>11}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Requests/sec of /predict and /chat at 1, 10 and 100 concurrent clients.
+
+The API runs in a separate uvicorn process with the fake LLM provider and a stub retriever
+(see offline.py), so no Azure credentials or embedding model are needed. `--blocking`
+also measures `/chat-blocking`, which calls the synchronous pipeline from an `async def`
+route the way /chat used to, to show what stalling the event loop costs.
+
+    python benchmarks/concurrency.py --llm-latency-ms 200 --duration 5 --blocking
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import statistics
+import subprocess
+
+import httpx
+
+from offline import SAMPLE_QUESTIONS, add_import_paths, sample_patients, use_offline_rag
+
+
+def serve(port: int, llm_latency_ms: float, retrieval_latency_ms: float):
+    rag_pipeline = use_offline_rag(llm_latency_ms, retrieval_latency_ms)
+    add_import_paths()
+    import uvicorn
+    from main import app, ChatRequest
+
+    @app.post("/chat-blocking")
+    async def chat_blocking(chat_request: ChatRequest):
+        # The old pattern: a blocking LLM round trip inside an async route
+        return {"response": rag_pipeline.generate_chat_response(chat_request.question)}
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(base_url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("API did not start")
+
+
+async def run_level(base_url: str, endpoint: str, concurrency: int, duration: float) -> dict:
+    """Closed loop: `concurrency` clients each send the next request as soon as one returns"""
+    patients = sample_patients(200)
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def worker(worker_id: int):
+            nonlocal errors
+            i = worker_id
+            while time.perf_counter() < deadline:
+                if endpoint == "/predict":
+                    body = [patients[i % len(patients)]]
+                else:
+                    body = {"question": f"{SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)]} (#{i})"}
+                start = time.perf_counter()
+                response = await client.post(endpoint, json=body)
+                latencies.append(time.perf_counter() - start)
+                errors += response.status_code != 200
+                i += concurrency
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", default="1,10,100", help="comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per measurement")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--retrieval-latency-ms", type=float, default=10.0)
+    parser.add_argument("--blocking", action="store_true", help="also measure the blocking /chat-blocking route")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.serve, args.llm_latency_ms, args.retrieval_latency_ms)
+
+    # LLM concurrency is raised above the largest level so the gateway limit is not what is measured
+    port = free_port()
+    env = {"LLM_MAX_CONCURRENCY": "256", "RAG_RETRIEVAL_WORKERS": "32"}
+    server = subprocess.Popen(
+        [sys.executable, __file__, "--serve", str(port),
+         "--llm-latency-ms", str(args.llm_latency_ms), "--retrieval-latency-ms", str(args.retrieval_latency_ms)],
+        env={**os.environ, **env},
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_up(base_url)
+        endpoints = ["/predict", "/chat"] + (["/chat-blocking"] if args.blocking else [])
+        results = []
+        print(f"{'endpoint':<15}{'clients':>8}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        for endpoint in endpoints:
+            for level in [int(x) for x in args.levels.split(",")]:
+                r = asyncio.run(run_level(base_url, endpoint, level, args.duration))
+                results.append(r)
+                print(f"{r['endpoint']:<15}{r['concurrency']:>8}{r['requests']:>10}{r['errors']:>8}"
+                      f"{r['rps']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}")
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(results, f, indent=2)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
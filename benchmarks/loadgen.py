@@ -0,0 +1,301 @@
+"""Open-loop load generator for /predict and /chat: throughput, latency percentiles, errors and saturation.
+
+Requests are sent on a schedule regardless of how fast the API answers (open loop), so a slow
+server builds a queue instead of slowing the client down. Latency is measured from the scheduled
+send time, which keeps queueing delay in the numbers (no coordinated omission).
+
+The request stream is either synthetic or a recording:
+- synthetic: patients are rows of data/Covid-19 Dataset.csv and questions come from a sample
+  list, mixed by --chat-fraction, with Poisson (default) or uniform arrivals at each --rates level
+- replay: a JSON-lines log written by the API with REQUEST_RECORD_PATH set, or by --save-stream.
+  It is replayed with its original timing scaled by --speed, or re-timed to each --rates level.
+
+By default the API runs in a subprocess with the fake LLM provider and a stub retriever (see
+offline.py). --url targets a server that is already running, and --in-process drives the ASGI
+app directly in this process.
+
+    python benchmarks/loadgen.py --rates 5,10,20,40,80 --duration 10 --llm-latency-ms 200
+    python benchmarks/loadgen.py --replay traffic.jsonl --speed 2
+    python benchmarks/loadgen.py --replay traffic.jsonl --rates 10,20,40 --url http://127.0.0.1:8000
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+
+import httpx
+
+import concurrency
+from offline import SAMPLE_QUESTIONS, sample_patients, use_offline_rag
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def synthetic_stream(rate: float, duration: float, chat_fraction: float, arrival: str, seed: int) -> list:
+    """(offset seconds, path, body) for `duration` seconds of traffic at `rate` requests/s"""
+    rng = random.Random(seed)
+    patients = sample_patients()
+    stream, t = [], 0.0
+    while True:
+        t += rng.expovariate(rate) if arrival == "poisson" else 1 / rate
+        if t >= duration:
+            return stream
+        if rng.random() < chat_fraction:
+            stream.append((t, "/chat", {"question": rng.choice(SAMPLE_QUESTIONS)}))
+        else:
+            stream.append((t, "/predict", [rng.choice(patients)]))
+
+
+def load_recording(path: str) -> list:
+    """(offset seconds, path, body) from a REQUEST_RECORD_PATH / --save-stream log"""
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                if entry.get("method", "POST") == "POST" and entry.get("body") is not None:
+                    entries.append((entry["ts"], entry["path"], entry["body"]))
+    if not entries:
+        raise SystemExit(f"No replayable requests in {path}")
+    entries.sort(key=lambda entry: entry[0])
+    first = entries[0][0]
+    return [(ts - first, path, body) for ts, path, body in entries]
+
+
+def retime(recording: list, rate: float, duration: float, arrival: str, seed: int) -> list:
+    """Recorded requests in their original order, sent at `rate` for `duration` seconds"""
+    rng = random.Random(seed)
+    stream, t, i = [], 0.0, 0
+    while True:
+        t += rng.expovariate(rate) if arrival == "poisson" else 1 / rate
+        if t >= duration:
+            return stream
+        _, path, body = recording[i % len(recording)]
+        stream.append((t, path, body))
+        i += 1
+
+
+def save_stream(stream: list, path: str):
+    start = time.time()
+    with open(path, "w", encoding="utf-8") as f:
+        for t, request_path, body in stream:
+            f.write(json.dumps({"ts": round(start + t, 6), "method": "POST", "path": request_path, "body": body}) + "\n")
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q / 100))]
+
+
+def summarize(samples: list, wall: float) -> dict:
+    """samples: (path, status or error name, latency seconds)"""
+    latencies = sorted(latency for _, status, latency in samples if status == 200)
+    errors = {}
+    for _, status, _ in samples:
+        if status != 200:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+    n_errors = sum(errors.values())
+    summary = {
+        "requests": len(samples),
+        "ok": len(latencies),
+        "errors": errors,
+        "error_rate": round(n_errors / len(samples), 4) if samples else 0.0,
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+    }
+    for q in PERCENTILES:
+        value = percentile(latencies, q)
+        summary[f"p{q}_ms"] = round(value * 1000, 1) if value is not None else None
+    summary["max_ms"] = round(latencies[-1] * 1000, 1) if latencies else None
+    return summary
+
+
+async def drive(client: httpx.AsyncClient, stream: list, speed: float, max_inflight: int, timeout: float) -> dict:
+    """Send every request at its scheduled time; returns the overall and per-path summaries"""
+    samples = []
+    inflight = 0
+    loop = asyncio.get_running_loop()
+
+    async def send(scheduled: float, path: str, body):
+        nonlocal inflight
+        try:
+            response = await client.post(path, json=body, timeout=timeout)
+            status = response.status_code
+        except httpx.TimeoutException:
+            status = "timeout"
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        finally:
+            inflight -= 1
+        samples.append((path, status, loop.time() - scheduled))
+
+    tasks = []
+    start = loop.time()
+    for offset, path, body in stream:
+        scheduled = start + offset / speed
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if inflight >= max_inflight:
+            # The client itself is out of capacity; count it rather than delay the schedule
+            samples.append((path, "dropped", 0.0))
+            continue
+        inflight += 1
+        tasks.append(asyncio.create_task(send(scheduled, path, body)))
+    await asyncio.gather(*tasks)
+    wall = loop.time() - start
+
+    result = summarize(samples, wall)
+    # Actual arrival rate of this stream (Poisson arrivals scatter around the nominal rate)
+    span = stream[-1][0] / speed if stream else 0.0
+    result["sent_rps"] = round(len(stream) / span, 2) if span else None
+    result["by_path"] = {
+        path: summarize([s for s in samples if s[0] == path], wall) for path in sorted({s[0] for s in samples})
+    }
+    return result
+
+
+def saturated(level: dict, slo_ms: float, max_error_rate: float) -> bool:
+    """Throughput fell behind the arrival rate, the p99 broke the SLO, or too many errors"""
+    behind = level["sent_rps"] is not None and level["throughput_rps"] < 0.9 * level["sent_rps"]
+    slow = level["p99_ms"] is None or level["p99_ms"] > slo_ms
+    return behind or slow or level["error_rate"] > max_error_rate
+
+
+def start_server(args):
+    port = concurrency.free_port()
+    server = subprocess.Popen(
+        [sys.executable, concurrency.__file__, "--serve", str(port),
+         "--llm-latency-ms", str(args.llm_latency_ms), "--retrieval-latency-ms", str(args.retrieval_latency_ms)],
+        env=os.environ.copy(),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        concurrency.wait_until_up(base_url)
+    except RuntimeError:
+        server.terminate()
+        raise
+    return server, base_url
+
+
+def in_process_client(args) -> httpx.AsyncClient:
+    use_offline_rag(args.llm_latency_ms, args.retrieval_latency_ms)
+    from main import app
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadgen")
+
+
+async def run_levels(args, client: httpx.AsyncClient, streams: list) -> list:
+    levels = []
+    for label, offered, stream in streams:
+        result = await drive(client, stream, args.speed, args.max_inflight, args.timeout)
+        result = {"level": label, "offered_rps": offered, **result}
+        result["saturated"] = saturated(result, args.slo_ms, args.max_error_rate)
+        levels.append(result)
+        print(f"{label:<12}{offered:>9}{result['requests']:>9}{result['throughput_rps']:>9}"
+              f"{result['error_rate'] * 100:>8.1f}%{result['p50_ms']!s:>9}{result['p95_ms']!s:>9}"
+              f"{result['p99_ms']!s:>9}{'  saturated' if result['saturated'] else ''}")
+        if args.pause:
+            await asyncio.sleep(args.pause)
+    return levels
+
+
+def build_streams(args) -> list:
+    """(label, offered req/s, stream) per level"""
+    rates = [float(x) for x in args.rates.split(",")] if args.rates else []
+    if args.replay:
+        recording = load_recording(args.replay)
+        if not rates:
+            span = recording[-1][0] / args.speed
+            offered = round(len(recording) / span, 2) if span else None
+            return [(f"replay x{args.speed:g}", offered, recording)]
+        return [(f"{rate:g}/s", rate, retime(recording, rate, args.duration, args.arrival, args.seed + i))
+                for i, rate in enumerate(rates)]
+    rates = rates or [5, 10, 20, 40]
+    return [(f"{rate:g}/s", rate, synthetic_stream(rate, args.duration, args.chat_fraction, args.arrival, args.seed + i))
+            for i, rate in enumerate(rates)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rates", help="comma-separated arrival rates in requests/s (default 5,10,20,40)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per rate level")
+    parser.add_argument("--arrival", choices=["poisson", "uniform"], default="poisson")
+    parser.add_argument("--chat-fraction", type=float, default=0.3, help="share of /chat requests in synthetic traffic")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--replay", help="JSON-lines request log to replay")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed-up of the recorded timing")
+    parser.add_argument("--save-stream", help="write the generated request stream as a replayable log")
+    parser.add_argument("--url", help="drive an already running API instead of starting one")
+    parser.add_argument("--in-process", action="store_true", help="drive the ASGI app in this process")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--retrieval-latency-ms", type=float, default=10.0)
+    parser.add_argument("--slo-ms", type=float, default=2000.0, help="p99 latency above which a level is saturated")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--max-inflight", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--pause", type=float, default=1.0, help="seconds of idle time between levels")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    streams = build_streams(args)
+    if args.save_stream:
+        # Levels one after another, as they will be sent
+        combined, offset = [], 0.0
+        for _, _, stream in streams:
+            combined += [(offset + t, path, body) for t, path, body in stream]
+            offset = combined[-1][0] if combined else offset
+        save_stream(combined, args.save_stream)
+
+    server = None
+    if args.in_process:
+        client = in_process_client(args)
+        target = "in-process"
+    else:
+        if args.url:
+            base_url = args.url
+        else:
+            server, base_url = start_server(args)
+        limits = httpx.Limits(max_connections=args.max_inflight, max_keepalive_connections=100)
+        client = httpx.AsyncClient(base_url=base_url, limits=limits)
+        target = base_url
+
+    async def run():
+        async with client:
+            return await run_levels(args, client, streams)
+
+    print(f"{'level':<12}{'offered':>9}{'sent':>9}{'ok/s':>9}{'errors':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    try:
+        levels = asyncio.run(run())
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    sustainable = [level["offered_rps"] for level in levels if not level["saturated"] and level["offered_rps"]]
+    first_saturated = next((level["offered_rps"] for level in levels if level["saturated"]), None)
+    report = {
+        "target": target,
+        "source": args.replay or "synthetic",
+        "slo_p99_ms": args.slo_ms,
+        "max_sustainable_rps": max(sustainable) if sustainable else None,
+        "saturation_rps": first_saturated,
+        "levels": levels,
+    }
+    if first_saturated is not None:
+        within = report["max_sustainable_rps"]
+        print(f"Saturated at {first_saturated} req/s; "
+              + (f"highest level within the SLO: {within} req/s" if within else "no level stayed within the SLO"))
+    else:
+        print("No level saturated; raise --rates to find the limit")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Per-worker memory and /predict throughput of the gunicorn production mode.
+
+Starts `gunicorn -c covid_predictor_api/gunicorn.conf.py` with 1, 2 and 4 workers, with and
+without `preload_app`, drives /predict with a closed loop of clients, then reads every worker's
+/proc/<pid>/smaps_rollup. USS is what each additional worker really costs; with preloading the
+model, encoders and imported libraries are shared copy-on-write with the master and show up
+in PSS split across the workers instead.
+
+    python benchmarks/multiworker.py --workers 1,2,4 --clients 16 --duration 10
+
+The app uses the fake LLM and stub retriever (offline.py) with the explanation cache on, so
+throughput is bounded by the sklearn model and preprocessing rather than by Azure. Scaling
+with workers needs as many free CPU cores as workers.
+"""
+import os
+import sys
+import json
+import asyncio
+import argparse
+import subprocess
+
+from offline import REPO_ROOT, API_DIR, add_import_paths, use_offline_rag
+from concurrency import free_port, run_level, wait_until_up
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def offline_app():
+    """gunicorn app factory: the real API wired to the offline LLM and retriever"""
+    use_offline_rag(float(os.getenv("BENCH_LLM_LATENCY_MS", "50")), explanation_cache=True)
+    add_import_paths()
+    from main import app
+
+    return app
+
+
+def children(pid: int) -> list:
+    """PIDs whose parent is `pid` (the gunicorn workers of a master)"""
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces, so split after its closing parenthesis
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+def run_config(workers: int, preload: bool, clients: int, duration: float, llm_latency_ms: float) -> dict:
+    from app.memory import process_memory
+
+    port = free_port()
+    env = {
+        **os.environ,
+        "WEB_CONCURRENCY": str(workers),
+        "GUNICORN_PRELOAD": "1" if preload else "0",
+        "BENCH_LLM_LATENCY_MS": str(llm_latency_ms),
+        "PYTHONPATH": os.pathsep.join([BENCH_DIR, str(API_DIR), str(REPO_ROOT)]),
+    }
+    master = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", str(API_DIR / "gunicorn.conf.py"),
+         "--bind", f"127.0.0.1:{port}", "--log-level", "warning", "multiworker:offline_app()"],
+        env=env,
+        cwd=BENCH_DIR,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_up(base_url)
+        load = asyncio.run(run_level(base_url, "/predict", clients, duration))
+        memory = [process_memory(pid) for pid in children(master.pid)]
+        master_memory = process_memory(master.pid)
+    finally:
+        master.terminate()
+        master.wait()
+
+    def mean(field):
+        return round(sum(m[field] for m in memory) / len(memory), 1)
+
+    return {
+        "workers": workers,
+        "preload": preload,
+        "rps": load["rps"],
+        "p50_ms": load["p50_ms"],
+        "p95_ms": load["p95_ms"],
+        "errors": load["errors"],
+        "worker_uss_mb": mean("uss_mb"),
+        "worker_pss_mb": mean("pss_mb"),
+        "worker_rss_mb": mean("rss_mb"),
+        "master_rss_mb": master_memory["rss_mb"],
+        # PSS sums to the memory the whole deployment actually occupies
+        "total_pss_mb": round(master_memory["pss_mb"] + sum(m["pss_mb"] for m in memory), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent /predict clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load per configuration")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        sys.exit("This benchmark reads /proc/<pid>/smaps_rollup and needs Linux")
+    add_import_paths()
+
+    results = []
+    print(f"{'workers':>8}{'preload':>9}{'req/s':>9}{'p95 ms':>9}{'USS/wkr':>10}{'PSS/wkr':>10}{'RSS/wkr':>10}{'total PSS':>11}")
+    for workers in [int(x) for x in args.workers.split(",")]:
+        for preload in (False, True):
+            r = run_config(workers, preload, args.clients, args.duration, args.llm_latency_ms)
+            results.append(r)
+            print(f"{r['workers']:>8}{'yes' if preload else 'no':>9}{r['rps']:>9}{r['p95_ms']:>9}"
+                  f"{r['worker_uss_mb']:>10}{r['worker_pss_mb']:>10}{r['worker_rss_mb']:>10}{r['total_pss_mb']:>11}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Offline stand-ins shared by the benchmark scripts.
+
+The RAG pipeline normally needs Azure credentials, the MiniLM embedding model and the FAISS
+index. Benchmarks swap in the deterministic fake LLM provider and a stub retriever with a
+configurable latency, so the API can be measured on any machine.
+"""
+import os
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+API_DIR = REPO_ROOT / "covid_predictor_api"
+DATASET_PATH = REPO_ROOT / "data" / "Covid-19 Dataset.csv"
+
+DATE_COLUMNS = [
+    "Date_of_Infection", "Hospital_Admission_Date", "Hospital_Discharge_Date",
+    "Date_of_Recovery", "Date_of_Reinfection", "Date_of_Last_Dose",
+]
+
+SAMPLE_QUESTIONS = [
+    "How effective are vaccines against new variants?",
+    "How does vaccination impact reinfection rates?",
+    "What is the likelihood of reinfection after recovery?",
+    "How does age affect COVID-19 outcomes?",
+    "What are the common symptoms of Long COVID?",
+    "Does a booster dose reduce the risk of Omicron reinfection?",
+    "Are smokers more likely to be reinfected?",
+    "How long does natural immunity last after infection?",
+]
+
+EVIDENCE = [
+    "Vaccination substantially reduced the risk of reinfection during the Omicron wave.",
+    "Hybrid immunity from infection plus vaccination gave the most durable protection.",
+    "Older age and comorbidities were associated with severe reinfection outcomes.",
+]
+
+
+def measure(fn, min_seconds: float, max_repeats: int = 1000, setup=None) -> list:
+    """Per-call seconds, repeating until `min_seconds` have elapsed (at least 3 calls).
+
+    `setup` runs untimed before every call, e.g. to reset a file the call appends to.
+    """
+    if setup:
+        setup()
+    fn()  # warm-up
+    timings, total = [], 0.0
+    while (total < min_seconds or len(timings) < 3) and len(timings) < max_repeats:
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+        total += timings[-1]
+    return timings
+
+
+def add_import_paths():
+    """Make `RagModule.*` and the API's `app.*`/`main` importable from the repo root"""
+    for path in (REPO_ROOT, API_DIR):
+        if str(path) not in sys.path:
+            sys.path.insert(0, str(path))
+
+
+class StubRetriever:
+    """Returns fixed evidence after `latency` seconds (stands in for embedding + FAISS search)"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def invoke(self, query):
+        from langchain_core.documents import Document
+
+        if self.latency:
+            time.sleep(self.latency)
+        return [Document(page_content=text, metadata={"pmid": i}) for i, text in enumerate(EVIDENCE)]
+
+
+def use_offline_rag(llm_latency_ms: float = 0, retrieval_latency_ms: float = 0, explanation_cache: bool = False):
+    """Configure the fake LLM and stub retriever; returns the rag_pipeline module"""
+    workdir = Path(tempfile.mkdtemp(prefix="covid-bench-"))
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(llm_latency_ms)
+    os.environ["EXPLANATION_CACHE"] = "on" if explanation_cache else "off"
+    os.environ["EXPLANATION_CACHE_PATH"] = str(workdir / "explanation_cache.sqlite")
+    add_import_paths()
+
+    from RagModule.scripts import rag_pipeline
+
+    rag_pipeline.LOG_PATH = str(workdir / "qna_history.json")
+    rag_pipeline._retriever = StubRetriever(retrieval_latency_ms / 1000)
+    return rag_pipeline
+
+
+def sample_patients(n: int = None, path: Path = DATASET_PATH) -> list:
+    """Rows of the raw dataset as `/predict` payloads (PatientFeatures-shaped dicts)"""
+    df = pd.read_csv(path).dropna(subset=DATE_COLUMNS)
+    df = df.drop(columns=["Patient_ID", "Reinfection"])
+    for column in DATE_COLUMNS:
+        df[column] = pd.to_datetime(df[column]).dt.strftime("%Y-%m-%dT00:00:00.000Z")
+    object_columns = df.select_dtypes(exclude="number").columns
+    df[object_columns] = df[object_columns].fillna("None")
+    records = df.to_dict(orient="records")
+    if n is None:
+        return records
+    return [records[i % len(records)] for i in range(n)]
@@ -0,0 +1,261 @@
+"""Latency benchmarks of the prediction and RAG hot paths, saved as JSON for commit-to-commit comparison.
+
+Cases (sizes are patients per request, FAISS index documents, or Q&A log entries):
+- preprocess_input_data, get_prediction, attributions: batch sizes from --sizes
+- build_query: one patient dict
+- faiss_load, retriever_search: a FAISS index of the PubMed abstracts, tiled to --index-docs
+- log_qna: one append to a Q&A log that already holds --log-entries records
+- predict_endpoint, chat_endpoint: full /predict and /chat requests through the ASGI app
+- api_import: `import main` in a fresh interpreter (model + compiled model load)
+
+Everything runs offline: the fake LLM provider, a stub retriever for the endpoints and a
+deterministic hash embedding for the FAISS cases (pass --embeddings minilm to use the real
+sentence-transformers model if it is installed). The explanation and prediction caches are off
+so every /predict runs the model and the LLM call.
+
+    python benchmarks/suite.py --output before.json
+    # ...change something...
+    python benchmarks/suite.py --output after.json
+    python benchmarks/compare.py before.json after.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from offline import API_DIR, REPO_ROOT, SAMPLE_QUESTIONS, measure, sample_patients, use_offline_rag
+
+SCHEMA_VERSION = 1
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+ABSTRACTS_PATH = REPO_ROOT / "RagModule" / "data" / "pubmed_abstracts.csv"
+CASES = [
+    "preprocess_input_data", "get_prediction", "attributions", "build_query", "faiss_load", "retriever_search",
+    "log_qna", "predict_endpoint", "chat_endpoint", "api_import",
+]
+
+
+def summarize(name: str, params: dict, timings: list) -> dict:
+    ms = sorted(t * 1000 for t in timings)
+    result = {
+        "name": name,
+        "params": params,
+        "median_ms": round(statistics.median(ms), 4),
+        "p95_ms": round(ms[min(len(ms) - 1, int(0.95 * len(ms)))], 4),
+        "min_ms": round(ms[0], 4),
+        "mean_ms": round(statistics.fmean(ms), 4),
+        "runs": len(ms),
+    }
+    label = ", ".join(f"{k}={v}" for k, v in params.items())
+    print(f"{name:<24}{label:<34}{result['median_ms']:>12.3f}{result['p95_ms']:>12.3f}{result['runs']:>7}")
+    return result
+
+
+def git_metadata() -> dict:
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return {"git_commit": git("rev-parse", "HEAD"), "git_dirty": bool(status) if status is not None else None}
+
+
+def build_embeddings(kind: str):
+    if kind == "minilm":
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        from RagModule.scripts.chunk_store import EMBEDDING_MODEL
+
+        return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    # Same dimension as all-MiniLM-L6-v2
+    return DeterministicFakeEmbedding(size=384)
+
+
+def bench_model(sizes: list, min_seconds: float, cases: set) -> list:
+    from app.model_interface import explain_frame, get_prediction
+    from app.preprocessing import build_feature_frame, preprocess_input_data
+    from app.schemas import PatientFeatures
+
+    results = []
+    for size in sizes:
+        patients = [PatientFeatures(**record) for record in sample_patients(size)]
+        if "preprocess_input_data" in cases:
+            results.append(summarize("preprocess_input_data", {"batch_size": size},
+                                     measure(lambda: preprocess_input_data(patients), min_seconds)))
+        if "get_prediction" in cases:
+            results.append(summarize("get_prediction", {"batch_size": size},
+                                     measure(lambda: get_prediction(patients), min_seconds)))
+        if "attributions" in cases:
+            frame = build_feature_frame(patients)
+            results.append(summarize("attributions", {"batch_size": size},
+                                     measure(lambda: explain_frame(frame), min_seconds)))
+    return results
+
+
+def bench_build_query(min_seconds: float) -> list:
+    from RagModule.scripts.rag_pipeline import build_query
+
+    patient = sample_patients(1)[0]
+    return [summarize("build_query", {}, measure(lambda: build_query(patient), min_seconds, max_repeats=100_000))]
+
+
+def bench_faiss(index_sizes: list, embeddings_kind: str, min_seconds: float, workdir: Path, cases: set) -> list:
+    from langchain_community.vectorstores import FAISS
+
+    embeddings = build_embeddings(embeddings_kind)
+    abstracts = pd.read_csv(ABSTRACTS_PATH)["text"].astype(str).tolist()
+    results = []
+    for size in index_sizes:
+        texts = [abstracts[i % len(abstracts)] for i in range(size)]
+        path = str(workdir / f"faiss_{size}")
+        FAISS.from_texts(texts, embeddings).save_local(path)
+
+        def load():
+            return FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+
+        params = {"index_docs": size, "embeddings": embeddings_kind}
+        if "faiss_load" in cases:
+            results.append(summarize("faiss_load", params, measure(load, min_seconds)))
+        if "retriever_search" in cases:
+            retriever = load().as_retriever(search_kwargs={"k": 3})
+            queries = iter(range(10**9))
+            results.append(summarize("retriever_search", params, measure(
+                lambda: retriever.invoke(SAMPLE_QUESTIONS[next(queries) % len(SAMPLE_QUESTIONS)]), min_seconds)))
+    return results
+
+
+def bench_log_qna(log_sizes: list, min_seconds: float, workdir: Path) -> list:
+    from RagModule.scripts import rag_pipeline
+
+    results = []
+    for size in log_sizes:
+        template = workdir / f"qna_history_{size}.json"
+        history = [
+            {"timestamp": "2025-01-01T00:00:00", "question": SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)],
+             "answer": "According to the evidence, vaccination reduces the risk of reinfection. " * 4}
+            for i in range(size)
+        ]
+        template.write_text(json.dumps(history, indent=2), encoding="utf-8")
+        log_path = workdir / "qna_history.json"
+        rag_pipeline.LOG_PATH = str(log_path)
+
+        # Each call appends, so restore the log to `size` entries before every timed call
+        results.append(summarize("log_qna", {"log_entries": size}, measure(
+            lambda: rag_pipeline.log_qna("How long does immunity last?", "Several months."),
+            min_seconds, setup=lambda: shutil.copyfile(template, log_path))))
+    return results
+
+
+def bench_endpoints(sizes: list, min_seconds: float, workdir: Path, cases: set) -> list:
+    from fastapi.testclient import TestClient
+
+    from RagModule.scripts import rag_pipeline
+    from main import app
+
+    log_path = workdir / "endpoint_qna_history.json"
+    rag_pipeline.LOG_PATH = str(log_path)
+
+    def reset_log():
+        log_path.unlink(missing_ok=True)
+
+    results = []
+    with TestClient(app) as client:
+        def post(path, body):
+            response = client.post(path, json=body)
+            response.raise_for_status()
+
+        if "predict_endpoint" in cases:
+            for size in sizes:
+                body = sample_patients(size)
+                results.append(summarize("predict_endpoint", {"batch_size": size},
+                                         measure(lambda: post("/predict", body), min_seconds)))
+        if "chat_endpoint" in cases:
+            results.append(summarize("chat_endpoint", {}, measure(
+                lambda: post("/chat", {"question": SAMPLE_QUESTIONS[0]}), min_seconds, setup=reset_log)))
+    return results
+
+
+def bench_api_import(repeats: int) -> list:
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([str(API_DIR), str(REPO_ROOT)])}
+
+    def run(code):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=API_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+        return time.perf_counter() - start
+
+    baseline = statistics.median(run("pass") for _ in range(3))
+    # Interpreter start-up is subtracted so only the import itself is reported
+    timings = [max(run("import main") - baseline, 0.0) for _ in range(repeats)]
+    return [summarize("api_import", {}, timings)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1,100,1000", help="patients per request for the model and /predict cases")
+    parser.add_argument("--index-docs", default="400,4000", help="documents in the FAISS index")
+    parser.add_argument("--log-entries", default="0,1000,10000", help="records already in the Q&A log")
+    parser.add_argument("--embeddings", choices=["fake", "minilm"], default="fake")
+    parser.add_argument("--import-repeats", type=int, default=5)
+    parser.add_argument("--min-seconds", type=float, default=0.5, help="measurement time per case and size")
+    parser.add_argument("--only", help=f"comma-separated subset of: {', '.join(CASES)}")
+    parser.add_argument("--output", help="JSON file to write (default: benchmarks/results/<commit>.json)")
+    args = parser.parse_args()
+
+    cases = set(args.only.split(",")) if args.only else set(CASES)
+    unknown = cases - set(CASES)
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+    sizes = [int(x) for x in args.sizes.split(",")]
+
+    os.environ["PREDICTION_CACHE"] = "off"
+    use_offline_rag()
+    workdir = Path(tempfile.mkdtemp(prefix="covid-suite-"))
+
+    print(f"{'case':<24}{'params':<34}{'median ms':>12}{'p95 ms':>12}{'runs':>7}")
+    results = []
+    try:
+        if cases & {"preprocess_input_data", "get_prediction", "attributions"}:
+            results += bench_model(sizes, args.min_seconds, cases)
+        if "build_query" in cases:
+            results += bench_build_query(args.min_seconds)
+        if cases & {"faiss_load", "retriever_search"}:
+            index_sizes = [int(x) for x in args.index_docs.split(",")]
+            results += bench_faiss(index_sizes, args.embeddings, args.min_seconds, workdir, cases)
+        if "log_qna" in cases:
+            results += bench_log_qna([int(x) for x in args.log_entries.split(",")], args.min_seconds, workdir)
+        if cases & {"predict_endpoint", "chat_endpoint"}:
+            results += bench_endpoints(sizes, args.min_seconds, workdir, cases)
+        if "api_import" in cases:
+            results += bench_api_import(args.import_repeats)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    meta = {
+        "schema": SCHEMA_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        **git_metadata(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "min_seconds": args.min_seconds,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{(meta['git_commit'] or 'unknown')[:12]}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+    print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
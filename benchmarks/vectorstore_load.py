@@ -0,0 +1,137 @@
+"""Load time and memory of the pickled FAISS docstore vs the SQLite chunk store.
+
+Builds a vector store of --chunks synthetic chunks (the PubMed abstract chunks tiled, each made
+unique, with random --dim vectors) in both formats, then loads each one in a fresh interpreter
+and reports:
+
+- load_s: time to get a ready-to-search vector store
+- rss_mb: resident memory right after loading, and peak_rss_mb over load plus one search
+- private_mb: anonymous (unshared) memory after the search; memory-mapped index pages are
+  file-backed, so they count toward peak_rss_mb but are shared with every other process
+- search_ms: one top-3 search including the docstore lookups
+
+    python benchmarks/vectorstore_load.py --chunks 10000,1000000
+"""
+import sys
+import json
+import time
+import pickle
+import argparse
+import subprocess
+import tempfile
+from pathlib import Path
+
+from offline import REPO_ROOT
+
+ABSTRACTS_PATH = REPO_ROOT / "RagModule" / "data" / "pubmed_abstracts.csv"
+VECTOR_BLOCK = 100_000
+
+
+def build_stores(chunks: int, dim: int, folder: Path):
+    """The same index and chunks saved as folder/pickle (FAISS.save_local) and folder/chunk-store"""
+    import faiss
+    import numpy as np
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_core.documents import Document
+
+    from RagModule.scripts.build_vectorstore import load_abstracts, split_abstracts
+    from RagModule.scripts.chunk_store import CHUNKS_FILE, INDEX_FILE, SQLiteDocstore
+
+    base = split_abstracts(load_abstracts(str(ABSTRACTS_PATH)))
+    rng = np.random.default_rng(0)
+    index = faiss.IndexFlatL2(dim)
+    for start in range(0, chunks, VECTOR_BLOCK):
+        index.add(rng.standard_normal((min(VECTOR_BLOCK, chunks - start), dim), dtype=np.float32))
+
+    def documents(start, stop):
+        for i in range(start, stop):
+            text, metadata = base[i % len(base)]
+            yield str(i), Document(id=str(i), page_content=f"{text} [{i}]", metadata=metadata)
+
+    legacy, store = folder / "pickle", folder / "chunk-store"
+    for path in (legacy, store):
+        path.mkdir()
+        faiss.write_index(index, str(path / INDEX_FILE))
+    del index
+
+    docstore = SQLiteDocstore(str(store / CHUNKS_FILE))
+    for start in range(0, chunks, VECTOR_BLOCK):
+        docstore.add(dict(documents(start, min(start + VECTOR_BLOCK, chunks))))
+    docstore.close()
+
+    with open(legacy / "index.pkl", "wb") as f:
+        pickle.dump((InMemoryDocstore(dict(documents(0, chunks))), {i: str(i) for i in range(chunks)}), f)
+
+
+def memory_mb(field: str) -> float:
+    # VmHWM rather than ru_maxrss, which carries the parent's peak across fork + exec
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith(field)) / 1024
+
+
+def run_load(mode: str, folder: str, dim: int) -> dict:
+    import numpy as np
+    from langchain_core.embeddings import FakeEmbeddings
+
+    from RagModule.scripts.chunk_store import load_vectorstore
+
+    embeddings = FakeEmbeddings(size=dim)
+    start = time.perf_counter()
+    store = load_vectorstore(str(Path(folder) / mode), embeddings)
+    load_s = time.perf_counter() - start
+    rss = memory_mb("VmRSS")
+
+    query = np.random.default_rng(1).standard_normal(dim).tolist()
+    start = time.perf_counter()
+    hits = store.similarity_search_by_vector(query, k=3)
+    search_ms = (time.perf_counter() - start) * 1000
+    assert len(hits) == 3
+    return {
+        "load_s": round(load_s, 3),
+        "rss_mb": round(rss, 1),
+        "peak_rss_mb": round(memory_mb("VmHWM"), 1),
+        "private_mb": round(memory_mb("RssAnon"), 1),
+        "search_ms": round(search_ms, 1),
+    }
+
+
+def measure_subprocess(mode: str, folder: Path, dim: int) -> dict:
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", mode, str(folder), "--dim", str(dim)],
+        check=True, capture_output=True, text=True, cwd=REPO_ROOT,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", default="10000,1000000", help="comma-separated store sizes")
+    parser.add_argument("--dim", type=int, default=384, help="vector dimension (MiniLM: 384)")
+    # The pickle run can push the other index file out of the page cache, so it goes last
+    parser.add_argument("--modes", default="chunk-store,pickle")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "FOLDER"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    sys.path.insert(0, str(REPO_ROOT))
+
+    if args.child:
+        print(json.dumps(run_load(*args.child, args.dim)))
+        return
+
+    results = []
+    print(f"{'chunks':>10}{'mode':>14}{'load s':>10}{'RSS MB':>10}{'peak MB':>10}{'private MB':>12}{'search ms':>11}")
+    for chunks in (int(n) for n in args.chunks.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            build_stores(chunks, args.dim, Path(tmp))
+            for mode in args.modes.split(","):
+                result = {"chunks": chunks, "dim": args.dim, "mode": mode, **measure_subprocess(mode, Path(tmp), args.dim)}
+                results.append(result)
+                print(f"{chunks:>10}{mode:>14}{result['load_s']:>10}{result['rss_mb']:>10}"
+                      f"{result['peak_rss_mb']:>10}{result['private_mb']:>12}{result['search_ms']:>11}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
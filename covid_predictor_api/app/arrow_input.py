@@ -0,0 +1,124 @@
+"""Apache Arrow IPC input for high-volume `/predict/arrow` clients.
+
+A JSON `/predict` batch is parsed into one Pydantic object per patient and turned back into
+dicts. Here the request body is an Arrow IPC stream (or file) whose columns are the
+PatientFeatures fields. The schema is checked once per column, and the columns go straight
+into `engineer_features` without per-row Python objects.
+
+pyarrow is optional: without it only this endpoint is unavailable.
+"""
+from datetime import datetime
+
+import pandas as pd
+
+from app.preprocessing import engineer_features
+from app.schemas import PatientFeatures
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # optional dependency
+    pa = None
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+class ArrowInputError(ValueError):
+    """The Arrow payload cannot be read or does not match PatientFeatures"""
+
+    def __init__(self, errors: list):
+        self.errors = errors
+        super().__init__("; ".join(errors))
+
+
+def arrow_available() -> bool:
+    return pa is not None
+
+
+def read_ipc(body: bytes) -> "pa.Table":
+    """Arrow IPC stream or file format, whichever the client sent"""
+    buffer = pa.py_buffer(body)
+    try:
+        return pa.ipc.open_stream(buffer).read_all()
+    except pa.ArrowInvalid:
+        pass
+    try:
+        return pa.ipc.open_file(buffer).read_all()
+    except pa.ArrowInvalid as e:
+        raise ArrowInputError([f"Body is not an Arrow IPC stream or file: {e}"])
+
+
+def _is_string(arrow_type) -> bool:
+    if pa.types.is_dictionary(arrow_type):
+        arrow_type = arrow_type.value_type
+    return pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type)
+
+
+# Arrow types accepted for each PatientFeatures annotation
+_ACCEPTS = {
+    int: lambda t: pa.types.is_integer(t),
+    float: lambda t: pa.types.is_integer(t) or pa.types.is_floating(t),
+    str: _is_string,
+    datetime: lambda t: pa.types.is_timestamp(t) or pa.types.is_date(t) or _is_string(t),
+}
+
+
+def records_columns_from_arrow(table: "pa.Table") -> dict:
+    """Validate `table` column by column and return one numpy array per PatientFeatures field"""
+    errors = []
+    columns = {}
+    for name, field in PatientFeatures.model_fields.items():
+        if name not in table.column_names:
+            errors.append(f"{name}: missing column")
+            continue
+        column = table.column(name)
+        if not _ACCEPTS[field.annotation](column.type):
+            errors.append(f"{name}: expected {field.annotation.__name__}, got Arrow type {column.type}")
+            continue
+        if column.null_count:
+            errors.append(f"{name}: {column.null_count} null values")
+            continue
+
+        if field.annotation is datetime and _is_string(column.type):
+            try:
+                # Arrow's own parser handles ISO 8601 with a zone offset ("...Z") in C
+                values = column.cast(pa.string()).cast(pa.timestamp("ns", tz="UTC")).to_numpy()
+            except pa.ArrowInvalid:
+                # Naive or malformed strings: pandas takes naive values as UTC and reports bad ones
+                parsed = pd.to_datetime(column.to_numpy(zero_copy_only=False), format="ISO8601", utc=True, errors="coerce")
+                if parsed.isna().any():
+                    errors.append(f"{name}: {int(parsed.isna().sum())} values are not ISO 8601 datetimes")
+                    continue
+                values = parsed.tz_localize(None).to_numpy(dtype="datetime64[ns]")
+        elif _is_string(column.type):
+            values = column.cast(pa.string()).to_numpy(zero_copy_only=False)
+        else:
+            # Timestamps come out as naive UTC datetime64, numbers as int64/float64
+            values = column.to_numpy()
+        columns[name] = values
+
+    if errors:
+        raise ArrowInputError(errors)
+    return columns
+
+
+def arrow_columns(body: bytes) -> dict:
+    """Validated PatientFeatures columns of an Arrow IPC payload"""
+    table = read_ipc(body)
+    if table.num_rows == 0:
+        raise ArrowInputError(["No patient rows in the Arrow payload"])
+    return records_columns_from_arrow(table)
+
+
+def arrow_feature_frame(body: bytes) -> pd.DataFrame:
+    """Engineered, unscaled features for every row of an Arrow IPC payload"""
+    return engineer_features(arrow_columns(body))
+
+
+def predictions_to_ipc(predictions: list) -> bytes:
+    """Predictions as a one-column Arrow IPC stream"""
+    table = pa.table({"reinfection_prediction": pa.array(predictions, type=pa.string())})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,319 @@
+"""Array-based tree evaluation with the scaler folded into the split thresholds.
+
+sklearn's `predict` re-validates its input and dispatches every estimator separately on
+each call, which dominates the cost of scoring a single patient. `compile_model` flattens
+all trees of a DecisionTree, RandomForest or GradientBoosting classifier into shared node
+arrays and rewrites every split threshold into the unscaled feature space, so serving skips
+both `scaler.transform` and sklearn's per-call overhead. Predictions and probabilities are
+bit-identical to `model.predict(scaler.transform(X))`.
+
+Export the compiled form next to the pickles (rerun after retraining):
+
+    cd covid_predictor_api
+    python -m app.compiled_model
+"""
+import hashlib
+from pathlib import Path
+
+import numpy as np
+from scipy.special import expit
+
+MODEL_DIR = Path(__file__).resolve().parent.parent / "model"
+COMPILED_MODEL_PATH = MODEL_DIR / "compiled_model.npz"
+FORMAT_VERSION = 2
+
+# Rows evaluated at once; bounds the (rows x trees) node-index working set
+CHUNK_ROWS = 4096
+
+_SIGN_MASK = np.int64(0x7FFFFFFFFFFFFFFF)
+
+
+class UnsupportedModelError(TypeError):
+    """The estimator cannot be compiled; callers fall back to sklearn"""
+
+
+def source_hash(*paths) -> str:
+    """Fingerprint of the pickles a compiled model was built from"""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(Path(path).read_bytes())
+    return digest.hexdigest()
+
+
+def _float_order(bits: np.ndarray) -> np.ndarray:
+    # Maps float64 bit patterns to int64 keys that sort like the floats (and back again)
+    return bits ^ ((bits >> 63) & _SIGN_MASK)
+
+
+def fold_thresholds(threshold, mean, scale) -> np.ndarray:
+    """Largest float64 x with float32((x - mean) / scale) <= threshold, element-wise.
+
+    sklearn scales in float64 and casts to float32 before comparing against the float64
+    split threshold. Every step of that chain is monotonic in x, so the split
+    `scaled <= threshold` is exactly `x <= T` for the T returned here, found by bisecting
+    over the float64 values in sort order (64 halvings cover all of them).
+    """
+    threshold = np.asarray(threshold, dtype=np.float64)
+    mean = np.broadcast_to(np.asarray(mean, dtype=np.float64), threshold.shape)
+    scale = np.broadcast_to(np.asarray(scale, dtype=np.float64), threshold.shape)
+
+    lo = np.full(threshold.shape, _float_order(np.array(-np.inf).view(np.int64)))
+    hi = np.full(threshold.shape, _float_order(np.array(np.inf).view(np.int64)))
+    with np.errstate(over="ignore", invalid="ignore"):
+        for _ in range(64):
+            # Overflow-free midpoint of two int64 keys
+            mid = (lo >> 1) + (hi >> 1) + (lo & hi & 1)
+            x = _float_order(mid).view(np.float64)
+            below = ((x - mean) / scale).astype(np.float32) <= threshold
+            lo = np.where(below, mid, lo)
+            hi = np.where(below, hi, mid)
+    return _float_order(lo).view(np.float64)
+
+
+class CompiledTreeModel:
+    """Flattened trees of one classifier evaluated directly on unscaled features"""
+
+    ARRAYS = ("classes", "feature_names", "roots", "feature", "threshold", "left", "right",
+              "missing_left", "value", "cover", "init_raw")
+
+    def __init__(self, kind, classes, feature_names, roots, feature, threshold, left, right,
+                 missing_left, value, cover, init_raw, learning_rate=1.0, max_depth=0, source_hash=""):
+        self.kind = kind
+        self.classes = np.asarray(classes)
+        self.feature_names = [str(name) for name in feature_names]
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.feature = np.asarray(feature, dtype=np.intp)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.intp)
+        self.right = np.asarray(right, dtype=np.intp)
+        self.missing_left = np.asarray(missing_left, dtype=bool)
+        self.value = np.asarray(value, dtype=np.float64)
+        # Weighted training samples that reached each node (used by app/attributions.py)
+        self.cover = np.asarray(cover, dtype=np.float64)
+        self.init_raw = np.asarray(init_raw, dtype=np.float64)
+        self.learning_rate = float(learning_rate)
+        self.max_depth = int(max_depth)
+        self.source_hash = source_hash
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    def _leaves(self, chunk: np.ndarray) -> np.ndarray:
+        flat = chunk.ravel()
+        row_offset = (np.arange(len(chunk)) * chunk.shape[1])[:, None]
+        has_nan = bool(np.isnan(chunk).any())
+        node = np.repeat(self.roots[None, :], len(chunk), axis=0)
+        # Leaves point to themselves, so a fixed number of steps reaches every leaf
+        for _ in range(self.max_depth):
+            x = flat[row_offset + self.feature[node]]
+            go_left = x <= self.threshold[node]
+            if has_nan:
+                go_left |= np.isnan(x) & self.missing_left[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def _chunks(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != len(self.feature_names):
+            raise ValueError(f"Expected {len(self.feature_names)} features, got shape {X.shape}")
+        for start in range(0, len(X), CHUNK_ROWS):
+            yield slice(start, start + CHUNK_ROWS), self._leaves(X[start:start + CHUNK_ROWS])
+
+    def apply(self, X) -> np.ndarray:
+        """Leaf reached in every tree, shape (n_rows, n_trees), as flat node indices"""
+        return np.concatenate([leaves for _, leaves in self._chunks(X)] or [np.empty((0, self.n_trees), np.intp)])
+
+    def _raw_predict(self, leaves: np.ndarray) -> np.ndarray:
+        # Trees are stored stage-major, K per stage. Contributions are added stage by stage
+        # after the init prior, in the order of sklearn's predict_stages; cumsum is strictly
+        # sequential, unlike sum, which would change the rounding
+        columns = len(self.init_raw)
+        steps = self.learning_rate * self.value[leaves, 0].reshape(len(leaves), -1, columns)
+        init = np.broadcast_to(self.init_raw, (len(leaves), 1, columns))
+        return np.cumsum(np.concatenate([init, steps], axis=1), axis=1)[:, -1]
+
+    def _predict_proba(self, leaves: np.ndarray) -> np.ndarray:
+        if self.kind == "tree":
+            return self.value[leaves[:, 0]]
+        if self.kind == "forest":
+            # Summed tree by tree, then averaged, like ForestClassifier.predict_proba
+            return np.cumsum(self.value[leaves], axis=1)[:, -1] / self.n_trees
+        raw = self._raw_predict(leaves)
+        if raw.shape[1] == 1:
+            proba = np.empty((len(raw), 2))
+            proba[:, 1] = expit(raw[:, 0])
+            proba[:, 0] = 1 - proba[:, 1]
+            return proba
+        from sklearn._loss.loss import HalfMultinomialLoss
+
+        return HalfMultinomialLoss(n_classes=raw.shape[1]).predict_proba(raw)
+
+    def _predict(self, leaves: np.ndarray) -> np.ndarray:
+        if self.kind == "boosting":
+            raw = self._raw_predict(leaves)
+            if raw.shape[1] == 1:
+                return self.classes[(raw[:, 0] >= 0).astype(int)]
+            return self.classes[np.argmax(raw, axis=1)]
+        return self.classes.take(np.argmax(self._predict_proba(leaves), axis=1), axis=0)
+
+    def predict_proba(self, X) -> np.ndarray:
+        proba = np.empty((len(X), len(self.classes)))
+        for rows, leaves in self._chunks(X):
+            proba[rows] = self._predict_proba(leaves)
+        return proba
+
+    def predict(self, X) -> np.ndarray:
+        predictions = np.empty(len(X), dtype=self.classes.dtype)
+        for rows, leaves in self._chunks(X):
+            predictions[rows] = self._predict(leaves)
+        return predictions
+
+    def save(self, path=COMPILED_MODEL_PATH):
+        arrays = {name: getattr(self, name) for name in self.ARRAYS}
+        arrays["feature_names"] = np.asarray(self.feature_names)
+        np.savez_compressed(
+            path,
+            format_version=FORMAT_VERSION,
+            kind=self.kind,
+            learning_rate=self.learning_rate,
+            max_depth=self.max_depth,
+            source_hash=self.source_hash,
+            **arrays,
+        )
+
+    @classmethod
+    def load(cls, path=COMPILED_MODEL_PATH) -> "CompiledTreeModel":
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["format_version"]) != FORMAT_VERSION:
+                raise ValueError(f"{path} was exported with an incompatible format version")
+            return cls(
+                kind=str(data["kind"]),
+                learning_rate=float(data["learning_rate"]),
+                max_depth=int(data["max_depth"]),
+                source_hash=str(data["source_hash"]),
+                **{name: data[name] for name in cls.ARRAYS},
+            )
+
+
+def _estimators(model):
+    """(kind, flat list of trees) for a supported classifier"""
+    from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier, ExtraTreesClassifier
+    from sklearn.tree import DecisionTreeClassifier
+
+    if getattr(model, "n_outputs_", 1) != 1:
+        raise UnsupportedModelError("Multi-output models are not supported")
+    if isinstance(model, DecisionTreeClassifier):
+        return "tree", [model]
+    if isinstance(model, (RandomForestClassifier, ExtraTreesClassifier)):
+        return "forest", list(model.estimators_)
+    if isinstance(model, GradientBoostingClassifier):
+        if model.loss != "log_loss":
+            raise UnsupportedModelError(f"GradientBoosting loss {model.loss!r} is not supported")
+        return "boosting", list(model.estimators_.ravel())
+    raise UnsupportedModelError(f"Cannot compile {type(model).__name__}; only sklearn tree ensembles are supported")
+
+
+def compile_model(model, scaler=None, source_hash: str = "") -> CompiledTreeModel:
+    """Flatten `model` (trained on `scaler.transform(X)`) into a CompiledTreeModel on raw X"""
+    kind, trees = _estimators(model)
+    n_features = model.n_features_in_
+    if scaler is not None:
+        feature_names = list(scaler.feature_names_in_)
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+    else:
+        feature_names = list(getattr(model, "feature_names_in_", [f"x{i}" for i in range(n_features)]))
+        mean, scale = np.zeros(n_features), np.ones(n_features)
+
+    roots, parts, offset = [], [], 0
+    for estimator in trees:
+        tree = estimator.tree_
+        nodes = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+        feature = np.where(is_leaf, 0, tree.feature)
+        parts.append({
+            "feature": feature,
+            "threshold": np.where(is_leaf, np.inf, tree.threshold),
+            "left": np.where(is_leaf, nodes, tree.children_left) + offset,
+            "right": np.where(is_leaf, nodes, tree.children_right) + offset,
+            "missing_left": np.asarray(getattr(tree, "missing_go_to_left", np.zeros(tree.node_count)), dtype=bool),
+            "value": tree.value[:, 0, :],
+            "cover": tree.weighted_n_node_samples,
+            "is_leaf": is_leaf,
+        })
+        roots.append(offset)
+        offset += tree.node_count
+
+    def joined(name):
+        return np.concatenate([part[name] for part in parts])
+
+    feature, threshold, is_leaf = joined("feature"), joined("threshold"), joined("is_leaf")
+    internal = ~is_leaf
+    threshold[internal] = fold_thresholds(threshold[internal], mean[feature[internal]], scale[feature[internal]])
+
+    if kind == "boosting":
+        # Constant prior of the init estimator ("zero" or a DummyClassifier)
+        if model.init_ != "zero" and type(model.init_).__name__ != "DummyClassifier":
+            raise UnsupportedModelError("GradientBoosting with a custom init estimator is not supported")
+        init_raw = model._raw_predict_init(np.zeros((1, n_features), dtype=np.float32))[0]
+    else:
+        init_raw = np.zeros(1)
+
+    return CompiledTreeModel(
+        kind=kind,
+        classes=model.classes_,
+        feature_names=feature_names,
+        roots=roots,
+        feature=feature,
+        threshold=threshold,
+        left=joined("left"),
+        right=joined("right"),
+        missing_left=joined("missing_left"),
+        value=joined("value"),
+        cover=joined("cover"),
+        init_raw=init_raw,
+        learning_rate=getattr(model, "learning_rate", 1.0),
+        max_depth=max(estimator.tree_.max_depth for estimator in trees),
+        source_hash=source_hash,
+    )
+
+
+def load_or_compile(model, scaler, expected_hash: str, path=COMPILED_MODEL_PATH):
+    """Exported model if it matches the pickles, else a fresh compile; None if unsupported"""
+    if Path(path).exists():
+        try:
+            compiled = CompiledTreeModel.load(path)
+            if compiled.source_hash == expected_hash:
+                return compiled
+            print(f"{path} is stale (model or scaler changed), compiling in memory")
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not load {path}: {e}")
+    try:
+        return compile_model(model, scaler, source_hash=expected_hash)
+    except UnsupportedModelError as e:
+        print(f"Compiled backend unavailable, using sklearn: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    import argparse
+    import pickle
+
+    import joblib
+
+    parser = argparse.ArgumentParser(description="Export model/best_model.pkl + scaler.pkl as a compiled model")
+    parser.add_argument("--model", default=str(MODEL_DIR / "best_model.pkl"))
+    parser.add_argument("--scaler", default=str(MODEL_DIR / "scaler.pkl"))
+    parser.add_argument("--output", default=str(COMPILED_MODEL_PATH))
+    args = parser.parse_args()
+
+    with open(args.scaler, "rb") as f:
+        scaler = pickle.load(f)
+    compiled = compile_model(joblib.load(args.model), scaler, source_hash=source_hash(args.model, args.scaler))
+    compiled.save(args.output)
+    print(f"Compiled {compiled.kind} model: {compiled.n_trees} trees, {compiled.n_nodes} nodes -> {args.output}")
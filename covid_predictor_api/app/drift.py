@@ -0,0 +1,334 @@
+"""Online input-drift monitoring against the training distribution.
+
+Every batch the prediction endpoints receive updates fixed-size sketches of the model inputs
+(before the prediction cache, so repeated records count too). The model itself never records:
+- numeric features: counts over bins whose edges are the training quantiles (or the training
+  values themselves for features with few distinct values), plus the running min/max
+- categorical features: counts of each training label, an "unseen" count, and the most
+  frequent unseen labels (at most MAX_UNSEEN_LABELS per feature, the rest as "(other)")
+
+Memory is fixed by the baseline, whatever the traffic. An update is one vectorized bin lookup
+for all numeric features plus a dict lookup per categorical value.
+
+`report()` compares the live sketches with the baseline. It gives PSI for every feature, KS
+for numeric features (the largest CDF gap at the bin edges), quantiles interpolated from the
+live histogram, and unseen-category rates. Unseen categories matter because the encoder maps
+them to code 0, so the model silently treats a new strain or vaccine type as the first
+training label.
+
+The baseline is built from data/splitted_data/X_train.csv. Export it next to the model after
+retraining:
+
+    cd covid_predictor_api
+    python -m app.drift
+"""
+import os
+import json
+import threading
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from app.features import CATEGORICAL_FEATURES, _label, _labels
+from app.preprocessing import ENCODINGS, MODEL_DIR, scaler
+
+BASELINE_PATH = MODEL_DIR / "drift_baseline.json"
+TRAINING_DATA = MODEL_DIR.parent.parent / "data" / "splitted_data" / "X_train.csv"
+BASELINE_VERSION = 1
+
+NUMERIC_BINS = 20
+MAX_UNSEEN_LABELS = 20
+# Below this many observations the scores are too noisy to flag anything
+MIN_SAMPLES = 30
+# Conventional PSI bands: < 0.1 stable, 0.1-0.25 moderate shift, > 0.25 significant shift
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+REPORTED_QUANTILES = (0.05, 0.5, 0.95)
+# Floor for empty bins, so PSI stays finite
+EPSILON = 1e-4
+# Rows binned at once; bounds the (rows x features x edges) comparison
+CHUNK_ROWS = 8192
+# Up to this many rows, labels are counted in plain Python (numpy's per-call overhead dominates)
+SMALL_BATCH = 64
+
+
+def build_baseline(X: pd.DataFrame, encodings: dict = ENCODINGS, bins: int = NUMERIC_BINS) -> dict:
+    """Training distribution of every model input, as stored in drift_baseline.json"""
+    numeric, categorical = {}, {}
+    for name in X.columns:
+        values = X[name].to_numpy(dtype=np.float64)
+        if name in CATEGORICAL_FEATURES:
+            labels = np.asarray(encodings[name], dtype=str)[values.astype(int)]
+            unique, counts = np.unique(labels, return_counts=True)
+            categorical[name] = {"labels": unique.tolist(), "proportions": (counts / counts.sum()).tolist()}
+            continue
+        distinct = np.unique(values)
+        if len(distinct) <= bins:
+            # Discrete feature: one bin per training value
+            edges = distinct[1:]
+        else:
+            edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+        counts = np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+        numeric[name] = {
+            "edges": edges.tolist(),
+            "proportions": (counts / counts.sum()).tolist(),
+            "min": float(values.min()),
+            "max": float(values.max()),
+            "quantiles": dict(zip(map(str, REPORTED_QUANTILES), np.quantile(values, REPORTED_QUANTILES).tolist())),
+        }
+    return {"version": BASELINE_VERSION, "rows": len(X), "numeric": numeric, "categorical": categorical}
+
+
+def load_baseline(path=BASELINE_PATH, training_data=TRAINING_DATA) -> Optional[dict]:
+    """Exported baseline, else one built from the training split; None if neither exists"""
+    try:
+        with open(path) as f:
+            baseline = json.load(f)
+        if baseline.get("version") == BASELINE_VERSION:
+            return baseline
+        print(f"{path} has an old format, rebuilding it from {training_data}")
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        print(f"Could not load {path}: {e}")
+    if not os.path.exists(training_data):
+        print(f"Drift monitoring unavailable: neither {path} nor {training_data} exists")
+        return None
+    return build_baseline(pd.read_csv(training_data)[list(scaler.feature_names_in_)])
+
+
+def psi(expected: np.ndarray, actual: np.ndarray) -> float:
+    """Population stability index of two proportion vectors"""
+    expected, actual = np.maximum(expected, EPSILON), np.maximum(actual, EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def _status(score: Optional[float]) -> str:
+    if score is None:
+        return "insufficient_data"
+    if score > PSI_SIGNIFICANT:
+        return "significant"
+    if score > PSI_MODERATE:
+        return "moderate"
+    return "stable"
+
+
+def _histogram_quantiles(edges: np.ndarray, counts: np.ndarray, low: float, high: float, qs) -> list:
+    """Quantiles by linear interpolation inside the bins (the outer bins end at the observed min/max)"""
+    bounds = np.concatenate([[low], np.clip(edges, low, high), [high]])
+    cdf = np.concatenate([[0.0], np.cumsum(counts) / counts.sum()])
+    return [float(np.interp(q, cdf, bounds)) for q in qs]
+
+
+class DriftMonitor:
+    """Thread-safe fixed-size sketches of the model inputs, compared with a training baseline"""
+
+    def __init__(self, baseline: dict):
+        self.baseline = baseline
+        self.numeric = list(baseline["numeric"])
+        self.categorical = list(baseline["categorical"])
+        edges = [np.asarray(baseline["numeric"][name]["edges"]) for name in self.numeric]
+        self._n_edges = np.array([len(e) for e in edges])
+        # Edges padded with +inf so that every feature is binned in one comparison
+        self._edges = np.full((len(edges), max(self._n_edges, default=0)), np.inf)
+        for row, e in enumerate(edges):
+            self._edges[row, :len(e)] = e
+        self._codes = {
+            name: {label: code for code, label in enumerate(baseline["categorical"][name]["labels"])}
+            for name in self.categorical
+        }
+        # Column positions of the numeric features, per frame layout seen
+        self._positions = {}
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.observations = 0
+            self._counts = np.zeros((len(self.numeric), self._edges.shape[1] + 1), dtype=np.int64)
+            self._min = np.full(len(self.numeric), np.inf)
+            self._max = np.full(len(self.numeric), -np.inf)
+            self._label_counts = {name: np.zeros(len(codes), dtype=np.int64) for name, codes in self._codes.items()}
+            self._unseen = {name: {} for name in self.categorical}
+            self._unseen_other = {name: 0 for name in self.categorical}
+
+    def observe(self, frame: pd.DataFrame, labels: dict):
+        """Add a scored batch: its engineered feature frame and the raw label arrays of the categorical fields"""
+        layout = tuple(frame.columns)
+        positions = self._positions.get(layout)
+        if positions is None:
+            positions = self._positions[layout] = frame.columns.get_indexer(self.numeric)
+        X = frame.to_numpy(dtype=np.float64)[:, positions]
+        flat = []
+        for start in range(0, len(X), CHUNK_ROWS):
+            chunk = X[start:start + CHUNK_ROWS]
+            bins = (chunk[:, :, None] >= self._edges[None]).sum(axis=2)
+            flat.append((bins + np.arange(len(self.numeric)) * self._counts.shape[1]).ravel())
+        counts = np.bincount(np.concatenate(flat), minlength=self._counts.size).reshape(self._counts.shape)
+
+        label_counts = {}
+        for name in self.categorical:
+            if len(X) <= SMALL_BATCH:
+                counter = {}
+                for value in labels[name]:
+                    label = _label(value)
+                    counter[label] = counter.get(label, 0) + 1
+                label_counts[name] = list(counter.items())
+            else:
+                unique, n = np.unique(_labels(labels[name]), return_counts=True)
+                label_counts[name] = list(zip(unique.tolist(), n.tolist()))
+
+        with self._lock:
+            self.observations += len(X)
+            self._counts += counts
+            if len(X):
+                np.minimum(self._min, X.min(axis=0), out=self._min)
+                np.maximum(self._max, X.max(axis=0), out=self._max)
+            for name, pairs in label_counts.items():
+                codes, unseen = self._codes[name], self._unseen[name]
+                for label, n in pairs:
+                    code = codes.get(label)
+                    if code is not None:
+                        self._label_counts[name][code] += n
+                    elif label in unseen or len(unseen) < MAX_UNSEEN_LABELS:
+                        unseen[label] = unseen.get(label, 0) + n
+                    else:
+                        self._unseen_other[name] += n
+
+    def report(self) -> dict:
+        """Drift scores per feature, most drifted first, and an overall status"""
+        with self._lock:
+            observations = self.observations
+            counts = self._counts.copy()
+            low, high = self._min.copy(), self._max.copy()
+            label_counts = {name: c.copy() for name, c in self._label_counts.items()}
+            unseen = {name: dict(u) for name, u in self._unseen.items()}
+            other = dict(self._unseen_other)
+        enough = observations >= MIN_SAMPLES
+
+        features = {}
+        for row, name in enumerate(self.numeric):
+            base = self.baseline["numeric"][name]
+            n_bins = self._n_edges[row] + 1
+            live = counts[row, :n_bins]
+            expected = np.asarray(base["proportions"])
+            entry = {"type": "numeric", "psi": None, "ks": None, "status": "insufficient_data"}
+            if observations:
+                actual = live / observations
+                score = psi(expected, actual)
+                ks = float(np.max(np.abs(np.cumsum(actual) - np.cumsum(expected))))
+                quantiles = _histogram_quantiles(
+                    np.asarray(base["edges"]), live, min(low[row], base["min"]), max(high[row], base["max"]),
+                    REPORTED_QUANTILES,
+                )
+                entry.update({
+                    "psi": round(score, 4) if enough else None,
+                    "ks": round(ks, 4) if enough else None,
+                    "status": _status(score if enough else None),
+                    "min": float(low[row]),
+                    "max": float(high[row]),
+                    "quantiles": {str(q): round(v, 4) for q, v in zip(REPORTED_QUANTILES, quantiles)},
+                    "baseline_quantiles": base["quantiles"],
+                })
+            features[name] = entry
+
+        for name in self.categorical:
+            base = self.baseline["categorical"][name]
+            seen = label_counts[name]
+            n_unseen = sum(unseen[name].values()) + other[name]
+            total = int(seen.sum()) + n_unseen
+            entry = {"type": "categorical", "psi": None, "status": "insufficient_data", "unseen_rate": None}
+            if total:
+                # Unseen labels form one extra bucket with (almost) zero training mass
+                expected = np.append(base["proportions"], 0.0)
+                actual = np.append(seen, n_unseen) / total
+                score = psi(expected, actual)
+                top_unseen = dict(sorted(unseen[name].items(), key=lambda item: -item[1]))
+                if other[name]:
+                    top_unseen["(other)"] = other[name]
+                entry.update({
+                    "psi": round(score, 4) if enough else None,
+                    "status": _status(score if enough else None),
+                    "unseen_rate": round(n_unseen / total, 4),
+                    "unseen_labels": top_unseen,
+                })
+            features[name] = entry
+
+        order = sorted(features, key=lambda name: -(features[name]["psi"] or 0))
+        drifted = [name for name in order if features[name]["status"] in ("moderate", "significant")]
+        statuses = {features[name]["status"] for name in features}
+        status = next((s for s in ("significant", "moderate", "stable") if s in statuses), "insufficient_data")
+        return {
+            "status": status if enough else "insufficient_data",
+            "observations": observations,
+            "min_samples": MIN_SAMPLES,
+            "baseline_rows": self.baseline["rows"],
+            "drifted_features": drifted,
+            "unseen_category_rate": {
+                name: features[name]["unseen_rate"] for name in self.categorical
+            },
+            "features": {name: features[name] for name in order},
+        }
+
+
+_monitor: Optional[DriftMonitor] = None
+_monitor_loaded = False
+_monitor_lock = threading.Lock()
+
+
+def drift_enabled() -> bool:
+    return os.getenv("DRIFT_MONITOR", "on").lower() not in ("0", "off", "false", "no")
+
+
+def get_drift_monitor() -> Optional[DriftMonitor]:
+    """Shared monitor for this worker, or None when no baseline is available"""
+    global _monitor, _monitor_loaded
+    with _monitor_lock:
+        if not _monitor_loaded:
+            baseline = load_baseline(os.getenv("DRIFT_BASELINE_PATH", str(BASELINE_PATH)))
+            _monitor = DriftMonitor(baseline) if baseline is not None else None
+            _monitor_loaded = True
+        return _monitor
+
+
+def observe(frame: pd.DataFrame, labels: dict):
+    """Record a scored batch if monitoring is on; `labels` maps categorical fields to raw values"""
+    if not drift_enabled():
+        return
+    monitor = get_drift_monitor()
+    if monitor is not None:
+        monitor.observe(frame, labels)
+
+
+def observe_patients(frame: pd.DataFrame, patients: list):
+    """`observe` for a batch of PatientFeatures and its engineered frame"""
+    observe(frame, {name: [getattr(patient, name) for patient in patients] for name in CATEGORICAL_FEATURES})
+
+
+def _reset_after_fork():
+    # Workers start counting from zero; the baseline is reloaded lazily
+    global _monitor, _monitor_loaded, _monitor_lock
+    _monitor, _monitor_loaded = None, False
+    _monitor_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export the training-distribution baseline for drift monitoring")
+    parser.add_argument("--training-data", default=str(TRAINING_DATA))
+    parser.add_argument("--bins", type=int, default=NUMERIC_BINS)
+    parser.add_argument("--output", default=str(BASELINE_PATH))
+    args = parser.parse_args()
+
+    X = pd.read_csv(args.training_data)[list(scaler.feature_names_in_)]
+    baseline = build_baseline(X, bins=args.bins)
+    with open(args.output, "w") as f:
+        json.dump(baseline, f, indent=1)
+    print(f"Baseline of {len(X)} rows, {len(baseline['numeric'])} numeric and "
+          f"{len(baseline['categorical'])} categorical features -> {args.output}")
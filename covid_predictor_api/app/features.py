@@ -0,0 +1,363 @@
+"""Declarative feature definitions shared by training (data_pipeline) and serving (preprocessing).
+
+Each feature is declared once in FEATURES and knows two ways to compute itself:
+- `batch`: over whole numpy columns, used to build training data and for large requests
+- `row`: over one record with plain Python values, used for single-patient requests, where
+  numpy and pandas call overhead would dominate
+
+`compile_batch` and `compile_row` pick the features a model needs (plus the features they
+depend on) and return a ready-to-call transform. tests/test_features.py checks that both
+transforms give identical vectors for every row of the dataset.
+
+Inputs are raw patient fields: numbers, "Yes"/"No" flags, category labels and dates. A missing
+category (None, NaN or the string "None") becomes the "nan" label that LabelEncoder learned
+from the training data. A missing date gives an interval of 0 days. Any NaN left at the end
+becomes 0.
+"""
+import math
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+MISSING_LABEL = "nan"
+ONE_DAY = np.timedelta64(1, "D")
+
+
+def _is_missing(value) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value)) or value is pd.NaT
+
+
+def _label(value) -> str:
+    if _is_missing(value) or value == "None":
+        return MISSING_LABEL
+    return str(value)
+
+
+def _labels(values) -> np.ndarray:
+    labels = np.asarray(pd.Series(values, dtype=object).to_numpy(), dtype=str)
+    labels[labels == "None"] = MISSING_LABEL
+    return labels
+
+
+def _utc_naive(columns: list) -> list:
+    """Each column as datetime64[ns] in UTC without timezone.
+
+    Columns that are already datetime64 pass through. Everything else is parsed in a single
+    call (which matters for small batches); naive values are taken as UTC and unparseable
+    values become NaT.
+    """
+    converted = [
+        column.astype("datetime64[ns]") if np.issubdtype(column.dtype, np.datetime64) else None
+        for column in columns
+    ]
+    to_parse = [np.asarray(column, dtype=object) for column, done in zip(columns, converted) if done is None]
+    if to_parse:
+        values = np.concatenate(to_parse)
+        parsed = pd.to_datetime(values, errors='coerce', utc=True).tz_localize(None).to_numpy(dtype="datetime64[ns]")
+        parsed = iter(np.split(parsed, len(to_parse)))
+        converted = [next(parsed) if done is None else done for done in converted]
+    return converted
+
+
+def _row_datetime(value):
+    """A single date as a naive UTC datetime, or None"""
+    if _is_missing(value):
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if isinstance(value, np.datetime64):
+        value = pd.Timestamp(value).to_pydatetime()
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _nan_to_zero(value: float) -> float:
+    return 0.0 if math.isnan(value) else value
+
+
+class Feature:
+    """One model input column; `sources` are raw fields or earlier features it is computed from"""
+
+    sources = ()
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def batch(self, values: dict, encodings: dict) -> np.ndarray:
+        raise NotImplementedError
+
+    def row(self, values: dict, encodings: dict):
+        raise NotImplementedError
+
+
+class Numeric(Feature):
+    """A numeric field, optionally clipped to [low, high]"""
+
+    def __init__(self, name: str, clip=None):
+        super().__init__(name)
+        self.sources = (name,)
+        self.clip = clip
+
+    def batch(self, values, encodings):
+        column = np.asarray(values[self.name], dtype=np.float64)
+        return np.clip(column, *self.clip) if self.clip else column
+
+    def row(self, values, encodings):
+        value = values[self.name]
+        value = math.nan if _is_missing(value) else float(value)
+        if self.clip and not math.isnan(value):
+            value = min(max(value, self.clip[0]), self.clip[1])
+        return value
+
+
+class YesNo(Feature):
+    """"Yes" -> 1, "No" -> 0, anything else -> -1"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.sources = (name,)
+
+    def batch(self, values, encodings):
+        column = np.asarray(values[self.name], dtype=object)
+        return np.select([column == "Yes", column == "No"], [1, 0], default=-1)
+
+    def row(self, values, encodings):
+        return {"Yes": 1, "No": 0}.get(values[self.name], -1)
+
+
+class Categorical(Feature):
+    """LabelEncoder code of the label; labels not seen in training are encoded as 0"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.sources = (name,)
+
+    def batch(self, values, encodings):
+        classes = encodings[self.name]
+        labels = _labels(values[self.name])
+        # LabelEncoder classes are sorted, so searchsorted encodes a whole column at once
+        codes = np.searchsorted(classes, labels).clip(max=len(classes) - 1)
+        return np.where(classes[codes] == labels, codes, 0)
+
+    def row(self, values, encodings):
+        return encodings[self.name].get(_label(values[self.name]), 0)
+
+
+class DaysBetween(Feature):
+    """Whole days from `earlier` to `later` (floored like Timedelta.days); 0 if either date is missing"""
+
+    def __init__(self, name: str, later: str, earlier: str, min_value=None):
+        super().__init__(name)
+        self.later, self.earlier = later, earlier
+        self.sources = (later, earlier)
+        self.min_value = min_value
+
+    def batch(self, values, encodings):
+        delta = values[self.later] - values[self.earlier]
+        missing = np.isnat(delta)
+        days = np.where(missing, 0, np.where(missing, np.timedelta64(0, "ns"), delta) // ONE_DAY)
+        return np.maximum(days, self.min_value) if self.min_value is not None else days
+
+    def row(self, values, encodings):
+        later, earlier = values[self.later], values[self.earlier]
+        days = 0 if later is None or earlier is None else (later - earlier).days
+        return max(days, self.min_value) if self.min_value is not None else days
+
+
+class Positive(Feature):
+    """1 if the source is > 0"""
+
+    def __init__(self, name: str, source: str):
+        super().__init__(name)
+        self.sources = (source,)
+
+    def batch(self, values, encodings):
+        return (values[self.sources[0]] > 0).astype(np.int64)
+
+    def row(self, values, encodings):
+        return int(values[self.sources[0]] > 0)
+
+
+class InRange(Feature):
+    """1 if low <= source <= high"""
+
+    def __init__(self, name: str, source: str, low, high):
+        super().__init__(name)
+        self.sources = (source,)
+        self.low, self.high = low, high
+
+    def batch(self, values, encodings):
+        column = values[self.sources[0]]
+        return ((column >= self.low) & (column <= self.high)).astype(np.int64)
+
+    def row(self, values, encodings):
+        return int(self.low <= values[self.sources[0]] <= self.high)
+
+
+class Product(Feature):
+    def __init__(self, name: str, left: str, right: str):
+        super().__init__(name)
+        self.sources = (left, right)
+
+    def batch(self, values, encodings):
+        return values[self.sources[0]] * values[self.sources[1]]
+
+    def row(self, values, encodings):
+        return values[self.sources[0]] * values[self.sources[1]]
+
+
+class Difference(Feature):
+    def __init__(self, name: str, left: str, right: str):
+        super().__init__(name)
+        self.sources = (left, right)
+
+    def batch(self, values, encodings):
+        return values[self.sources[0]] - values[self.sources[1]]
+
+    def row(self, values, encodings):
+        return values[self.sources[0]] - values[self.sources[1]]
+
+
+class Ratio(Feature):
+    """numerator / (denominator + offset)"""
+
+    def __init__(self, name: str, numerator: str, denominator: str, offset=1):
+        super().__init__(name)
+        self.sources = (numerator, denominator)
+        self.offset = offset
+
+    def batch(self, values, encodings):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return values[self.sources[0]] / (values[self.sources[1]] + self.offset)
+
+    def row(self, values, encodings):
+        denominator = values[self.sources[1]] + self.offset
+        if denominator == 0:
+            return math.copysign(math.inf, values[self.sources[0]]) if values[self.sources[0]] else math.nan
+        return values[self.sources[0]] / denominator
+
+
+# In the column order of the notebooks' engineered dataset (without the Reinfection target)
+FEATURES = [
+    Numeric("Age"),
+    Categorical("Gender"),
+    Categorical("Region"),
+    Categorical("Preexisting_Condition"),
+    Categorical("COVID_Strain"),
+    Categorical("Symptoms"),
+    Categorical("Severity"),
+    YesNo("Hospitalized"),
+    YesNo("ICU_Admission"),
+    YesNo("Ventilator_Support"),
+    YesNo("Recovered"),
+    YesNo("Vaccination_Status"),
+    Categorical("Vaccine_Type"),
+    Numeric("Doses_Received"),
+    Categorical("Long_COVID_Symptoms"),
+    Categorical("Occupation"),
+    Categorical("Smoking_Status"),
+    # Guards against input errors; no training row is outside these bounds
+    Numeric("BMI", clip=(10, 60)),
+    Categorical("Recovery_Classification"),
+    DaysBetween("Recovery_Duration", "Date_of_Recovery", "Date_of_Infection", min_value=0),
+    DaysBetween("Time_to_Reinfection", "Date_of_Reinfection", "Date_of_Recovery"),
+    Positive("Reinfected_Later", "Time_to_Reinfection"),
+    DaysBetween("Vaccine_to_Infection_Days", "Date_of_Infection", "Date_of_Last_Dose"),
+    InRange("Infected_soon_after_vaccine", "Vaccine_to_Infection_Days", 0, 14),
+    DaysBetween("Hospital_Stay_Duration", "Hospital_Discharge_Date", "Hospital_Admission_Date", min_value=0),
+    Product("Age_Preexisting", "Age", "Preexisting_Condition"),
+    Product("Vaccine_Infection", "Vaccination_Status", "Vaccine_to_Infection_Days"),
+    Product("Smoke_Preexist", "Smoking_Status", "Preexisting_Condition"),
+    Difference("Vaccine_to_Reinfection", "Time_to_Reinfection", "Vaccine_to_Infection_Days"),
+    Positive("Vaccinated_Before_Infection", "Vaccine_to_Infection_Days"),
+    Ratio("Recovery_per_Stay", "Recovery_Duration", "Hospital_Stay_Duration"),
+    Ratio("Time_to_Reinfection_per_Recovery", "Time_to_Reinfection", "Recovery_Duration"),
+]
+FEATURE_NAMES = [feature.name for feature in FEATURES]
+CATEGORICAL_FEATURES = [feature.name for feature in FEATURES if isinstance(feature, Categorical)]
+DATE_FIELDS = sorted({source for feature in FEATURES if isinstance(feature, DaysBetween) for source in feature.sources})
+
+
+def fit_encodings(columns) -> dict:
+    """Sorted labels per categorical feature, as LabelEncoder.fit(column.astype(str)) learns them"""
+    return {name: np.unique(_labels(columns[name])) for name in CATEGORICAL_FEATURES}
+
+
+def _plan(names) -> list:
+    """Features needed for `names`, dependencies first"""
+    by_name = {feature.name: feature for feature in FEATURES}
+    unknown = [name for name in names if name not in by_name]
+    if unknown:
+        raise KeyError(f"No feature definition for: {', '.join(unknown)}")
+    needed = set()
+
+    def visit(name):
+        if name in by_name and name not in needed:
+            needed.add(name)
+            for source in by_name[name].sources:
+                if source != name:
+                    visit(source)
+
+    for name in names:
+        visit(name)
+    return [feature for feature in FEATURES if feature.name in needed]
+
+
+def _raw_fields(plan: list) -> list:
+    computed = {feature.name for feature in plan}
+    fields = []
+    for feature in plan:
+        for source in feature.sources:
+            if (source == feature.name or source not in computed) and source not in fields:
+                fields.append(source)
+    return fields
+
+
+def compile_batch(names, encodings: dict):
+    """transform(columns) -> float64 matrix with one column per name, in order.
+
+    `columns` maps raw field names to 1-D sequences (dict of arrays, DataFrame).
+    """
+    plan = _plan(names)
+    fields = _raw_fields(plan)
+    date_fields = [field for field in fields if field in DATE_FIELDS]
+    classes = {name: np.asarray(encodings[name], dtype=str) for name in CATEGORICAL_FEATURES if name in fields}
+    names = list(names)
+
+    def transform(columns) -> np.ndarray:
+        values = {field: np.asarray(columns[field]) for field in fields}
+        values.update(zip(date_fields, _utc_naive([values[field] for field in date_fields])))
+        for feature in plan:
+            values[feature.name] = feature.batch(values, classes)
+        matrix = np.column_stack([np.asarray(values[name], dtype=np.float64) for name in names])
+        matrix[np.isnan(matrix)] = 0
+        return matrix
+
+    return transform
+
+
+def compile_row(names, encodings: dict):
+    """transform(record) -> list of floats, one per name, for a single record (dict of raw fields)"""
+    plan = _plan(names)
+    fields = _raw_fields(plan)
+    date_fields = [field for field in fields if field in DATE_FIELDS]
+    codes = {
+        name: {label: code for code, label in enumerate(np.asarray(encodings[name], dtype=str).tolist())}
+        for name in CATEGORICAL_FEATURES if name in fields
+    }
+    names = list(names)
+
+    def transform(record: dict) -> list:
+        values = {field: record[field] for field in fields}
+        for field in date_fields:
+            values[field] = _row_datetime(values[field])
+        for feature in plan:
+            values[feature.name] = feature.row(values, codes)
+        return [_nan_to_zero(float(values[name])) for name in names]
+
+    return transform
@@ -0,0 +1,39 @@
+import os
+
+# Fields of /proc/<pid>/smaps_rollup we report, in kB
+SMAPS_FIELDS = {
+    "Rss": "rss_mb",
+    "Pss": "pss_mb",
+    "Shared_Clean": "shared_clean_mb",
+    "Shared_Dirty": "shared_dirty_mb",
+    "Private_Clean": "private_clean_mb",
+    "Private_Dirty": "private_dirty_mb",
+}
+
+
+def process_memory(pid="self") -> dict:
+    """Memory of one process in MB.
+
+    `uss_mb` (unique set size = private pages) is what each extra worker really costs;
+    pages inherited copy-on-write from the preloading master show up as shared instead.
+    Falls back to peak RSS where /proc is not available (e.g. macOS, Windows).
+    """
+    path = f"/proc/{pid}/smaps_rollup"
+    if not os.path.exists(path):
+        try:
+            import resource
+        except ImportError:  # Windows
+            return {"pid": os.getpid()}
+        # ru_maxrss is kB on Linux but bytes on macOS; only reached off Linux
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {"pid": os.getpid(), "peak_rss_mb": round(peak / 1024 / 1024, 1)}
+
+    values = {}
+    with open(path) as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            if name in SMAPS_FIELDS:
+                values[SMAPS_FIELDS[name]] = round(int(rest.split()[0]) / 1024, 1)
+    values["uss_mb"] = round(values.get("private_clean_mb", 0) + values.get("private_dirty_mb", 0), 1)
+    values["pid"] = os.getpid() if pid == "self" else int(pid)
+    return values
@@ -1,23 +1,179 @@
 import numpy as np
-from app.preprocessing import preprocess_input_data
+from app import preprocessing
+from app.preprocessing import MODEL_DIR, build_feature_frame
+from app.compiled_model import UnsupportedModelError, compile_model, load_or_compile, source_hash
+from app.attributions import PathAttributions
+from app.startup import loading
 import joblib
 import os
+import time
+import threading
 
 
 # Here we would implement the logic to get the prediction
 # and import necessary model or logic.
 
-# importing the model
-model = joblib.load(os.path.join(os.path.dirname(__file__), "..", "model", "best_model.pkl"))
-    
+MODEL_PATH = MODEL_DIR / "best_model.pkl"
+ARTIFACT_PATHS = (MODEL_PATH, MODEL_DIR / "scaler.pkl", MODEL_DIR / "encoders.pkl")
+
+# Above this many rows sklearn's Cython traversal beats the numpy evaluator
+# (see benchmarks/compiled_model.py), so large batches go through sklearn
+COMPILED_MAX_BATCH = int(os.getenv("COMPILED_MAX_BATCH", "256"))
+
+# "compiled" evaluates the flattened trees on unscaled features (see compiled_model.py);
+# "sklearn" runs scaler.transform + model.predict. Both give identical predictions.
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "compiled").lower()
+
+
+def artifact_mtimes() -> tuple:
+    return tuple(os.stat(path).st_mtime_ns for path in ARTIFACT_PATHS)
+
+
+def _path_attributions(model, compiled, scaler):
+    """Decision-path explainer for the model's positive class, or None for non-tree models"""
+    try:
+        return PathAttributions(compiled if compiled is not None else compile_model(model, scaler))
+    except UnsupportedModelError:
+        return None
+
+
+def _load_model(scaler) -> tuple:
+    """(model, compiled model or None, attributions or None) for the model on disk and `scaler`"""
+    model = joblib.load(MODEL_PATH)
+    compiled = None
+    if MODEL_BACKEND == "compiled":
+        compiled = load_or_compile(model, scaler, source_hash(MODEL_PATH, MODEL_DIR / "scaler.pkl"))
+    return model, compiled, _path_attributions(model, compiled, scaler)
+
+
+# importing the model; timed as the "model" component of the startup report (see app/startup.py)
+_loaded_mtimes = artifact_mtimes()
+with loading("model"):
+    model, compiled_model, path_attributions = _load_model(preprocessing.scaler)
+
+# Identifies the loaded artifacts; cached predictions are only reused under the same version
+MODEL_VERSION = source_hash(*ARTIFACT_PATHS)
+
+_reload_lock = threading.Lock()
+_watcher = None
+
+
+def active_backend() -> str:
+    return "compiled" if compiled_model is not None else "sklearn"
+
+
+def model_version() -> str:
+    return MODEL_VERSION
+
+
+def reload_model():
+    """Swap in the model, scaler and encoders currently on disk (e.g. after retraining); returns the new version.
+
+    Everything is loaded and compiled before anything is swapped, so requests keep being served by
+    the old artifacts until then. The new version empties the prediction cache.
+    """
+    global model, compiled_model, path_attributions, MODEL_VERSION, _loaded_mtimes
+    with _reload_lock:
+        mtimes = artifact_mtimes()
+        artifacts = preprocessing.load_artifacts()
+        loaded = _load_model(artifacts[0])
+        version = source_hash(*ARTIFACT_PATHS)
+        preprocessing.install_artifacts(artifacts)
+        model, compiled_model, path_attributions = loaded
+        MODEL_VERSION, _loaded_mtimes = version, mtimes
+        return MODEL_VERSION
+
+
+def check_for_new_model(seen=None):
+    """Reload if the artifacts changed on disk and have not changed since the previous check
+    (`seen`), so files still being written are not picked up; returns the mtimes observed"""
+    try:
+        current = artifact_mtimes()
+    except OSError:  # a file is being replaced
+        return None
+    if current != _loaded_mtimes and current == seen:
+        try:
+            print(f"Model files changed on disk, now serving version {reload_model()}")
+        except Exception as e:
+            print(f"Could not reload the model, still serving version {MODEL_VERSION}: {e}")
+    return current
+
+
+def start_model_watcher():
+    """Check the model files every MODEL_RELOAD_INTERVAL_SECONDS (default 30, 0 = never) in the background"""
+    global _watcher
+    interval = float(os.getenv("MODEL_RELOAD_INTERVAL_SECONDS", "30"))
+    if interval <= 0 or _watcher is not None:
+        return _watcher
+
+    def watch():
+        seen = None
+        while True:
+            time.sleep(interval)
+            seen = check_for_new_model(seen)
+
+    _watcher = threading.Thread(target=watch, name="model-watcher", daemon=True)
+    _watcher.start()
+    return _watcher
+
+
+def predict_frame(frame) -> list:
+    """Predictions ("Yes"/"No") for every row of an engineered feature frame"""
+    if compiled_model is not None and len(frame) <= COMPILED_MAX_BATCH:
+        predictions = compiled_model.predict(frame.to_numpy(dtype=np.float64))
+    else:
+        predictions = model.predict(preprocessing.scaler.transform(frame))
+    return np.where(predictions == 1, "Yes", "No").tolist()
+
+
+def score_frame(frame) -> tuple:
+    """Probability of reinfection and the "Yes"/"No" label for every row of an engineered feature frame"""
+    if compiled_model is not None and len(frame) <= COMPILED_MAX_BATCH:
+        proba = compiled_model.predict_proba(frame.to_numpy(dtype=np.float64))
+    else:
+        proba = model.predict_proba(preprocessing.scaler.transform(frame))
+    labels = np.where(model.classes_[proba.argmax(axis=1)] == 1, "Yes", "No")
+    return proba[:, list(model.classes_).index(1)], labels
+
+
+def explain_frame(frame) -> tuple:
+    """(explainer, contributions of shape (rows, features), model output per row) for an engineered frame.
+
+    The model output is bias + the row's contributions: the probability of reinfection for
+    trees and forests, the log-odds for gradient boosting. Raises UnsupportedModelError for
+    models that are not sklearn tree ensembles.
+    """
+    explainer = path_attributions
+    if explainer is None:
+        raise UnsupportedModelError(f"Attributions need a tree model, not {type(model).__name__}")
+    if compiled_model is not None and len(frame) <= COMPILED_MAX_BATCH:
+        leaves = compiled_model.apply(frame.to_numpy(dtype=np.float64))
+    else:
+        # sklearn's Cython traversal; its per-tree node ids are offset into the flat arrays
+        local = np.asarray(model.apply(preprocessing.scaler.transform(frame))).reshape(len(frame), -1)
+        leaves = local.astype(np.intp) + explainer.roots
+    contributions = explainer.from_leaves(leaves)
+    return explainer, contributions, explainer.bias + contributions.sum(axis=1)
+
+
+def explain_first_row(frame, top: int = 0) -> dict:
+    """Attribution of the prediction for the first row of an engineered frame, largest contributions first"""
+    explainer, contributions, _ = explain_frame(frame.iloc[:1])
+    return explainer.summary(contributions[0], top)
+
+
+def explain_patient(patient, top: int = 0) -> dict:
+    """Attribution of a single patient's prediction, largest contributions first"""
+    return explain_first_row(build_feature_frame([patient]), top)
+
+
+def predict_labels(features: list) -> list:
+    """Predictions ("Yes"/"No") for every patient in the batch"""
+    return predict_frame(build_feature_frame(features))
+
 # Defining the prediction function that calls the model
 def get_prediction(features: list) -> str:
     """
     Function to get prediction based on patient data.
     """
-    processed_data = preprocess_input_data(features)
-    
-    # numpy array for model input because the model expects a 2D array
-    input_array = np.array(processed_data).reshape(1, -1)
-    prediction = model.predict(input_array)
-    return "Yes" if prediction[0] == 1 else "No"
\ No newline at end of file
+    return predict_labels(features)[0]
@@ -0,0 +1,137 @@
+"""Exact-match cache of /predict results (label and explanation).
+
+Clinics and the Streamlit form resubmit identical patient records; a hit skips feature
+engineering, the model and the LLM explanation. Each entry also keeps the patient's engineered
+feature row, so a hit can still be counted by the drift monitor without engineering it again.
+Entries are keyed on a canonical hash of the
+validated PatientFeatures plus the model version, held in memory with LRU eviction and a TTL,
+and dropped as a whole when the model version changes.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.schemas import PatientFeatures
+
+
+def _canonical_value(value):
+    if isinstance(value, datetime):
+        # Same instant, same key: naive values are taken as UTC, like the feature pipeline
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc).isoformat()
+    return value
+
+
+def prediction_key(patient: PatientFeatures, model_version: str) -> str:
+    """sha256 of the validated fields (sorted, datetimes in UTC) and the model version"""
+    fields = {name: _canonical_value(value) for name, value in patient.model_dump().items()}
+    payload = json.dumps({"patient": fields, "model_version": model_version}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PredictionCache:
+    """Thread-safe in-memory LRU with per-entry TTL, cleared when the model version changes"""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = 3600, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.model_version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_version(self, model_version: str):
+        if model_version != self.model_version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.model_version = model_version
+
+    def get(self, key: str, model_version: str) -> Optional[dict]:
+        with self._lock:
+            self._check_version(model_version)
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds is not None and self.clock() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, key: str, model_version: str, value: dict):
+        with self._lock:
+            self._check_version(model_version)
+            self._entries[key] = (self.clock(), dict(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "model_version": self.model_version,
+        }
+
+
+_cache: Optional[PredictionCache] = None
+_cache_lock = threading.Lock()
+
+
+def cache_enabled() -> bool:
+    return os.getenv("PREDICTION_CACHE", "on").lower() not in ("0", "off", "false", "no")
+
+
+def get_prediction_cache() -> PredictionCache:
+    """Shared cache configured from PREDICTION_CACHE_MAX_ENTRIES / _TTL_SECONDS"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            ttl = os.getenv("PREDICTION_CACHE_TTL_SECONDS", "3600")
+            _cache = PredictionCache(
+                max_entries=int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "1024")),
+                ttl_seconds=float(ttl) if ttl else None,
+            )
+        return _cache
+
+
+def _reset_after_fork():
+    # A lock held by another thread at fork time would never be released in the child
+    global _cache, _cache_lock
+    _cache = None
+    _cache_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
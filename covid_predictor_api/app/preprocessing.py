@@ -1,6 +1,9 @@
+import numpy as np
 import pandas as pd
 import pickle
 from  app.schemas import PatientFeatures
+from app.features import compile_batch, compile_row
+from app.startup import loading
 from pathlib import Path
 
 def normalize_timezone(dt_series):
@@ -16,91 +19,66 @@ CURRENT_DIR = Path(__file__).resolve().parent
 
 MODEL_DIR = CURRENT_DIR.parent / "model"
 
-with open(MODEL_DIR / "scaler.pkl", "rb") as f:
-    scaler = pickle.load(f)
+def load_artifacts(model_dir: Path = MODEL_DIR) -> tuple:
+    """(scaler, encoders, encodings, batch transform, row transform) from the pickles in `model_dir`"""
+    with open(model_dir / "scaler.pkl", "rb") as f:
+        scaler = pickle.load(f)
 
-with open(MODEL_DIR / "encoders.pkl", "rb") as f:
-    encoders = pickle.load(f)
+    with open(model_dir / "encoders.pkl", "rb") as f:
+        encoders = pickle.load(f)
+
+    encodings = {column: np.asarray(encoder.classes_, dtype=str) for column, encoder in encoders.items()}
+
+    # The model's inputs, computed from the shared definitions in app/features.py. Fails at import
+    # if the scaler expects a column that has no definition, instead of silently feeding it zeros.
+    return (scaler, encoders, encodings,
+            compile_batch(scaler.feature_names_in_, encodings), compile_row(scaler.feature_names_in_, encodings))
+
+# Timed as the "features" component of the startup report (see app/startup.py)
+with loading("features"):
+    scaler, encoders, ENCODINGS, _batch_transform, _row_transform = load_artifacts()
+
+def install_artifacts(artifacts: tuple):
+    """Swap in artifacts from load_artifacts (see model_interface.reload_model)"""
+    global scaler, encoders, ENCODINGS, _batch_transform, _row_transform
+    scaler, encoders, ENCODINGS, _batch_transform, _row_transform = artifacts
+
+DATE_COLUMNS = [name for name in PatientFeatures.model_fields if "Date" in name]
 
 # Preprocessing the input data to match the model's expected format
 
-def preprocess_input_data(patient_data: PatientFeatures):
+def records_columns(patient_data: PatientFeatures) -> dict:
+    """Raw PatientFeatures as one numpy array per field"""
     # If patient_data is a list of PatientFeatures, convert each to dict
     if isinstance(patient_data, list):
-        data_dicts = [p.dict() for p in patient_data]
+        data_dicts = [p.model_dump() for p in patient_data]
     else:
-        data_dicts = [patient_data.dict()]
-
-    df = pd.DataFrame(data_dicts)
-    
-    # Ensure all columns are present
-    expected_columns = list(scaler.feature_names_in_)
-    for col in expected_columns:
-        if col not in df.columns:
-            df[col] = 0
-            
-    # Convert datetime fields to pandas datetime and normalize timezones
-    date_cols = [col for col in df.columns if "Date" in col]
-    for col in date_cols:
-        df[col] = pd.to_datetime(df[col], errors='coerce')
-        # Ensure all datetimes are timezone-naive for consistent operations
-        if hasattr(df[col].dtype, 'tz') and df[col].dt.tz is not None:
-            df[col] = df[col].dt.tz_convert('UTC').dt.tz_localize(None)
-        elif df[col].notna().any():
-            # For timezone-naive datetimes, just ensure they're properly formatted
-            df[col] = pd.to_datetime(df[col], errors='coerce')
-    
-    # Basic preprocessing
-    binary_cols = ['Hospitalized', 'ICU_Admission', 'Ventilator_Support', 'Recovered', 'Vaccination_Status']
-    for col in binary_cols:
-        # Map known values, fill unknown values with -1
-        df[col] = df[col].map({'Yes': 1, 'No': 0}).fillna(-1).astype(int)
-
-    # Handle BMI outliers by clipping instead of filtering
-    df['BMI'] = df['BMI'].clip(lower=10, upper=60)
-    df.reset_index(drop=True, inplace=True)
-
-    # === New Features ===
-    # 1. Recovery duration in days
-    df["Recovery_Duration"] = (df["Date_of_Recovery"] - df["Date_of_Infection"]).dt.days.fillna(0)
-    # Avoid negative recovery durations
-    df["Recovery_Duration"] = df["Recovery_Duration"].apply(lambda x: x if x >= 0 else 0)
-    
-    # 2. Time to reinfection (post recovery)
-    df["Time_to_Reinfection"] = (df["Date_of_Reinfection"] - df["Date_of_Recovery"]).dt.days.fillna(0)
-    df["Reinfected_Later"] = df["Time_to_Reinfection"].apply(lambda x: 1 if x > 0 else 0)
-
-    # 3. Time between vaccination and infection
-    df["Vaccine_to_Infection_Days"] = (df["Date_of_Infection"] - df["Date_of_Last_Dose"]).dt.days.fillna(0)
-
-    # 4. Hospital stay duration
-    df["Hospital_Stay_Duration"] = (df["Hospital_Discharge_Date"] - df["Hospital_Admission_Date"]).dt.days.fillna(0)
-    # avoid negatives
-    df["Hospital_Stay_Duration"] = df["Hospital_Stay_Duration"].apply(lambda x: x if x >= 0 else 0)  
-
-    # 5. Is vaccinated & infected within 14 days?
-    df["Infected_soon_after_vaccine"] = df["Vaccine_to_Infection_Days"].apply(lambda x: 1 if 0 <= x <= 14 else 0)
-
-    # === Drop date columns to prepare for modeling ===
-    df.drop(columns=[
-        "Date_of_Infection", "Date_of_Recovery", "Date_of_Reinfection",
-        "Hospital_Admission_Date", "Hospital_Discharge_Date", "Date_of_Last_Dose"
-    ], inplace=True)
-
-    # === Encoding categorical features ===
-    for column in df.select_dtypes(include=['object']).columns:
-        if column in encoders:
-            known_classes = set(encoders[column].classes_)
-            df[column] = df[column].apply(
-                lambda x: encoders[column].transform([x])[0] if x in known_classes else 0
-    )
-        else:
-            df[column] = pd.factorize(df[column])[0]
-            
-    # Fill any remaining NaNs to avoid issues during scaling
-    df.fillna(0, inplace=True)
-    
+        data_dicts = [patient_data.model_dump()]
+
+    return {name: np.asarray([d[name] for d in data_dicts], dtype=object) for name in PatientFeatures.model_fields}
+
+def engineer_features(columns) -> pd.DataFrame:
+    """Engineered, encoded features in the scaler's column order, before scaling.
+
+    `columns` maps each PatientFeatures field to a 1-D array (records_columns, the Arrow
+    input or a DataFrame).
+    """
+    return pd.DataFrame(_batch_transform(columns), columns=scaler.feature_names_in_)
+
+def build_feature_frame(patient_data: PatientFeatures) -> pd.DataFrame:
+    """Engineered, encoded features in the scaler's column order, before scaling"""
+    patients = patient_data if isinstance(patient_data, list) else [patient_data]
+    if len(patients) == 1:
+        # Single patient: the row transform skips numpy's per-call overhead
+        return pd.DataFrame([_row_transform(patients[0].model_dump())], columns=scaler.feature_names_in_)
+    return engineer_features(records_columns(patients))
+
+def feature_rows_frame(rows: list) -> pd.DataFrame:
+    """Frame of rows that were already engineered (e.g. kept by the /predict cache)"""
+    return pd.DataFrame(rows, columns=scaler.feature_names_in_)
+
+def preprocess_input_data(patient_data: PatientFeatures):
     # === Scaling the features ===
-    scaled_data = scaler.transform(df)
+    scaled_data = scaler.transform(build_feature_frame(patient_data))
 
     return scaled_data
\ No newline at end of file
@@ -0,0 +1,74 @@
+"""Opt-in recording of API traffic for replay by benchmarks/loadgen.py.
+
+With REQUEST_RECORD_PATH set, every request to a recorded path (/predict and /chat by default)
+is appended to that file as one JSON line: arrival time, method, path, JSON body, status and
+latency. Bodies contain patient data, so only enable this where storing it is allowed.
+
+Each line is written with a single O_APPEND write, so several gunicorn workers can share the file.
+"""
+import os
+import json
+import time
+
+RECORDED_PATHS = ("/predict", "/chat")
+
+
+def record_path() -> str:
+    return os.getenv("REQUEST_RECORD_PATH", "")
+
+
+class RequestRecorder:
+    """ASGI middleware; buffers the request body as the app reads it, writes the line after the response"""
+
+    def __init__(self, app, path: str, recorded_paths=RECORDED_PATHS):
+        self.app = app
+        self.path = path
+        self.recorded_paths = set(recorded_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.recorded_paths or scope["method"] != "POST":
+            return await self.app(scope, receive, send)
+
+        arrived = time.time()
+        start = time.perf_counter()
+        chunks = []
+        status = 500
+
+        async def recording_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                chunks.append(message.get("body", b""))
+            return message
+
+        async def recording_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, recording_receive, recording_send)
+        finally:
+            self._write(arrived, scope, b"".join(chunks), status, time.perf_counter() - start)
+
+    def _write(self, arrived: float, scope, body: bytes, status: int, seconds: float):
+        try:
+            payload = json.loads(body) if body else None
+        except ValueError:
+            payload = body.decode("utf-8", errors="replace")
+        line = json.dumps({
+            "ts": round(arrived, 6),
+            "method": scope["method"],
+            "path": scope["path"],
+            "body": payload,
+            "status": status,
+            "latency_ms": round(seconds * 1000, 3),
+        }, ensure_ascii=False) + "\n"
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                os.write(fd, line.encode("utf-8"))
+            finally:
+                os.close(fd)
+        except OSError as e:
+            print(f"Could not record request to {self.path}: {e}")
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
+from typing import Any, Dict, List, Union
 
 class PatientFeatures(BaseModel):
     Age: int
@@ -30,4 +31,15 @@ class PatientFeatures(BaseModel):
     
 class PredictionResponse(BaseModel):
     reinfection_prediction: int
-    description: str
\ No newline at end of file
+    description: str
+
+class ValueRange(BaseModel):
+    """`num` evenly spaced values from `start` to `stop` inclusive (numbers or datetimes)"""
+    start: Union[float, datetime]
+    stop: Union[float, datetime]
+    num: int = Field(10, ge=2, le=1000)
+
+class WhatIfRequest(BaseModel):
+    patient: PatientFeatures
+    # Field name -> the values to try. Fields vary jointly (full grid), in the order given.
+    variations: Dict[str, Union[List[Any], ValueRange]]
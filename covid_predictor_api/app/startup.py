@@ -0,0 +1,253 @@
+"""Startup state of the serving process: what is loaded, how long it took, and whether it can serve.
+
+A cold start pays for four components. Without a warm-up the first request pays for them too:
+
+- features: the scaler and encoders (unpickled at import, which also imports sklearn), then
+  the first pass of a patient through the feature pipeline
+- model: the model and its compiled form (loaded at import), then the first prediction and
+  attribution through the compiled and the sklearn paths
+- embedder: the MiniLM sentence encoder (imports torch), then the first query embedding
+- index: the FAISS index and chunk store, then the first search
+
+Loads that happen at import are timed with `loading()`. `start_warmup()` then warms each component
+on its own thread. The embedder and the index load concurrently, since the index does not need
+the encoder until a query comes in. Each component reports `load_seconds` (the first load; in the
+gunicorn master when it is preloaded) and `warm_seconds` (the first calls in this process).
+
+The process is ready once every component in STARTUP_REQUIRED ("model,features" by default) is
+warm. The RAG components only count when listed, so a slow or missing index never keeps
+/predict out of rotation. STARTUP_WARMUP is "on" (every component), "off", or a comma-separated
+list of components.
+"""
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+COMPONENTS = ("features", "model", "embedder", "index")
+
+# A complete record from the training data, run through every path once
+SAMPLE_PATIENT = {
+    "Age": 70, "Gender": "Male", "Region": "Hovedstaden", "Preexisting_Condition": "Hypertension",
+    "Date_of_Infection": "2023-09-03", "COVID_Strain": "Alpha", "Symptoms": "Severe", "Severity": "Moderate",
+    "Hospitalized": "No", "Hospital_Admission_Date": "2023-09-05", "Hospital_Discharge_Date": "2023-09-11",
+    "ICU_Admission": "No", "Ventilator_Support": "No", "Recovered": "Yes", "Date_of_Recovery": "2023-12-03",
+    "Date_of_Reinfection": "2025-03-08", "Vaccination_Status": "Yes", "Vaccine_Type": "Moderna",
+    "Doses_Received": 2, "Date_of_Last_Dose": "2024-03-08", "Long_COVID_Symptoms": "Fatigue",
+    "Occupation": "Teacher", "Smoking_Status": "Never", "BMI": 29.7, "Recovery_Classification": "Delayed Recovery",
+}
+
+
+def _component_list(value: str, variable: str) -> List[str]:
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in COMPONENTS]
+    if unknown:
+        raise ValueError(f"{variable}: unknown components {unknown}, expected some of {list(COMPONENTS)}")
+    return names
+
+
+def required_components() -> List[str]:
+    return _component_list(os.getenv("STARTUP_REQUIRED", "model,features"), "STARTUP_REQUIRED")
+
+
+def warmup_components() -> List[str]:
+    value = os.getenv("STARTUP_WARMUP", "on").lower()
+    if value in ("0", "off", "false", "no"):
+        return []
+    if value in ("1", "on", "true", "yes"):
+        return list(COMPONENTS)
+    return _component_list(value, "STARTUP_WARMUP")
+
+
+class Component:
+    """pending -> loading -> ready, or warming -> ready; failed keeps the error"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.status = "pending"
+        self.load_seconds: Optional[float] = None
+        self.warm_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def report(self) -> dict:
+        return {
+            "status": self.status,
+            "load_seconds": None if self.load_seconds is None else round(self.load_seconds, 3),
+            "warm_seconds": None if self.warm_seconds is None else round(self.warm_seconds, 3),
+            "error": self.error,
+        }
+
+
+class StartupState:
+    """Per-component load and warm-up times of this process, and its readiness.
+
+    Times are measured from the creation of the state, i.e. when the app starts importing its models.
+    """
+
+    def __init__(self, required: List[str], clock=time.monotonic):
+        self.required = list(required)
+        self.clock = clock
+        self.started = clock()
+        self.ready_after: Optional[float] = None
+        self._components: Dict[str, Component] = {name: Component(name) for name in COMPONENTS}
+        self._lock = threading.Lock()
+
+    def component(self, name: str) -> Component:
+        return self._components[name]
+
+    def _set(self, name: str, **fields):
+        with self._lock:
+            for key, value in fields.items():
+                setattr(self._components[name], key, value)
+            # Time until the required components were last all ready (a warm-up un-readies them)
+            if not self._ready():
+                self.ready_after = None
+            elif self.ready_after is None:
+                self.ready_after = self.clock() - self.started
+
+    def _ready(self) -> bool:
+        return all(self._components[name].status == "ready" for name in self.required)
+
+    def ready(self) -> bool:
+        with self._lock:
+            return self._ready()
+
+    @contextmanager
+    def loading(self, name: str):
+        """Time the load of `name`; ready afterwards unless a warm-up is still running"""
+        component = self._components[name]
+        if component.status == "pending":
+            self._set(name, status="loading")
+        start = self.clock()
+        try:
+            yield
+        except Exception as e:
+            self._set(name, status="failed", error=f"{type(e).__name__}: {e}")
+            raise
+        fields = {"status": "ready"} if component.status == "loading" else {}
+        if component.load_seconds is None:
+            fields["load_seconds"] = self.clock() - start
+        self._set(name, **fields)
+
+    def mark_warming(self, name: str):
+        self._set(name, status="warming", error=None)
+
+    def warm(self, name: str, warmup: Callable[[], None]):
+        """Run `warmup` (loading anything not loaded yet); failures are recorded, not raised"""
+        if self._components[name].status != "warming":
+            self.mark_warming(name)
+        start = self.clock()
+        try:
+            warmup()
+        except Exception as e:
+            self._set(name, status="failed", error=f"{type(e).__name__}: {e}")
+            print(f"Warm-up of {name} failed: {e}")
+            return
+        self._set(name, status="ready", warm_seconds=self.clock() - start)
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self._ready(),
+                "required": self.required,
+                "uptime_seconds": round(self.clock() - self.started, 3),
+                "ready_after_seconds": None if self.ready_after is None else round(self.ready_after, 3),
+                "components": {name: component.report() for name, component in self._components.items()},
+            }
+
+
+state = StartupState(required_components())
+
+
+def loading(name: str):
+    """Time an import-time load of `name` in the process state"""
+    return state.loading(name)
+
+
+def sample_patient():
+    from app.schemas import PatientFeatures
+
+    return PatientFeatures(**SAMPLE_PATIENT)
+
+
+def _warm_features():
+    from app.preprocessing import build_feature_frame, scaler
+
+    patient = sample_patient()
+    build_feature_frame(patient)  # single-patient row transform
+    frame = build_feature_frame([patient] * 2)  # batch transform
+    scaler.transform(frame)
+
+
+def _warm_model():
+    from app import model_interface
+    from app.compiled_model import UnsupportedModelError
+    from app.preprocessing import build_feature_frame, scaler
+
+    frame = build_feature_frame([sample_patient()])
+    model_interface.predict_frame(frame)
+    model_interface.score_frame(frame)
+    # The sklearn path serves batches above COMPILED_MAX_BATCH
+    model_interface.model.predict_proba(scaler.transform(frame))
+    try:
+        model_interface.explain_frame(frame)
+    except UnsupportedModelError:
+        pass
+
+
+def _warm_embedder():
+    from RagModule.scripts.rag_pipeline import get_embeddings
+
+    with state.loading("embedder"):
+        embeddings = get_embeddings()
+    embeddings.embed_query("COVID-19 reinfection risk")
+
+
+def _warm_index():
+    from RagModule.scripts.rag_pipeline import get_vectorstore
+
+    with state.loading("index"):
+        vectorstore = get_vectorstore()
+    # A search by vector reads the index and the chunk store without needing the embedder
+    vectorstore.similarity_search_by_vector([0.0] * vectorstore.index.d, k=3)
+
+
+WARMUPS = {
+    "features": _warm_features,
+    "model": _warm_model,
+    "embedder": _warm_embedder,
+    "index": _warm_index,
+}
+
+
+def start_warmup(components: Optional[List[str]] = None) -> List[threading.Thread]:
+    """Warm `components` (default: STARTUP_WARMUP) on background threads; returns the threads"""
+    names = warmup_components() if components is None else components
+    # Marked before the threads start, so readiness never reports a half-warmed process
+    for name in names:
+        state.mark_warming(name)
+    threads = [
+        threading.Thread(target=state.warm, args=(name, WARMUPS[name]), name=f"warmup-{name}", daemon=True)
+        for name in names
+    ]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def warm_up(components: Optional[List[str]] = None, timeout: Optional[float] = None) -> dict:
+    """Warm `components` in parallel and wait for them; returns the startup report"""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    for thread in start_warmup(components):
+        thread.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+    return state.report()
+
+
+def _reset_after_fork():
+    # The warm-up threads do not survive fork; the recorded times do
+    state._lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
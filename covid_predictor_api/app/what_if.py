@@ -0,0 +1,118 @@
+"""Counterfactual "what-if" sweeps for `/predict/what-if`.
+
+Clinicians probe the model by changing one field at a time (doses, vaccine type, date of last
+dose) and resubmitting to `/predict`, which also waits for the LLM each time. A sweep takes one
+patient and a list of values per field, builds every combination as a row, and scores all rows
+plus the unmodified patient in one `engineer_features` + `score_frame` pass. No LLM is called.
+
+Only the distinct grid values are validated, with the same Pydantic types as PatientFeatures.
+The rows themselves are index arrays into those values, so a 10,000-row grid costs no
+per-row Python work.
+"""
+import os
+from datetime import datetime, timezone
+from math import prod
+
+import numpy as np
+import pandas as pd
+from pydantic import TypeAdapter, ValidationError
+
+from app.model_interface import score_frame
+from app.preprocessing import engineer_features
+from app.schemas import PatientFeatures, ValueRange
+
+# Largest grid one request may ask for (rows = product of the value counts)
+WHAT_IF_MAX_ROWS = int(os.getenv("WHAT_IF_MAX_ROWS", "10000"))
+
+
+class WhatIfError(ValueError):
+    """The requested variations cannot be applied to PatientFeatures"""
+
+    def __init__(self, errors: list):
+        self.errors = errors
+        super().__init__("; ".join(errors))
+
+
+def _utc(value: datetime) -> datetime:
+    # Naive values are taken as UTC, like the feature pipeline
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def expand_range(annotation, spec: ValueRange) -> list:
+    """The values of a {start, stop, num} range for an int, float or datetime field"""
+    if annotation is datetime:
+        if not (isinstance(spec.start, datetime) and isinstance(spec.stop, datetime)):
+            raise ValueError("start and stop must both be datetimes")
+        start, stop = spec.start, spec.stop
+        # pandas only steps between endpoints in the same time zone
+        if start.tzinfo != stop.tzinfo:
+            start, stop = _utc(start), _utc(stop)
+        return list(pd.date_range(start, stop, periods=spec.num).to_pydatetime())
+    if annotation not in (int, float) or isinstance(spec.start, datetime) or isinstance(spec.stop, datetime):
+        raise ValueError(f"ranges need numeric start/stop and a numeric or datetime field, not {annotation.__name__}")
+    values = np.linspace(spec.start, spec.stop, spec.num)
+    if annotation is int:
+        # Rounding can repeat values on short integer ranges
+        return list(dict.fromkeys(np.rint(values).astype(int).tolist()))
+    return values.tolist()
+
+
+def resolve_axes(variations: dict) -> list:
+    """[(field, validated values)] in request order, or WhatIfError listing every problem"""
+    if not variations:
+        raise WhatIfError(["variations: give at least one field to vary"])
+    errors = []
+    axes = []
+    for name, spec in variations.items():
+        field = PatientFeatures.model_fields.get(name)
+        if field is None:
+            errors.append(f"{name}: not a PatientFeatures field")
+            continue
+        try:
+            raw = expand_range(field.annotation, spec) if isinstance(spec, ValueRange) else spec
+        except ValueError as e:
+            errors.append(f"{name}: {e}")
+            continue
+        if not raw:
+            errors.append(f"{name}: no values")
+            continue
+        adapter = TypeAdapter(field.annotation)
+        try:
+            axes.append((name, [adapter.validate_python(value) for value in raw]))
+        except ValidationError as e:
+            errors.append(f"{name}: {e.errors()[0]['msg']}")
+    if errors:
+        raise WhatIfError(errors)
+    return axes
+
+
+def sweep(patient: PatientFeatures, variations: dict, max_rows: int = WHAT_IF_MAX_ROWS) -> dict:
+    """Risk and label of every combination of `variations` applied to `patient`.
+
+    `risk` and `prediction` are nested lists with one dimension per varied field, in request
+    order: risk[i][j] is the patient with the i-th value of the first field and the j-th value
+    of the second.
+    """
+    axes = resolve_axes(variations)
+    shape = tuple(len(values) for _, values in axes)
+    rows = prod(shape)
+    if rows > max_rows:
+        raise WhatIfError([f"the grid has {rows} rows; at most {max_rows} are allowed"])
+
+    # Row `rows` (the last) is the unmodified patient
+    base = patient.model_dump()
+    columns = {name: np.full(rows + 1, value, dtype=object) for name, value in base.items()}
+    index = np.indices(shape).reshape(len(shape), rows)
+    for (name, values), positions in zip(axes, index):
+        choices = np.empty(len(values), dtype=object)
+        choices[:] = values
+        columns[name][:rows] = choices[positions]
+
+    risk, labels = score_frame(engineer_features(columns))
+    return {
+        "axes": [{"field": name, "values": values} for name, values in axes],
+        "risk": risk[:rows].round(4).reshape(shape).tolist(),
+        "prediction": labels[:rows].reshape(shape).tolist(),
+        "baseline": {"risk": round(float(risk[rows]), 4), "prediction": str(labels[rows])},
+        "rows": rows,
+    }
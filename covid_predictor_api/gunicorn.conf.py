@@ -0,0 +1,52 @@
+"""Production serving mode: N uvicorn workers under gunicorn sharing one preloaded copy of the models.
+
+    cd covid_predictor_api
+    WEB_CONCURRENCY=4 gunicorn -c gunicorn.conf.py main:app
+
+With `preload_app` the master imports `main` (sklearn model, scaler, encoders), then loads and
+warms the MiniLM embedder and FAISS index *before* forking. Workers inherit those pages copy-on-write,
+and `gc.freeze()` keeps the garbage collector from touching (and so copying) them afterwards.
+Per-worker unique memory is logged at boot and served by `/health/memory`.
+"""
+import gc
+import os
+import multiprocessing
+
+# One BLAS/OpenMP thread per worker: parallelism comes from the worker processes
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+os.environ.setdefault("MKL_NUM_THREADS", "1")
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+
+def when_ready(server):
+    """Runs in the master once the app is imported and before any worker is forked"""
+    if preload_app:
+        from app.startup import COMPONENTS, warm_up
+
+        # Warm in the master so workers fork with everything loaded (see app/startup.py)
+        components = list(COMPONENTS) if os.getenv("RAG_PRELOAD_INDEX", "1") == "1" else ["features", "model"]
+        report = warm_up(components)
+        for name in components:
+            component = report["components"][name]
+            if component["status"] == "failed":
+                server.log.warning(f"{name} not preloaded, workers will load it lazily: {component['error']}")
+            else:
+                server.log.info(
+                    f"{name} preloaded in master: load {component['load_seconds']} s, warm-up {component['warm_seconds']} s"
+                )
+        # Move everything allocated so far out of the GC's reach so workers never dirty those pages
+        gc.freeze()
+
+
+def post_worker_init(worker):
+    from app.memory import process_memory
+
+    worker.log.info(f"Worker {worker.pid} ready, memory: {process_memory()}")
@@ -1,26 +1,53 @@
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
 from datetime import datetime
+from contextlib import asynccontextmanager
 import sys
 import os
-from app.schemas import PatientFeatures
-from app.model_interface import get_prediction
-from pydantic import BaseModel
+from app.schemas import PatientFeatures, WhatIfRequest
+from app.model_interface import active_backend, explain_first_row, model_version, predict_frame, start_model_watcher
+from app.prediction_cache import cache_enabled, get_prediction_cache, prediction_key
+from app.arrow_input import ARROW_STREAM_MEDIA_TYPE, ArrowInputError, arrow_available, arrow_columns, predictions_to_ipc
+from app.memory import process_memory
+from app.what_if import WhatIfError, sweep
+from app.drift import drift_enabled, get_drift_monitor, observe, observe_patients
+from app.preprocessing import build_feature_frame, engineer_features, feature_rows_frame
+from app.compiled_model import UnsupportedModelError
+from app.request_recorder import RequestRecorder, record_path
+from app.startup import start_warmup, state as startup_state
+from pydantic import BaseModel, Field
 import requests 
 #This line ensures the parent directory is in the path for module imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from RagModule.scripts.rag_pipeline import generate_explanation  # No try-except
-from RagModule.scripts.rag_pipeline import generate_chat_response
+from RagModule.scripts.rag_pipeline import agenerate_chat_response, agenerate_conversation_response, agenerate_ml_aware_response
+from RagModule.scripts.conversation_memory import get_conversation_store
+from RagModule.scripts.llm_gateway import CircuitOpenError, LLMGatewayError, get_gateway
+from RagModule.scripts.llm_providers import LLMUnavailableError
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm the model, feature pipeline, embedder and index on background threads (see app/startup.py);
+    # the server accepts connections meanwhile and /health/ready says when it can serve
+    start_warmup()
+    # Picks up a retrained model, scaler and encoders (see model_interface.reload_model)
+    start_model_watcher()
+    yield
 
 app = FastAPI(
     title="Reinfection Prediction API",
     description="API for predicting reinfection based on patient features",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 class ChatRequest(BaseModel):
     question: str
+    # Follow-up questions in the same session see the earlier turns (see conversation_memory.py)
+    session_id: Optional[str] = Field(None, max_length=128)
 
 # Add CORS middleware to allow frontend connections
 app.add_middleware(
@@ -31,6 +58,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Traffic capture for benchmarks/loadgen.py --replay (off unless REQUEST_RECORD_PATH is set)
+if record_path():
+    app.add_middleware(RequestRecorder, path=record_path())
 
 @app.get("/")
 def read_root():
@@ -41,43 +71,197 @@ def read_root():
 
 @app.get("/health")
 def health_check():
+    try:
+        llm_gateway = get_gateway().stats()
+    except LLMUnavailableError as e:
+        llm_gateway = {"error": str(e)}
     return {
-        "status": "healthy",
-        "services": ["prediction", "RAG_explanation"]
+        "status": "healthy" if startup_state.ready() else "starting",
+        "services": ["prediction", "RAG_explanation"],
+        "model_backend": active_backend(),
+        "prediction_cache": get_prediction_cache().stats() if cache_enabled() else None,
+        "llm_gateway": llm_gateway
     }
 
+@app.get("/health/live")
+def liveness():
+    """The process is up and serving requests (it may still be warming up)"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+def readiness():
+    """200 once the STARTUP_REQUIRED components are loaded and warm, 503 before; with per-component times"""
+    report = startup_state.report()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+@app.get("/health/chat-sessions")
+def chat_session_stats():
+    """Conversation sessions held by this worker"""
+    return get_conversation_store().stats()
+
+@app.delete("/chat/sessions/{session_id}")
+def end_chat_session(session_id: str):
+    """Forget a conversation (e.g. when the user clears the chat)"""
+    return {"session_id": session_id, "deleted": get_conversation_store().drop(session_id)}
+
+@app.get("/health/memory")
+def memory_usage():
+    """Memory of the worker that served this request (USS = what the worker does not share)"""
+    return process_memory()
+
+def prediction_only_description(prediction: str) -> str:
+    """Fallback text when the LLM is unavailable: the ML prediction is still valid"""
+    return (
+        "[ Prediction Only ]\n"
+        f"ML Prediction: {prediction} risk.\n"
+        "The literature-based explanation is temporarily unavailable. Please try again later."
+    )
+
+@app.get("/health/prediction-cache")
+def prediction_cache_stats():
+    """Hit/miss counters of the exact-match /predict cache in this worker"""
+    if not cache_enabled():
+        return {"enabled": False}
+    return {"enabled": True, **get_prediction_cache().stats()}
+
+@app.get("/health/drift")
+def drift_report():
+    """Drift of the inputs this worker has scored since start (or the last reset) vs the training data"""
+    monitor = get_drift_monitor() if drift_enabled() else None
+    if monitor is None:
+        return {"enabled": False}
+    return {"enabled": True, **monitor.report()}
+
+@app.post("/health/drift/reset")
+def drift_reset():
+    """Start a new observation window in this worker"""
+    monitor = get_drift_monitor() if drift_enabled() else None
+    if monitor is None:
+        return {"enabled": False}
+    monitor.reset()
+    return {"enabled": True, "observations": 0}
+
 @app.options("/predict")
 def predict_options():
     """Handle CORS preflight requests for the predict endpoint"""
     return {"status": "ok"}
 
+async def attributions_for(frame):
+    """Decision-path attribution of the first patient's prediction; None for non-tree models"""
+    try:
+        return await run_in_threadpool(explain_first_row, frame)
+    except UnsupportedModelError:
+        return None
+
 @app.post("/predict")
-def predict(data: List[PatientFeatures]):
+async def predict(data: List[PatientFeatures], explain: bool = False):
     try:
         if not data:
             raise HTTPException(status_code=400, detail="No patient data provided")
-        
-        # Get ML prediction
-        prediction = get_prediction(data)     
+
+        # The response depends only on the first patient: identical records under the same
+        # model version are answered from the cache (label and explanation)
+        cache = get_prediction_cache() if cache_enabled() else None
+        version = model_version()
+        key = prediction_key(data[0], version) if cache is not None else None
+        cached = cache.get(key, version) if cache is not None else None
+
+        # Every request counts toward input drift, including the ones the cache answers. A hit on
+        # a single patient reuses the engineered row kept in the cache; otherwise the batch is
+        # engineered once and shared by the drift monitor and the model.
+        if cached is not None and len(data) == 1:
+            frame = feature_rows_frame([cached["features"]])
+        else:
+            frame = await run_in_threadpool(build_feature_frame, data)
+        await run_in_threadpool(observe_patients, frame, data)
+        features = frame.iloc[0].tolist()
+        # ?explain=true adds per-feature contributions from the model itself (no LLM)
+        extra = {"attributions": await attributions_for(frame)} if explain else {}
+
+        if cached is not None and cached.get("description") is not None:
+            return {
+                "reinfection_prediction": cached["prediction"],
+                "description": cached["description"],
+                "services": ["prediction", "integrated_analysis"],
+                "cached": True,
+                **extra
+            }
+
+        if cached is not None:
+            # Label cached by an earlier degraded response; only the explanation is retried
+            prediction = cached["prediction"]
+        else:
+            # Get ML prediction (CPU-bound pandas/sklearn work runs off the event loop)
+            prediction = (await run_in_threadpool(predict_frame, frame))[0]
         # Prepare patient data
         first_patient_dict = data[0].model_dump() if hasattr(data[0], 'model_dump') else data[0].dict()
         
-        # Generate integrated explanation
-        from RagModule.scripts.rag_pipeline import generate_ml_aware_response
-        description = generate_ml_aware_response(
-            patient=first_patient_dict,
-            ml_prediction=str(prediction)
-        )
+        # Generate integrated explanation; degrade to the prediction alone if the LLM is unavailable
+        try:
+            description = await agenerate_ml_aware_response(
+                patient=first_patient_dict,
+                ml_prediction=str(prediction)
+            )
+        except (LLMGatewayError, LLMUnavailableError) as e:
+            print(f"LLM unavailable, returning prediction only: {str(e)}")
+            if cache is not None:
+                cache.put(key, version, {"prediction": str(prediction), "description": None, "features": features})
+            return {
+                "reinfection_prediction": str(prediction),
+                "description": prediction_only_description(str(prediction)),
+                "services": ["prediction"],
+                "degraded": True,
+                **extra
+            }
         
+        if cache is not None:
+            cache.put(key, version, {"prediction": str(prediction), "description": description, "features": features})
         return {
             "reinfection_prediction": str(prediction), 
             "description": description,
-            "services": ["prediction", "integrated_analysis"]
+            "services": ["prediction", "integrated_analysis"],
+            **extra
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in prediction: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+@app.post("/predict/arrow")
+async def predict_arrow(request: Request):
+    """Bulk scoring of an Arrow IPC batch of PatientFeatures columns (predictions only, no LLM).
+
+    Answers with JSON, or with an Arrow IPC stream when the Accept header asks for one.
+    """
+    if not arrow_available():
+        raise HTTPException(status_code=501, detail="pyarrow is not installed on the server")
+    body = await request.body()
+    try:
+        columns = await run_in_threadpool(arrow_columns, body)
+    except ArrowInputError as e:
+        raise HTTPException(status_code=422, detail=e.errors)
+    frame = await run_in_threadpool(engineer_features, columns)
+    await run_in_threadpool(observe, frame, columns)
+    predictions = await run_in_threadpool(predict_frame, frame)
+
+    if ARROW_STREAM_MEDIA_TYPE in request.headers.get("accept", ""):
+        return Response(content=predictions_to_ipc(predictions), media_type=ARROW_STREAM_MEDIA_TYPE)
+    return {
+        "reinfection_predictions": predictions,
+        "count": len(predictions),
+        "services": ["prediction"]
+    }
+
+@app.post("/predict/what-if")
+async def predict_what_if(request: WhatIfRequest):
+    """Risk surface for one patient over a grid of field variations (one model pass, no LLM)"""
+    try:
+        surface = await run_in_threadpool(sweep, request.patient, request.variations)
+    except WhatIfError as e:
+        raise HTTPException(status_code=422, detail=e.errors)
+    return {**surface, "model_version": model_version(), "services": ["prediction"]}
+
 @app.post("/chat")
 async def chat_endpoint(chat_request: ChatRequest):  
     try:
@@ -85,8 +269,21 @@ async def chat_endpoint(chat_request: ChatRequest):
         if not question:
             raise HTTPException(status_code=400, detail="Question is required")
         
-        response = generate_chat_response(question)
+        if chat_request.session_id:
+            response, memory = await agenerate_conversation_response(question, chat_request.session_id)
+            return {"response": response, "session_id": chat_request.session_id, "memory": memory}
+        response = await agenerate_chat_response(question)
         return {"response": response}
     
+    except HTTPException:
+        raise
+    except CircuitOpenError as e:
+        return JSONResponse(
+            status_code=503,
+            content={"detail": str(e)},
+            headers={"Retry-After": str(max(1, round(e.retry_after)))}
+        )
+    except (LLMGatewayError, LLMUnavailableError) as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -0,0 +1,18 @@
+import pandas as pd
+import pytest
+
+from app.preprocessing import DATE_COLUMNS, MODEL_DIR
+
+DATA_DIR = MODEL_DIR.parent.parent / "data"
+
+
+@pytest.fixture(scope="session")
+def patient_records():
+    """First 200 complete rows of the raw dataset as /predict payload dicts"""
+    df = pd.read_csv(DATA_DIR / "Covid-19 Dataset.csv").drop(columns=["Patient_ID", "Reinfection"])
+    df = df.dropna(subset=DATE_COLUMNS).head(200)
+    for column in DATE_COLUMNS:
+        df[column] = pd.to_datetime(df[column]).dt.strftime("%Y-%m-%dT00:00:00.000Z")
+    object_columns = df.select_dtypes(exclude="number").columns
+    df[object_columns] = df[object_columns].fillna("None")
+    return df.to_dict(orient="records")
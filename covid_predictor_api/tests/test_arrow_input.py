@@ -0,0 +1,63 @@
+import pandas as pd
+import pyarrow as pa
+import pytest
+from fastapi.testclient import TestClient
+
+from app.arrow_input import ARROW_STREAM_MEDIA_TYPE, ArrowInputError, arrow_feature_frame
+from app.model_interface import predict_labels
+from app.preprocessing import DATE_COLUMNS, build_feature_frame
+from app.schemas import PatientFeatures
+from main import app
+
+client = TestClient(app)
+
+
+def to_ipc(table: pa.Table) -> bytes:
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def test_arrow_features_match_json_path(patient_records):
+    expected = build_feature_frame([PatientFeatures(**record) for record in patient_records])
+
+    # Dates as ISO strings, exactly as a JSON client would send them
+    table = pa.Table.from_pylist(patient_records)
+    pd.testing.assert_frame_equal(arrow_feature_frame(to_ipc(table)), expected, check_dtype=False)
+
+    # Dates as native Arrow timestamps, categories dictionary-encoded
+    frame = pd.DataFrame(patient_records)
+    for column in DATE_COLUMNS:
+        frame[column] = pd.to_datetime(frame[column])
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    table = table.set_column(table.schema.get_field_index("Region"), "Region", table.column("Region").dictionary_encode())
+    pd.testing.assert_frame_equal(arrow_feature_frame(to_ipc(table)), expected, check_dtype=False)
+
+
+def test_predict_arrow_endpoint(patient_records):
+    expected = predict_labels([PatientFeatures(**record) for record in patient_records])
+    body = to_ipc(pa.Table.from_pylist(patient_records))
+
+    response = client.post("/predict/arrow", content=body, headers={"Content-Type": ARROW_STREAM_MEDIA_TYPE})
+    assert response.status_code == 200
+    assert response.json()["reinfection_predictions"] == expected
+
+    response = client.post("/predict/arrow", content=body, headers={"Accept": ARROW_STREAM_MEDIA_TYPE})
+    assert response.headers["content-type"] == ARROW_STREAM_MEDIA_TYPE
+    assert pa.ipc.open_stream(response.content).read_all().column("reinfection_prediction").to_pylist() == expected
+
+
+def test_schema_errors_are_reported_per_column(patient_records):
+    table = pa.Table.from_pylist(patient_records).drop_columns(["BMI"])
+    table = table.set_column(table.schema.get_field_index("Age"), "Age", pa.array([str(r["Age"]) for r in patient_records]))
+    dates = [r["Date_of_Infection"] for r in patient_records]
+    dates[0] = "not a date"
+    table = table.set_column(table.schema.get_field_index("Date_of_Infection"), "Date_of_Infection", pa.array(dates))
+
+    with pytest.raises(ArrowInputError) as excinfo:
+        arrow_feature_frame(to_ipc(table))
+    assert sorted(error.split(":")[0] for error in excinfo.value.errors) == ["Age", "BMI", "Date_of_Infection"]
+
+    response = client.post("/predict/arrow", content=b"not arrow")
+    assert response.status_code == 422
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+
+import main
+from app import model_interface
+from app.attributions import PathAttributions
+from app.compiled_model import compile_model
+from app.model_interface import explain_frame, explain_patient, model
+from app.preprocessing import MODEL_DIR, build_feature_frame, scaler
+from app.schemas import PatientFeatures
+
+DATA_DIR = MODEL_DIR.parent.parent / "data"
+FEATURES = list(scaler.feature_names_in_)
+X_TEST = pd.read_csv(DATA_DIR / "splitted_data" / "X_test.csv")[FEATURES]
+
+client = TestClient(main.app)
+
+
+def fitted(estimator, target="Reinfection"):
+    X_train = pd.read_csv(DATA_DIR / "splitted_data" / "X_train.csv")
+    y_train = X_train[target] if target != "Reinfection" else pd.read_csv(DATA_DIR / "splitted_data" / "y_train.csv")[target]
+    fitted_scaler = StandardScaler().fit(X_train[FEATURES])
+    return estimator.fit(fitted_scaler.transform(X_train[FEATURES]), y_train), fitted_scaler
+
+
+@pytest.mark.parametrize("max_batch", [256, 0])
+def test_contributions_add_up_to_the_shipped_model_probability(monkeypatch, max_batch):
+    # Leaves from the compiled traversal and from sklearn's apply
+    monkeypatch.setattr(model_interface, "COMPILED_MAX_BATCH", max_batch)
+    explainer, contributions, output = explain_frame(X_TEST.iloc[:200])
+    assert contributions.shape == (200, len(FEATURES))
+    expected = model.predict_proba(scaler.transform(X_TEST.iloc[:200]))[:, 1]
+    assert np.allclose(output, expected, rtol=0, atol=1e-12)
+    assert explainer.output == "probability"
+
+
+def test_single_tree_contributions_follow_the_decision_path():
+    estimator, fitted_scaler = fitted(DecisionTreeClassifier(max_depth=6, random_state=0))
+    explainer = PathAttributions(compile_model(estimator, fitted_scaler))
+    X = X_TEST.iloc[:50]
+    scaled = fitted_scaler.transform(X)
+    contributions = explainer.from_leaves(compile_model(estimator, fitted_scaler).apply(X.to_numpy()))
+
+    tree = estimator.tree_
+    paths = estimator.decision_path(scaled).toarray()
+    for row, path in enumerate(paths):
+        expected = np.zeros(len(FEATURES))
+        nodes = np.flatnonzero(path)
+        for parent, child in zip(nodes[:-1], nodes[1:]):
+            expected[tree.feature[parent]] += tree.value[child, 0, 1] - tree.value[parent, 0, 1]
+        assert np.allclose(contributions[row], expected, atol=1e-12)
+    assert explainer.bias == pytest.approx(tree.value[0, 0, 1])
+
+
+@pytest.mark.parametrize("estimator, target", [
+    (RandomForestClassifier(n_estimators=10, random_state=0), "Reinfection"),
+    (GradientBoostingClassifier(n_estimators=20, random_state=0), "Reinfection"),
+    (GradientBoostingClassifier(n_estimators=10, max_depth=2, random_state=0), "Severity"),
+])
+def test_contributions_add_up_for_retrained_models(estimator, target):
+    estimator, fitted_scaler = fitted(estimator, target)
+    compiled = compile_model(estimator, fitted_scaler)
+    leaves = compiled.apply(X_TEST.to_numpy())
+    scaled = fitted_scaler.transform(X_TEST)
+    # Binary models explain the positive class, multiclass models each class in turn
+    for class_index in range(len(estimator.classes_)) if len(estimator.classes_) > 2 else [1]:
+        explainer = PathAttributions(compiled, class_index=class_index)
+        output = explainer.bias + explainer.from_leaves(leaves).sum(axis=1)
+        if isinstance(estimator, GradientBoostingClassifier):
+            raw = estimator.decision_function(scaled)
+            expected = raw if raw.ndim == 1 else raw[:, class_index]
+        else:
+            expected = estimator.predict_proba(scaled)[:, class_index]
+        assert np.allclose(output, expected, atol=1e-9)
+
+
+def test_patient_summary_and_predict_explain(monkeypatch, patient_records):
+    patient = PatientFeatures(**patient_records[0])
+    summary = explain_patient(patient, top=5)
+    assert len(summary["contributions"]) == 5
+    magnitudes = [abs(v) for v in summary["contributions"].values()]
+    assert magnitudes == sorted(magnitudes, reverse=True)
+    expected = model.predict_proba(scaler.transform(build_feature_frame([patient])))[0, 1]
+    assert summary["value"] == pytest.approx(expected, abs=1e-5)
+
+    async def explain(patient, ml_prediction):
+        return "explanation"
+
+    monkeypatch.setattr(main, "agenerate_ml_aware_response", explain)
+    monkeypatch.setattr(main, "cache_enabled", lambda: False)
+    engineered = []
+    monkeypatch.setattr(main, "build_feature_frame", lambda patients: engineered.append(patients) or build_feature_frame(patients))
+    body = client.post("/predict?explain=true", json=[patient_records[0]]).json()
+    assert len(engineered) == 1  # shared by the prediction and the attributions
+    assert body["attributions"]["explained_class"] == 1
+    assert len(body["attributions"]["contributions"]) == len(FEATURES)
+    assert "attributions" not in client.post("/predict", json=[patient_records[0]]).json()
@@ -0,0 +1,33 @@
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+
+import main
+from RagModule.scripts import conversation_memory, rag_pipeline
+from RagModule.scripts.conversation_memory import ConversationStore
+from RagModule.scripts.llm_gateway import reset_gateways
+from RagModule.scripts.llm_providers import reset_llm_cache
+
+
+class StubRetriever:
+    def invoke(self, query):
+        return [Document(page_content="Vaccination reduces the risk of reinfection.")]
+
+
+def test_chat_sessions_remember_turns_and_can_be_ended(monkeypatch, tmp_path):
+    monkeypatch.setenv("LLM_PROVIDER", "fake")
+    monkeypatch.setattr(rag_pipeline, "LOG_PATH", str(tmp_path / "qna_history.json"))
+    monkeypatch.setattr(rag_pipeline, "_retriever", StubRetriever())
+    monkeypatch.setattr(conversation_memory, "_store", ConversationStore(max_sessions=10))
+    reset_llm_cache()
+    reset_gateways()
+
+    with TestClient(main.app) as client:
+        first = client.post("/chat", json={"question": "Do vaccines prevent reinfection?", "session_id": "s1"}).json()
+        second = client.post("/chat", json={"question": "For how long?", "session_id": "s1"}).json()
+        assert first["session_id"] == "s1" and second["memory"]["turns"] == 2
+        assert second["memory"]["prompt_tokens"] > first["memory"]["prompt_tokens"]
+        assert "memory" not in client.post("/chat", json={"question": "Is reinfection common?"}).json()
+
+        assert client.get("/health/chat-sessions").json()["sessions"] == 1
+        assert client.delete("/chat/sessions/s1").json()["deleted"] is True
+        assert client.get("/health/chat-sessions").json()["sessions"] == 0
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+
+from app import model_interface
+from app.compiled_model import COMPILED_MODEL_PATH, CompiledTreeModel, compile_model, load_or_compile, source_hash
+from app.model_interface import MODEL_PATH, model, predict_labels
+from app.preprocessing import MODEL_DIR, scaler
+from app.schemas import PatientFeatures
+
+DATA_DIR = MODEL_DIR.parent.parent / "data"
+FEATURES = list(scaler.feature_names_in_)
+X_TEST = pd.read_csv(DATA_DIR / "splitted_data" / "X_test.csv")[FEATURES]
+
+
+def assert_parity(compiled, estimator, fitted_scaler, X):
+    scaled = fitted_scaler.transform(X)
+    raw = X.to_numpy(dtype=np.float64)
+    assert np.array_equal(compiled.predict(raw), estimator.predict(scaled))
+    assert np.array_equal(compiled.predict_proba(raw), estimator.predict_proba(scaled))
+
+
+def boundary_rows(compiled, X):
+    """One row per split at, just above and just below its folded threshold"""
+    internal = np.isfinite(compiled.threshold)
+    features, thresholds = compiled.feature[internal], compiled.threshold[internal]
+    values = np.concatenate([thresholds, np.nextafter(thresholds, np.inf), np.nextafter(thresholds, -np.inf)])
+    rows = np.repeat(X.to_numpy(dtype=np.float64)[:1], len(values), axis=0)
+    rows[np.arange(len(values)), np.tile(features, 3)] = values
+    return pd.DataFrame(rows, columns=X.columns)
+
+
+def test_shipped_model_matches_sklearn_on_test_split():
+    compiled = compile_model(model, scaler)
+    assert_parity(compiled, model, scaler, X_TEST)
+
+
+def test_folded_thresholds_split_exactly_like_sklearn():
+    compiled = compile_model(model, scaler)
+    assert_parity(compiled, model, scaler, boundary_rows(compiled, X_TEST))
+
+
+@pytest.mark.parametrize("estimator, target", [
+    (DecisionTreeClassifier(random_state=0, class_weight="balanced"), "Reinfection"),
+    (RandomForestClassifier(n_estimators=10, random_state=0), "Reinfection"),
+    (GradientBoostingClassifier(n_estimators=20, random_state=0), "Reinfection"),
+    (GradientBoostingClassifier(n_estimators=10, max_depth=2, random_state=0), "Severity"),
+])
+def test_retrained_models_match_sklearn(estimator, target):
+    X_train = pd.read_csv(DATA_DIR / "splitted_data" / "X_train.csv")
+    y_train = pd.read_csv(DATA_DIR / "splitted_data" / "y_train.csv")["Reinfection"]
+    if target != "Reinfection":
+        # Multiclass case: predict one of the categorical features from the others
+        y_train = X_train[target]
+    fitted_scaler = StandardScaler().fit(X_train[FEATURES])
+    estimator.fit(fitted_scaler.transform(X_train[FEATURES]), y_train)
+
+    compiled = compile_model(estimator, fitted_scaler)
+    assert_parity(compiled, estimator, fitted_scaler, X_TEST)
+    assert_parity(compiled, estimator, fitted_scaler, boundary_rows(compiled, X_TEST))
+
+
+def test_exported_model_is_current_and_round_trips(tmp_path):
+    exported = CompiledTreeModel.load(COMPILED_MODEL_PATH)
+    assert exported.source_hash == source_hash(MODEL_PATH, MODEL_DIR / "scaler.pkl")
+    assert_parity(exported, model, scaler, X_TEST)
+
+    path = tmp_path / "compiled.npz"
+    exported.save(path)
+    reloaded = CompiledTreeModel.load(path)
+    assert np.array_equal(reloaded.predict_proba(X_TEST.to_numpy()), exported.predict_proba(X_TEST.to_numpy()))
+
+
+def test_unsupported_models_fall_back_to_sklearn(tmp_path):
+    estimator = LogisticRegression().fit(scaler.transform(X_TEST), np.arange(len(X_TEST)) % 2)
+    assert load_or_compile(estimator, scaler, "hash", path=tmp_path / "missing.npz") is None
+
+
+def test_backends_agree_on_raw_patients(monkeypatch, patient_records):
+    patients = [PatientFeatures(**record) for record in patient_records]
+
+    compiled = predict_labels(patients)
+    monkeypatch.setattr(model_interface, "compiled_model", None)
+    assert predict_labels(patients) == compiled
@@ -0,0 +1,122 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from app import drift
+from app.drift import BASELINE_PATH, MAX_UNSEEN_LABELS, TRAINING_DATA, DriftMonitor, build_baseline, load_baseline
+from app.features import CATEGORICAL_FEATURES
+from app.prediction_cache import PredictionCache
+from app.preprocessing import ENCODINGS, scaler
+
+client = TestClient(main.app)
+
+X_TRAIN = pd.read_csv(TRAINING_DATA)[list(scaler.feature_names_in_)]
+BASELINE = build_baseline(X_TRAIN)
+
+
+def training_labels(X: pd.DataFrame) -> dict:
+    """Raw labels of the categorical fields, decoded from the training codes"""
+    return {name: ENCODINGS[name][X[name].to_numpy(dtype=int)] for name in CATEGORICAL_FEATURES if name in X}
+
+
+def test_training_data_shows_no_drift():
+    monitor = DriftMonitor(BASELINE)
+    monitor.observe(X_TRAIN, training_labels(X_TRAIN))
+    report = monitor.report()
+    assert report["status"] == "stable" and report["drifted_features"] == []
+    for name, entry in report["features"].items():
+        assert entry["psi"] == pytest.approx(0, abs=1e-9), name
+    assert set(report["unseen_category_rate"].values()) == {0.0}
+
+
+def test_row_by_row_updates_equal_one_batch_update():
+    batch, rows = DriftMonitor(BASELINE), DriftMonitor(BASELINE)
+    sample = X_TRAIN.head(100)
+    labels = training_labels(sample)
+    batch.observe(sample, labels)
+    for i in range(len(sample)):
+        rows.observe(sample.iloc[i:i + 1], {name: values[i:i + 1] for name, values in labels.items()})
+    assert rows.report() == batch.report()
+
+
+def test_shifted_numbers_and_new_categories_are_flagged():
+    monitor = DriftMonitor(BASELINE)
+    shifted = X_TRAIN.head(500).copy()
+    shifted["Age"] += 40
+    labels = training_labels(shifted)
+    labels["Vaccine_Type"] = np.where(np.arange(500) % 5 == 0, "Novavax", labels["Vaccine_Type"])
+    monitor.observe(shifted, labels)
+
+    report = monitor.report()
+    age = report["features"]["Age"]
+    assert age["status"] == "significant" and age["ks"] > 0.3
+    assert age["quantiles"]["0.5"] > age["baseline_quantiles"]["0.5"] + 20
+    vaccine = report["features"]["Vaccine_Type"]
+    assert vaccine["unseen_rate"] == 0.2 and vaccine["unseen_labels"] == {"Novavax": 100}
+    assert report["status"] == "significant"
+    assert {"Age", "Vaccine_Type"} <= set(report["drifted_features"])
+
+
+def test_unseen_labels_are_bounded():
+    monitor = DriftMonitor(BASELINE)
+    X = X_TRAIN.head(MAX_UNSEEN_LABELS + 10)
+    labels = training_labels(X)
+    labels["COVID_Strain"] = np.array([f"Variant {i}" for i in range(len(X))])
+    monitor.observe(X, labels)
+    unseen = monitor.report()["features"]["COVID_Strain"]["unseen_labels"]
+    assert len(unseen) == MAX_UNSEEN_LABELS + 1 and unseen["(other)"] == 10
+
+
+def test_too_few_observations_are_not_scored():
+    monitor = DriftMonitor(BASELINE)
+    monitor.observe(X_TRAIN.head(5), training_labels(X_TRAIN.head(5)))
+    report = monitor.report()
+    assert report["status"] == "insufficient_data" and report["features"]["Age"]["psi"] is None
+
+
+def test_exported_baseline_is_current():
+    # Rerun `python -m app.drift` after retraining
+    assert load_baseline(BASELINE_PATH) == json.loads(json.dumps(BASELINE))
+
+
+def test_predictions_feed_the_drift_endpoint(monkeypatch, patient_records):
+    monitor = DriftMonitor(BASELINE)
+    monkeypatch.setattr(drift, "get_drift_monitor", lambda: monitor)
+    monkeypatch.setattr(main, "get_drift_monitor", lambda: monitor)
+
+    async def explain(patient, ml_prediction):
+        return "explanation"
+
+    monkeypatch.setattr(main, "agenerate_ml_aware_response", explain)
+    monkeypatch.setattr(main, "cache_enabled", lambda: False)
+    record = dict(patient_records[0], COVID_Strain="Pi")
+    client.post("/predict", json=[record])
+
+    report = client.get("/health/drift").json()
+    assert report["enabled"] is True and report["observations"] == 1
+    assert report["unseen_category_rate"]["COVID_Strain"] == 1.0
+    assert report["features"]["COVID_Strain"]["unseen_labels"] == {"Pi": 1}
+
+    assert client.post("/health/drift/reset").json()["observations"] == 0
+    assert client.get("/health/drift").json()["observations"] == 0
+
+
+def test_cached_predictions_still_count_toward_drift(monkeypatch, patient_records):
+    monitor = DriftMonitor(BASELINE)
+    monkeypatch.setattr(drift, "get_drift_monitor", lambda: monitor)
+    cache = PredictionCache(max_entries=16)
+    monkeypatch.setattr(main, "get_prediction_cache", lambda: cache)
+    monkeypatch.setattr(main, "cache_enabled", lambda: True)
+
+    async def explain(patient, ml_prediction):
+        return "explanation"
+
+    monkeypatch.setattr(main, "agenerate_ml_aware_response", explain)
+    for _ in range(3):
+        response = client.post("/predict", json=[patient_records[0]]).json()
+    assert response["cached"] is True
+    assert monitor.report()["observations"] == 3
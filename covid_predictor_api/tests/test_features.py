@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.features import FEATURE_NAMES, compile_batch, compile_row, fit_encodings
+from app.preprocessing import DATE_COLUMNS, ENCODINGS, MODEL_DIR, build_feature_frame, scaler
+from app.schemas import PatientFeatures
+
+DATA_DIR = MODEL_DIR.parent.parent / "data"
+
+
+def read_dataset(name: str) -> pd.DataFrame:
+    df = pd.read_csv(DATA_DIR / name)
+    for column in DATE_COLUMNS:
+        df[column] = pd.to_datetime(df[column])
+    return df
+
+
+@pytest.mark.parametrize("dataset", ["Cleaned_Data.csv", "Covid-19 Dataset.csv"])
+def test_row_and_batch_transforms_agree_on_every_row(dataset):
+    # The raw dataset also has missing dates and categories
+    df = read_dataset(dataset)
+    batch = compile_batch(FEATURE_NAMES, ENCODINGS)(df)
+    row = compile_row(FEATURE_NAMES, ENCODINGS)
+    rows = np.array([row(record) for record in df.to_dict(orient="records")])
+    assert np.array_equal(rows, batch)
+
+
+def test_serving_matches_training_features():
+    """The API's features for a patient equal the training row the model learned from"""
+    cleaned = read_dataset("Cleaned_Data.csv")
+    engineered = pd.read_csv(DATA_DIR / "Reinfection Engineered Dataset.csv")
+    expected = engineered[scaler.feature_names_in_].to_numpy(dtype=np.float64)
+
+    # API clients send "None" where the dataset has no value
+    records = cleaned.drop(columns=["Reinfection"]).astype(object).where(cleaned.notna(), "None")
+    patients = [PatientFeatures(**record) for record in records.to_dict(orient="records")]
+
+    assert np.array_equal(build_feature_frame(patients).to_numpy(), expected)
+    assert np.array_equal(build_feature_frame(patients[:1]).to_numpy(), expected[:1])
+
+
+def test_encodings_fit_on_training_data_match_the_shipped_encoders():
+    encodings = fit_encodings(read_dataset("Cleaned_Data.csv"))
+    assert encodings.keys() == ENCODINGS.keys()
+    for name, classes in encodings.items():
+        assert classes.tolist() == ENCODINGS[name].tolist()
+
+
+def test_undefined_features_are_rejected():
+    with pytest.raises(KeyError, match="Not_A_Feature"):
+        compile_batch(["Age", "Not_A_Feature"], ENCODINGS)
@@ -0,0 +1,166 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from app.prediction_cache import PredictionCache, prediction_key
+from app.schemas import PatientFeatures
+from RagModule.scripts.llm_providers import LLMUnavailableError
+
+client = TestClient(main.app)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction_and_ttl():
+    clock = FakeClock()
+    cache = PredictionCache(max_entries=2, ttl_seconds=10, clock=clock)
+    cache.put("a", "v1", {"prediction": "No"})
+    cache.put("b", "v1", {"prediction": "Yes"})
+    assert cache.get("a", "v1") == {"prediction": "No"}  # "b" is now least recently used
+    cache.put("c", "v1", {"prediction": "No"})
+    assert cache.get("b", "v1") is None
+    assert cache.evictions == 1
+
+    clock.now = 11
+    assert cache.get("a", "v1") is None
+    assert cache.expirations == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_model_version_change_invalidates():
+    cache = PredictionCache()
+    cache.put("a", "v1", {"prediction": "No"})
+    assert cache.get("a", "v2") is None
+    assert len(cache) == 0 and cache.invalidations == 1
+    assert cache.get("a", "v1") is None
+
+
+def test_key_is_canonical(patient_records):
+    patient = PatientFeatures(**patient_records[0])
+    shifted = patient.model_copy(update={
+        # Same instant in another zone
+        "Date_of_Infection": patient.Date_of_Infection.astimezone(timezone(timedelta(hours=2))),
+    })
+    assert prediction_key(shifted, "v1") == prediction_key(patient, "v1")
+    assert prediction_key(patient, "v2") != prediction_key(patient, "v1")
+
+    changed = patient.model_copy(update={"Age": patient.Age + 1})
+    assert prediction_key(changed, "v1") != prediction_key(patient, "v1")
+
+    naive = patient.model_copy(update={"Date_of_Infection": patient.Date_of_Infection.replace(tzinfo=None)})
+    assert prediction_key(naive, "v1") == prediction_key(patient, "v1")
+
+
+@pytest.fixture
+def fresh_cache(monkeypatch):
+    cache = PredictionCache(max_entries=16)
+    monkeypatch.setattr(main, "get_prediction_cache", lambda: cache)
+    monkeypatch.setattr(main, "cache_enabled", lambda: True)
+    return cache
+
+
+def test_predict_endpoint_hits_cache(monkeypatch, fresh_cache, patient_records):
+    calls = []
+
+    async def explain(patient, ml_prediction):
+        calls.append(ml_prediction)
+        return f"explanation for {ml_prediction}"
+
+    monkeypatch.setattr(main, "agenerate_ml_aware_response", explain)
+    first = client.post("/predict", json=[patient_records[0]]).json()
+    second = client.post("/predict", json=[patient_records[0]]).json()
+
+    assert len(calls) == 1
+    assert "cached" not in first and second["cached"] is True
+    assert second["reinfection_prediction"] == first["reinfection_prediction"]
+    assert second["description"] == first["description"]
+    assert client.get("/health/prediction-cache").json()["hits"] == 1
+
+    monkeypatch.setattr(main, "model_version", lambda: "retrained")
+    assert "cached" not in client.post("/predict", json=[patient_records[0]]).json()
+    assert len(calls) == 2
+
+
+def test_cache_hit_skips_feature_engineering_but_counts_toward_drift(monkeypatch, fresh_cache, patient_records):
+    observed = []
+    monkeypatch.setattr(main, "observe_patients", lambda frame, patients: observed.append(frame.copy()))
+
+    async def explain(patient, ml_prediction):
+        return "explanation"
+
+    monkeypatch.setattr(main, "agenerate_ml_aware_response", explain)
+    client.post("/predict", json=[patient_records[2]])
+
+    def engineer(patients):
+        raise AssertionError("a cache hit should reuse the engineered row")
+
+    monkeypatch.setattr(main, "build_feature_frame", engineer)
+    assert client.post("/predict", json=[patient_records[2]]).json()["cached"] is True
+    assert len(observed) == 2 and observed[1].equals(observed[0])
+
+
+def test_degraded_response_caches_label_only(monkeypatch, fresh_cache, patient_records):
+    async def unavailable(patient, ml_prediction):
+        raise LLMUnavailableError("down")
+
+    monkeypatch.setattr(main, "agenerate_ml_aware_response", unavailable)
+    assert client.post("/predict", json=[patient_records[1]]).json()["degraded"] is True
+
+    def no_model(frame):
+        raise AssertionError("label should come from the cache")
+
+    async def explain(patient, ml_prediction):
+        return "recovered"
+
+    monkeypatch.setattr(main, "predict_frame", no_model)
+    monkeypatch.setattr(main, "agenerate_ml_aware_response", explain)
+    response = client.post("/predict", json=[patient_records[1]]).json()
+    assert response["description"] == "recovered" and "degraded" not in response
+
+
+def test_reloading_unchanged_model_keeps_version():
+    from app import model_interface
+
+    version = model_interface.model_version()
+    assert model_interface.reload_model() == version
+
+
+def test_reload_swaps_model_scaler_and_encoders_together(patient_records):
+    from app import model_interface, preprocessing
+    from app.schemas import PatientFeatures
+
+    patients = [PatientFeatures(**record) for record in patient_records[:20]]
+    before = model_interface.predict_labels(patients)
+    old_scaler, old_model = preprocessing.scaler, model_interface.model
+    model_interface.reload_model()
+    assert preprocessing.scaler is not old_scaler and model_interface.model is not old_model
+    assert model_interface.predict_labels(patients) == before
+
+
+def test_watcher_reloads_once_the_files_stop_changing(monkeypatch):
+    from app import model_interface
+
+    observed = iter([(1, 1, 1), (2, 1, 1), (2, 2, 2), (2, 2, 2), (2, 2, 2)])
+    reloads = []
+    monkeypatch.setattr(model_interface, "_loaded_mtimes", (1, 1, 1))
+    monkeypatch.setattr(model_interface, "artifact_mtimes", lambda: next(observed))
+
+    def reload_model():
+        reloads.append(1)
+        model_interface._loaded_mtimes = (2, 2, 2)
+        return "retrained"
+
+    monkeypatch.setattr(model_interface, "reload_model", reload_model)
+    seen = None
+    for _ in range(5):
+        seen = model_interface.check_for_new_model(seen)
+    # Not while the files are still changing, and only once they have settled
+    assert len(reloads) == 1
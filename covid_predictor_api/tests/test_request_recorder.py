@@ -0,0 +1,25 @@
+import json
+
+from fastapi.testclient import TestClient
+
+import main
+from app.request_recorder import RequestRecorder
+
+
+def test_records_replayable_requests(monkeypatch, tmp_path, patient_records):
+    async def explain(patient, ml_prediction):
+        return "explanation"
+
+    monkeypatch.setattr(main, "agenerate_ml_aware_response", explain)
+    monkeypatch.setattr(main, "cache_enabled", lambda: False)
+    path = tmp_path / "traffic.jsonl"
+    client = TestClient(RequestRecorder(main.app, str(path)))
+
+    assert client.post("/predict", json=[patient_records[0]]).status_code == 200
+    assert client.post("/predict", json=[]).status_code == 400
+    client.get("/health/memory")  # not a recorded path
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(line["path"], line["status"]) for line in lines] == [("/predict", 200), ("/predict", 400)]
+    assert lines[0]["body"] == [patient_records[0]]
+    assert lines[0]["ts"] <= lines[1]["ts"] and lines[0]["latency_ms"] > 0
@@ -0,0 +1,67 @@
+import time
+import threading
+
+from fastapi.testclient import TestClient
+
+import main
+from app import startup
+from app.startup import StartupState
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def test_readiness_tracks_required_components_and_times():
+    clock = FakeClock()
+    state = StartupState(["model"], clock=clock)
+    with state.loading("model"):
+        clock.advance(2)
+    assert state.ready() and state.component("model").load_seconds == 2
+
+    state.mark_warming("model")
+    assert not state.ready()
+    state.warm("model", lambda: clock.advance(0.5))
+
+    def missing_index():
+        raise FileNotFoundError("no index")
+
+    state.warm("index", missing_index)
+    report = state.report()
+    assert report["ready"] and report["ready_after_seconds"] == 2.5
+    assert report["components"]["model"] == {"status": "ready", "load_seconds": 2, "warm_seconds": 0.5, "error": None}
+    assert report["components"]["index"]["status"] == "failed"
+    assert "no index" in report["components"]["index"]["error"]
+
+
+def test_ready_probe_waits_for_the_warmup(monkeypatch):
+    state = StartupState(["model", "features"])
+    monkeypatch.setattr(startup, "state", state)
+    monkeypatch.setattr(main, "startup_state", state)
+    monkeypatch.setenv("STARTUP_WARMUP", "model,features")
+    release = threading.Event()
+    warm_model = startup.WARMUPS["model"]
+    monkeypatch.setitem(startup.WARMUPS, "model", lambda: release.wait(10) and warm_model())
+
+    with TestClient(main.app) as client:
+        assert client.get("/health/live").json() == {"status": "alive"}
+        response = client.get("/health/ready")
+        assert response.status_code == 503 and response.json()["components"]["model"]["status"] == "warming"
+        assert client.get("/health").json()["status"] == "starting"
+
+        release.set()
+        deadline = time.monotonic() + 10
+        while (response := client.get("/health/ready")).status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert response.status_code == 200
+        components = response.json()["components"]
+        assert components["features"]["warm_seconds"] is not None and components["model"]["warm_seconds"] is not None
+        assert components["embedder"]["status"] == "pending"
+        assert client.get("/health").json()["status"] == "healthy"
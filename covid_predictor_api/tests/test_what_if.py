@@ -0,0 +1,89 @@
+import itertools
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.model_interface import model, predict_labels
+from app.preprocessing import preprocess_input_data
+from app.schemas import PatientFeatures, WhatIfRequest
+from app.what_if import WhatIfError, sweep
+from main import app
+
+client = TestClient(app)
+
+VARIATIONS = {
+    "Doses_Received": [0, 1, 2, 3],
+    "Vaccine_Type": ["Pfizer", "Moderna", "None"],
+    "Date_of_Last_Dose": ["2022-01-01T00:00:00Z", "2022-09-01T00:00:00Z", "2023-03-01T00:00:00Z"],
+}
+
+
+def request(patient: dict, variations: dict) -> WhatIfRequest:
+    return WhatIfRequest(patient=patient, variations=variations)
+
+
+def test_every_grid_cell_matches_a_single_prediction(patient_records):
+    patient = PatientFeatures(**patient_records[0])
+    surface = sweep(patient, VARIATIONS)
+    assert surface["rows"] == 36
+    assert [axis["field"] for axis in surface["axes"]] == list(VARIATIONS)
+
+    for i, j, k in itertools.product(range(4), range(3), range(3)):
+        changed = patient.model_copy(update={
+            "Doses_Received": VARIATIONS["Doses_Received"][i],
+            "Vaccine_Type": VARIATIONS["Vaccine_Type"][j],
+            "Date_of_Last_Dose": surface["axes"][2]["values"][k],
+        })
+        assert surface["prediction"][i][j][k] == predict_labels([changed])[0]
+        expected = model.predict_proba(preprocess_input_data([changed]))[0, 1]
+        assert surface["risk"][i][j][k] == pytest.approx(expected, abs=5e-5)
+
+    assert surface["baseline"]["prediction"] == predict_labels([patient])[0]
+
+
+def test_ranges_expand_to_evenly_spaced_values(patient_records):
+    parsed = request(patient_records[0], {
+        "Age": {"start": 20, "stop": 80, "num": 4},
+        "Date_of_Last_Dose": {"start": "2022-01-01T00:00:00Z", "stop": "2022-01-31T00:00:00Z", "num": 4},
+    })
+    surface = sweep(parsed.patient, parsed.variations)
+    assert surface["axes"][0]["values"] == [20, 40, 60, 80]
+    assert [d.day for d in surface["axes"][1]["values"]] == [1, 11, 21, 31]
+    assert np.array(surface["risk"]).shape == (4, 4)
+
+
+def test_ranges_mixing_time_zones_are_compared_in_utc(patient_records):
+    for start in ("2022-01-01T00:00:00", "2022-01-01T02:00:00+02:00"):
+        parsed = request(patient_records[0], {
+            "Date_of_Last_Dose": {"start": start, "stop": "2022-01-31T00:00:00Z", "num": 4},
+        })
+        values = sweep(parsed.patient, parsed.variations)["axes"][0]["values"]
+        assert [(d.day, d.hour, d.utcoffset().total_seconds()) for d in values] == [(1, 0, 0), (11, 0, 0), (21, 0, 0), (31, 0, 0)]
+
+    response = client.post("/predict/what-if", json={"patient": patient_records[0], "variations": {
+        "Date_of_Last_Dose": {"start": "2022-01-01T00:00:00", "stop": "2022-01-31T00:00:00+01:00", "num": 3},
+    }})
+    assert response.status_code == 200
+
+
+def test_invalid_variations_list_every_problem(patient_records):
+    parsed = request(patient_records[0], {"Not_A_Field": [1], "Doses_Received": ["two"], "Gender": {"start": 0, "stop": 1}})
+    with pytest.raises(WhatIfError) as e:
+        sweep(parsed.patient, parsed.variations)
+    assert len(e.value.errors) == 3
+
+    with pytest.raises(WhatIfError, match="at most 10 are allowed"):
+        sweep(parsed.patient, {"Age": list(range(11))}, max_rows=10)
+
+
+def test_what_if_endpoint(patient_records):
+    response = client.post("/predict/what-if", json={"patient": patient_records[0], "variations": VARIATIONS})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["rows"] == 36 and body["services"] == ["prediction"]
+    assert np.array(body["risk"]).shape == (4, 3, 3)
+
+    response = client.post("/predict/what-if", json={"patient": patient_records[0], "variations": {"Unknown": [1]}})
+    assert response.status_code == 422
+    assert response.json()["detail"] == ["Unknown: not a PatientFeatures field"]
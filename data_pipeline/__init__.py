@@ -0,0 +1,4 @@
+"""Cached, scriptable version of the data preparation notebooks (cleaning, feature engineering, splitting)"""
+from data_pipeline.pipeline import Stage, default_stages, load_output, run_pipeline
+
+__all__ = ["Stage", "default_stages", "load_output", "run_pipeline"]
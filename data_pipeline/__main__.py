@@ -0,0 +1,65 @@
+"""Run the data preparation pipeline and report wall time and disk usage per stage.
+
+    python -m data_pipeline                       # re-runs only stages whose inputs, code or params changed
+    python -m data_pipeline --force clean         # re-run one stage (later stages follow if its output changed)
+    python -m data_pipeline --smote-ratio 0       # no oversampling (imbalanced-learn not needed)
+    python -m data_pipeline --export-csv          # also write the CSV files the notebooks produced
+"""
+import json
+import argparse
+from pathlib import Path
+
+from data_pipeline.pipeline import REPO_ROOT, RAW_DATASET, WORK_DIR, default_stages, load_output, run_pipeline
+
+# Where the notebooks wrote each output
+CSV_EXPORTS = {
+    "clean/cleaned": REPO_ROOT / "data" / "Cleaned_Data.csv",
+    "features/engineered": REPO_ROOT / "data" / "Reinfection Engineered Dataset.csv",
+    "split/X_train": REPO_ROOT / "data" / "splitted_data" / "X_train.csv",
+    "split/y_train": REPO_ROOT / "data" / "splitted_data" / "y_train.csv",
+    "split/X_test": REPO_ROOT / "data" / "splitted_data" / "X_test.csv",
+    "split/y_test": REPO_ROOT / "data" / "splitted_data" / "y_test.csv",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--raw", default=str(RAW_DATASET), help="raw dataset CSV")
+    parser.add_argument("--work-dir", default=str(WORK_DIR), help="where stage outputs and manifests are kept")
+    parser.add_argument("--force", action="append", default=[], metavar="STAGE", help="re-run this stage even if cached")
+    parser.add_argument("--until", metavar="STAGE", help="stop after this stage")
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--random-state", type=int, default=42)
+    parser.add_argument("--smote-ratio", type=float, default=0.5, help="minority:majority ratio after SMOTE, 0 = off")
+    parser.add_argument("--export-csv", action="store_true", help="write the notebook CSV files from the stage outputs")
+    parser.add_argument("--json", help="write the per-stage report to this file")
+    args = parser.parse_args()
+
+    pipeline = default_stages(Path(args.raw), args.test_size, args.random_state, args.smote_ratio)
+    unknown = set(args.force + ([args.until] if args.until else [])) - {stage.name for stage in pipeline}
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    report = run_pipeline(pipeline, Path(args.work_dir), force=tuple(args.force), until=args.until)
+
+    print(f"{'stage':<10}{'status':<8}{'wall s':>9}{'last run s':>12}{'rows':>8}{'disk kB':>10}")
+    for row in report:
+        print(f"{row['stage']:<10}{row['status']:<8}{row['seconds']:>9.3f}{row['last_run_seconds']:>12.3f}"
+              f"{row['rows'] if row['rows'] is not None else '':>8}{row['bytes'] / 1024:>10.1f}")
+    print(f"{'total':<18}{sum(row['seconds'] for row in report):>9.3f}{'':>20}"
+          f"{sum(row['bytes'] for row in report) / 1024:>10.1f}")
+
+    if args.export_csv:
+        ran = {row["stage"] for row in report}
+        for reference, path in CSV_EXPORTS.items():
+            if reference.split("/")[0] in ran:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                load_output(reference, Path(args.work_dir)).to_csv(path, index=False)
+                print(f"Wrote {path.relative_to(REPO_ROOT)}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""Out-of-core training: fit the scaler and the models from batches of a Parquet/CSV table.
+
+notebooks/Model_Evaluation.py reads the whole training split into pandas. That does not scale
+to registry-sized data. Here memory is bounded by the batch size and the sample size instead:
+
+1. One pass fits StandardScaler with partial_fit, finds the classes and their counts, and keeps
+   a fixed-size reservoir sample of rows.
+2. Each epoch is one more pass. SGDClassifier (logistic loss) and GaussianNB learn from every
+   batch with partial_fit. Sample weights stand in for class_weight="balanced", which
+   partial_fit does not accept.
+3. HistGradientBoostingClassifier bins its features anyway, so it is fit on the reservoir
+   sample, whose size does not grow with the data.
+4. Evaluation is a final pass that accumulates confusion matrices and score histograms (for ROC
+   AUC), so it also uses constant memory.
+
+The table has the feature columns plus the target (e.g. data/pipeline/features/engineered.parquet).
+Test rows come from --test, or are picked from the stream by a hash of their row number.
+
+    python -m data_pipeline.chunked_training data/pipeline/features/engineered.parquet --batch-rows 50000
+"""
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.linear_model import SGDClassifier
+from sklearn.naive_bayes import GaussianNB
+from sklearn.preprocessing import StandardScaler
+
+from data_pipeline.pipeline import REPO_ROOT
+from data_pipeline.stages import TARGET
+
+OUTPUT_DIR = REPO_ROOT / "models" / "chunked"
+AUC_BINS = 2048
+MODEL_FILES = {
+    "SGD (log loss)": "sgd.pkl",
+    "Naive Bayes": "naive_bayes.pkl",
+    "Hist Gradient Boosting": "hist_gbdt.pkl",
+}
+
+
+def iter_batches(path, batch_rows: int, columns: Optional[list] = None):
+    """DataFrames of at most `batch_rows` rows from a Parquet or CSV file"""
+    path = Path(path)
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_rows, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=batch_rows, usecols=columns)
+
+
+def table_columns(path) -> list:
+    path = Path(path)
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(path).schema_arrow.names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def _in_test(row_ids: np.ndarray, test_fraction: float) -> np.ndarray:
+    """Deterministic pseudo-random test membership from the global row number"""
+    mixed = (row_ids.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(40)
+    return mixed < np.uint64(test_fraction * (1 << 24))
+
+
+class TrainingData:
+    """Streams (X, y) batches of the train or test part of one or two tables"""
+
+    def __init__(self, path, features: list, batch_rows: int, test_path=None, test_fraction: float = 0.2):
+        self.path = Path(path)
+        self.test_path = Path(test_path) if test_path else None
+        self.features = features
+        self.batch_rows = batch_rows
+        self.test_fraction = test_fraction
+
+    def batches(self, part: str):
+        if part == "test" and self.test_path is not None:
+            for df in iter_batches(self.test_path, self.batch_rows, self.features + [TARGET]):
+                yield df[self.features].to_numpy(dtype=np.float64), df[TARGET].to_numpy()
+            return
+        offset = 0
+        for df in iter_batches(self.path, self.batch_rows, self.features + [TARGET]):
+            X, y = df[self.features].to_numpy(dtype=np.float64), df[TARGET].to_numpy()
+            if self.test_path is None and self.test_fraction:
+                test = _in_test(np.arange(offset, offset + len(df)), self.test_fraction)
+                keep = test if part == "test" else ~test
+                X, y = X[keep], y[keep]
+            offset += len(df)
+            if len(y):
+                yield X, y
+
+
+class Reservoir:
+    """Uniform sample of at most `size` rows from a stream (algorithm R, one batch at a time)"""
+
+    def __init__(self, size: int, n_features: int, seed: int = 0):
+        self.X = np.empty((size, n_features))
+        self.y = None
+        self.size = size
+        self.seen = 0
+        self.rng = np.random.default_rng(seed)
+
+    def add(self, X: np.ndarray, y: np.ndarray):
+        if self.y is None:
+            self.y = np.empty(self.size, dtype=y.dtype)
+        fill = min(max(self.size - self.seen, 0), len(X))
+        self.X[self.seen:self.seen + fill], self.y[self.seen:self.seen + fill] = X[:fill], y[:fill]
+        if fill < len(X):
+            positions = np.arange(self.seen + fill, self.seen + len(X))
+            slots = self.rng.integers(0, positions + 1)
+            chosen = slots < self.size
+            self.X[slots[chosen]], self.y[slots[chosen]] = X[fill:][chosen], y[fill:][chosen]
+        self.seen += len(X)
+
+    def sample(self):
+        n = min(self.seen, self.size)
+        return self.X[:n], self.y[:n]
+
+
+class StreamingMetrics:
+    """Confusion matrix plus positive-score histograms, updated one batch at a time"""
+
+    def __init__(self, classes: np.ndarray):
+        self.classes = classes
+        self.confusion = np.zeros((len(classes), len(classes)), dtype=np.int64)
+        self.score_hist = np.zeros((2, AUC_BINS), dtype=np.int64)
+
+    def update(self, y_true: np.ndarray, y_pred: np.ndarray, positive_scores: Optional[np.ndarray]):
+        t, p = np.searchsorted(self.classes, y_true), np.searchsorted(self.classes, y_pred)
+        np.add.at(self.confusion, (t, p), 1)
+        if positive_scores is not None and len(self.classes) == 2:
+            bins = np.minimum((positive_scores * AUC_BINS).astype(np.int64), AUC_BINS - 1)
+            for label in (0, 1):
+                self.score_hist[label] += np.bincount(bins[t == label], minlength=AUC_BINS)
+
+    def roc_auc(self) -> float:
+        """Mann-Whitney AUC over the binned scores (ties within a bin count half)"""
+        negatives, positives = self.score_hist
+        if not negatives.sum() or not positives.sum():
+            return float("nan")
+        below = np.cumsum(negatives) - negatives
+        wins = (positives * below).sum() + 0.5 * (positives * negatives).sum()
+        return float(wins / (positives.sum() * negatives.sum()))
+
+    def report(self) -> dict:
+        """Accuracy and support-weighted precision/recall/F1, as evaluate_classifiers reports them"""
+        c = self.confusion
+        support, predicted, correct = c.sum(axis=1), c.sum(axis=0), np.diag(c)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            precision = np.where(predicted > 0, correct / predicted, 0.0)
+            recall = np.where(support > 0, correct / support, 0.0)
+            f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+        weights = support / support.sum()
+        return {
+            "Accuracy": float(correct.sum() / c.sum()),
+            "Precision": float((precision * weights).sum()),
+            "Recall": float((recall * weights).sum()),
+            "F1 Score": float((f1 * weights).sum()),
+            "ROC AUC": self.roc_auc(),
+            "rows": int(c.sum()),
+            "confusion_matrix": c.tolist(),
+        }
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process (None on Windows)"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    # ru_maxrss is kB on Linux but bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def train_chunked(data: TrainingData, epochs: int = 5, sample_rows: int = 200_000, random_state: int = 42) -> dict:
+    """Fit the scaler and the three incremental models; returns models, metrics and timings"""
+    timings = {}
+
+    start = time.perf_counter()
+    scaler = StandardScaler()
+    counts = {}
+    reservoir = Reservoir(sample_rows, len(data.features), seed=random_state)
+    for X, y in data.batches("train"):
+        scaler.partial_fit(X)
+        labels, n = np.unique(y, return_counts=True)
+        for label, count in zip(labels.tolist(), n.tolist()):
+            counts[label] = counts.get(label, 0) + count
+        reservoir.add(X, y)
+    classes = np.array(sorted(counts))
+    total = sum(counts.values())
+    # class_weight="balanced": n_samples / (n_classes * count)
+    class_weights = np.array([total / (len(classes) * counts[label]) for label in classes])
+    timings["scaler_pass_s"] = time.perf_counter() - start
+
+    models = {
+        "SGD (log loss)": SGDClassifier(loss="log_loss", alpha=1e-4, random_state=random_state),
+        "Naive Bayes": GaussianNB(),
+    }
+    start = time.perf_counter()
+    rng = np.random.default_rng(random_state)
+    for _ in range(epochs):
+        for X, y in data.batches("train"):
+            order = rng.permutation(len(y))
+            X, y = scaler.transform(X[order]), y[order]
+            weights = class_weights[np.searchsorted(classes, y)]
+            models["SGD (log loss)"].partial_fit(X, y, classes=classes, sample_weight=weights)
+            models["Naive Bayes"].partial_fit(X, y, classes=classes, sample_weight=weights)
+    timings["incremental_epochs_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    X_sample, y_sample = reservoir.sample()
+    models["Hist Gradient Boosting"] = HistGradientBoostingClassifier(
+        class_weight="balanced", random_state=random_state
+    ).fit(scaler.transform(X_sample), y_sample)
+    timings["hist_gbdt_fit_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    metrics = {name: StreamingMetrics(classes) for name in models}
+    for X, y in data.batches("test"):
+        X = scaler.transform(X)
+        for name, model in models.items():
+            proba = model.predict_proba(X)
+            predicted = model.classes_[proba.argmax(axis=1)]
+            metrics[name].update(y, predicted, proba[:, 1] if len(classes) == 2 else None)
+    timings["evaluation_pass_s"] = time.perf_counter() - start
+
+    peak = peak_rss_mb()
+    return {
+        "scaler": scaler,
+        "models": models,
+        "metrics": {name: m.report() for name, m in metrics.items()},
+        "train_rows": total,
+        "sample_rows": len(y_sample),
+        "timings": {k: round(v, 3) for k, v in timings.items()},
+        "peak_rss_mb": None if peak is None else round(peak, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("table", help="Parquet or CSV with the feature columns and the target")
+    parser.add_argument("--test", help="separate test table (default: hash-split --test-fraction of the rows)")
+    parser.add_argument("--test-fraction", type=float, default=0.2)
+    parser.add_argument("--features", help="comma-separated feature columns (default: every column but the target)")
+    parser.add_argument("--batch-rows", type=int, default=50_000)
+    parser.add_argument("--epochs", type=int, default=5, help="streaming passes for the partial_fit models")
+    parser.add_argument("--sample-rows", type=int, default=200_000, help="reservoir size for the histogram GBDT")
+    parser.add_argument("--random-state", type=int, default=42)
+    parser.add_argument("--output-dir", default=str(OUTPUT_DIR), help="where scaler.pkl and the models are saved")
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--json", help="write metrics, timings and peak memory to this file")
+    args = parser.parse_args()
+
+    features = args.features.split(",") if args.features else [c for c in table_columns(args.table) if c != TARGET]
+    data = TrainingData(args.table, features, args.batch_rows, args.test, args.test_fraction)
+    result = train_chunked(data, args.epochs, args.sample_rows, args.random_state)
+
+    print(f"Trained on {result['train_rows']} rows ({result['sample_rows']} sampled for the histogram GBDT), "
+          f"peak RSS {result['peak_rss_mb']} MB")
+    print(pd.DataFrame({name: {k: v for k, v in m.items() if k != "confusion_matrix"}
+                        for name, m in result["metrics"].items()}).T.sort_values("Accuracy", ascending=False))
+    print(result["timings"])
+
+    if not args.no_save:
+        output = Path(args.output_dir)
+        output.mkdir(parents=True, exist_ok=True)
+        joblib.dump(result["scaler"], output / "scaler.pkl")
+        for name, model in result["models"].items():
+            joblib.dump(model, output / MODEL_FILES[name])
+        print(f"Saved the scaler and models to {output}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({k: v for k, v in result.items() if k not in ("scaler", "models")} | {"features": features},
+                      f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Stage runner with content-addressed caching.
+
+Every stage writes its outputs to `<work_dir>/<stage>/` (DataFrames as Parquet, anything else
+pickled) with a manifest.json. The stage's cache key is a sha256 over:
+- its code: the stage function plus the same-module helpers it calls, and the full source of
+  any modules it declares (the features stage declares app/features.py, whose definitions it
+  compiles)
+- its parameters
+- the content hashes of its inputs
+
+A stage re-runs only when that key changes or an output file is missing. Upstream output hashes
+come from the upstream manifests, so a stage that re-runs but produces identical data does not
+invalidate the stages after it.
+"""
+import json
+import time
+import pickle
+import hashlib
+import inspect
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from data_pipeline import stages
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+RAW_DATASET = REPO_ROOT / "data" / "Covid-19 Dataset.csv"
+WORK_DIR = REPO_ROOT / "data" / "pipeline"
+MANIFEST = "manifest.json"
+
+
+class Stage:
+    """One step of the pipeline.
+
+    `inputs` maps the function's argument names either to a file (Path) or to an upstream
+    output written as "stage/output". `modules` are other modules the stage's results depend
+    on; code_fingerprint only follows helpers in the stage's own module.
+    """
+
+    def __init__(self, name: str, func, inputs: dict, outputs: list, params: Optional[dict] = None,
+                 modules: tuple = ()):
+        self.name = name
+        self.func = func
+        self.inputs = inputs
+        self.outputs = outputs
+        self.params = params or {}
+        self.modules = tuple(modules)
+
+
+def default_stages(raw: Path = RAW_DATASET, test_size: float = 0.2, random_state: int = 42,
+                   smote_ratio: float = 0.5) -> list:
+    return [
+        Stage("ingest", stages.ingest, {"raw": Path(raw)}, ["raw"]),
+        Stage("clean", stages.clean, {"raw": "ingest/raw"}, ["cleaned"]),
+        Stage("features", stages.engineer, {"cleaned": "clean/cleaned"}, ["engineered", "encoders"],
+              modules=(stages.feature_definitions,)),
+        Stage("split", stages.split, {"engineered": "features/engineered"}, ["X_train", "y_train", "X_test", "y_test"],
+              {"test_size": test_size, "random_state": random_state, "smote_ratio": smote_ratio}),
+    ]
+
+
+def file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def code_fingerprint(func, seen=None) -> str:
+    """Source of `func` and of the functions from its own module that it references"""
+    seen = set() if seen is None else seen
+    seen.add(func)
+    parts = [inspect.getsource(func)]
+    for name in func.__code__.co_names + tuple(
+        name for const in func.__code__.co_consts if inspect.iscode(const) for name in const.co_names
+    ):
+        obj = func.__globals__.get(name)
+        if inspect.isfunction(obj) and obj.__module__ == func.__module__ and obj not in seen:
+            parts.append(code_fingerprint(obj, seen))
+    return "\n".join(parts)
+
+
+def module_fingerprint(module) -> str:
+    """sha256 of a module's source file"""
+    return file_hash(Path(module.__file__))
+
+
+def _output_path(stage_dir: Path, name: str, value) -> Path:
+    return stage_dir / (f"{name}.parquet" if isinstance(value, pd.DataFrame) else f"{name}.pkl")
+
+
+def _write(path: Path, value):
+    if path.suffix == ".parquet":
+        value.to_parquet(path, index=False)
+    else:
+        with open(path, "wb") as f:
+            pickle.dump(value, f)
+
+
+def _read(path: Path):
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path)
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def read_manifest(stage_dir: Path) -> Optional[dict]:
+    try:
+        with open(stage_dir / MANIFEST) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def output_file(work_dir: Path, reference: str) -> Path:
+    """Path of an upstream output given as "stage/output" """
+    stage_name, output = reference.split("/")
+    manifest = read_manifest(Path(work_dir) / stage_name)
+    if manifest is None or output not in manifest["outputs"]:
+        raise FileNotFoundError(f"{reference} has not been produced yet; run the pipeline first")
+    return Path(work_dir) / stage_name / manifest["outputs"][output]["file"]
+
+
+def load_output(reference: str, work_dir: Path = WORK_DIR):
+    """Read a stage output, e.g. load_output("split/X_train")"""
+    return _read(output_file(work_dir, reference))
+
+
+def run_pipeline(pipeline: list, work_dir: Path = WORK_DIR, force: tuple = (), until: Optional[str] = None) -> list:
+    """Run the stages in order, skipping those whose cache key is unchanged; returns one report row per stage"""
+    work_dir = Path(work_dir)
+    report = []
+    for stage in pipeline:
+        stage_dir = work_dir / stage.name
+        input_hashes = {}
+        for argument, source in stage.inputs.items():
+            if isinstance(source, Path):
+                input_hashes[argument] = file_hash(source)
+            else:
+                upstream, output = source.split("/")
+                input_hashes[argument] = read_manifest(work_dir / upstream)["outputs"][output]["sha256"]
+        key = hashlib.sha256(json.dumps({
+            "code": code_fingerprint(stage.func),
+            "modules": {module.__name__: module_fingerprint(module) for module in stage.modules},
+            "params": stage.params,
+            "inputs": input_hashes,
+        }, sort_keys=True).encode()).hexdigest()
+
+        manifest = read_manifest(stage_dir)
+        cached = (
+            stage.name not in force
+            and manifest is not None
+            and manifest["key"] == key
+            and all((stage_dir / out["file"]).exists() for out in manifest["outputs"].values())
+        )
+        if cached:
+            report.append({"stage": stage.name, "status": "cached", "seconds": 0.0,
+                           "last_run_seconds": manifest["seconds"], **_sizes(manifest)})
+        else:
+            start = time.perf_counter()
+            arguments = {
+                argument: source if isinstance(source, Path) else load_output(source, work_dir)
+                for argument, source in stage.inputs.items()
+            }
+            results = stage.func(**arguments, **stage.params)
+            missing = set(stage.outputs) - set(results)
+            if missing:
+                raise ValueError(f"Stage {stage.name} did not return {', '.join(sorted(missing))}")
+
+            stage_dir.mkdir(parents=True, exist_ok=True)
+            outputs = {}
+            for name in stage.outputs:
+                path = _output_path(stage_dir, name, results[name])
+                _write(path, results[name])
+                outputs[name] = {
+                    "file": path.name,
+                    "sha256": file_hash(path),
+                    "bytes": path.stat().st_size,
+                    "rows": len(results[name]) if isinstance(results[name], pd.DataFrame) else None,
+                }
+            seconds = time.perf_counter() - start
+            manifest = {"stage": stage.name, "key": key, "params": stage.params, "inputs": input_hashes,
+                        "outputs": outputs, "seconds": round(seconds, 4), "finished": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+            with open(stage_dir / MANIFEST, "w") as f:
+                json.dump(manifest, f, indent=2)
+            report.append({"stage": stage.name, "status": "ran", "seconds": round(seconds, 4),
+                           "last_run_seconds": round(seconds, 4), **_sizes(manifest)})
+        if stage.name == until:
+            break
+    return report
+
+
+def _sizes(manifest: dict) -> dict:
+    outputs = manifest["outputs"].values()
+    rows = [out["rows"] for out in outputs if out["rows"] is not None]
+    return {"bytes": sum(out["bytes"] for out in outputs), "rows": rows[0] if rows else None}
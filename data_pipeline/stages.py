@@ -0,0 +1,98 @@
+"""Data preparation stages, ported from notebooks/Data_Cleaning, Feature_Engineering and Data_Splitting.
+
+Each stage takes DataFrames (or, for `ingest`, the raw CSV path) and returns a dict of named
+outputs. The results are the same as the notebooks', but the dates are parsed once, in `ingest`,
+instead of from CSV text in every notebook. The engineered columns come from the feature
+definitions the API serves with (covid_predictor_api/app/features.py).
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+
+API_DIR = Path(__file__).resolve().parent.parent / "covid_predictor_api"
+if str(API_DIR) not in sys.path:
+    sys.path.append(str(API_DIR))
+
+from app import features as feature_definitions  # noqa: E402
+from app.features import FEATURE_NAMES, compile_batch, fit_encodings  # noqa: E402
+
+try:
+    from imblearn.over_sampling import SMOTE
+except ImportError:  # only needed when the split stage oversamples
+    SMOTE = None
+
+TARGET = "Reinfection"
+ESSENTIAL_DATES = ["Date_of_Infection", "Date_of_Recovery"]
+
+
+def date_columns(df: pd.DataFrame) -> list:
+    return [column for column in df.columns if "Date" in column]
+
+
+def ingest(raw: Path) -> dict:
+    """Raw CSV to typed columns: datetimes, numbers, and categories for the text columns"""
+    # pandas already reads the dataset's "None" strings as missing values
+    df = pd.read_csv(raw)
+    for column in date_columns(df):
+        df[column] = pd.to_datetime(df[column], format="ISO8601", errors="coerce")
+    text_columns = df.select_dtypes(include=["object", "string"]).columns
+    df[text_columns] = df[text_columns].astype("category")
+    return {"raw": df}
+
+
+def clean(raw: pd.DataFrame) -> dict:
+    """Drop IDs, rows without infection/recovery dates, duplicates and BMI outliers; fill the other dates"""
+    df = raw.drop(columns=["Patient_ID"])
+    df = df.dropna(subset=ESSENTIAL_DATES).drop_duplicates()
+
+    q1, q3 = df["BMI"].quantile(0.25), df["BMI"].quantile(0.75)
+    iqr = q3 - q1
+    df = df[df["BMI"].between(q1 - 1.5 * iqr, q3 + 1.5 * iqr)].copy()
+
+    df["Hospital_Admission_Date"] = df["Hospital_Admission_Date"].fillna(df["Date_of_Infection"] + pd.Timedelta(days=1))
+    df["Hospital_Discharge_Date"] = df["Hospital_Discharge_Date"].fillna(df["Date_of_Recovery"])
+    df["Date_of_Reinfection"] = df["Date_of_Reinfection"].fillna(df["Date_of_Recovery"])
+    df["Date_of_Last_Dose"] = df["Date_of_Last_Dose"].fillna(df["Date_of_Infection"])
+    return {"cleaned": df.reset_index(drop=True)}
+
+
+def engineer(cleaned: pd.DataFrame) -> dict:
+    """Fit the label encoders and compute every registered feature; the target becomes 1/0"""
+    encodings = fit_encodings(cleaned)
+    matrix = compile_batch(FEATURE_NAMES, encodings)(cleaned)
+    df = pd.DataFrame(matrix, columns=FEATURE_NAMES)
+    # Codes, flags and day counts come back as whole numbers; store them as integers like the notebook did
+    integral = np.isfinite(matrix).all(axis=0) & (matrix == np.trunc(matrix)).all(axis=0)
+    df = df.astype({name: np.int64 for name, whole in zip(FEATURE_NAMES, integral) if whole})
+    # Same column position as the notebook, which mapped the target alongside the Yes/No columns
+    df.insert(FEATURE_NAMES.index("Recovered") + 1, TARGET, cleaned[TARGET].astype(object).map({"Yes": 1, "No": 0}))
+
+    encoders = {}
+    for name, classes in encodings.items():
+        encoders[name] = LabelEncoder()
+        encoders[name].classes_ = classes
+    return {"engineered": df, "encoders": encoders}
+
+
+def split(engineered: pd.DataFrame, test_size: float = 0.2, random_state: int = 42, smote_ratio: float = 0.5) -> dict:
+    """Stratified train/test split; the training part is oversampled with SMOTE to `smote_ratio` (0 = off)"""
+    X = engineered.drop(columns=[TARGET])
+    y = engineered[TARGET]
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, stratify=y, random_state=random_state
+    )
+    if smote_ratio:
+        if SMOTE is None:
+            raise ImportError("imbalanced-learn is required for SMOTE oversampling (pip install imbalanced-learn), "
+                              "or run the split stage with --smote-ratio 0")
+        X_train, y_train = SMOTE(random_state=random_state, sampling_strategy=smote_ratio).fit_resample(X_train, y_train)
+    return {
+        "X_train": X_train.reset_index(drop=True),
+        "y_train": y_train.to_frame().reset_index(drop=True),
+        "X_test": X_test.reset_index(drop=True),
+        "y_test": y_test.to_frame().reset_index(drop=True),
+    }
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score, roc_auc_score
+
+from data_pipeline.chunked_training import Reservoir, StreamingMetrics, TrainingData, train_chunked
+from data_pipeline.pipeline import REPO_ROOT
+from data_pipeline.stages import TARGET
+
+ENGINEERED_CSV = REPO_ROOT / "data" / "Reinfection Engineered Dataset.csv"
+
+
+def test_streaming_metrics_match_sklearn():
+    rng = np.random.default_rng(0)
+    y_true = rng.integers(0, 2, 5000)
+    scores = np.clip(y_true * 0.3 + rng.random(5000) * 0.7, 0, 1)
+    y_pred = (scores > 0.5).astype(int)
+
+    metrics = StreamingMetrics(np.array([0, 1]))
+    for batch in np.array_split(np.arange(5000), 7):
+        metrics.update(y_true[batch], y_pred[batch], scores[batch])
+    report = metrics.report()
+
+    assert report["Accuracy"] == pytest.approx(accuracy_score(y_true, y_pred))
+    assert report["Precision"] == pytest.approx(precision_score(y_true, y_pred, average="weighted"))
+    assert report["Recall"] == pytest.approx(recall_score(y_true, y_pred, average="weighted"))
+    assert report["F1 Score"] == pytest.approx(f1_score(y_true, y_pred, average="weighted"))
+    assert report["ROC AUC"] == pytest.approx(roc_auc_score(y_true, scores), abs=1e-3)
+
+
+def test_reservoir_keeps_a_uniform_sample_of_fixed_size():
+    reservoir = Reservoir(1000, 1, seed=0)
+    for start in range(0, 100_000, 3000):
+        rows = np.arange(start, min(start + 3000, 100_000))
+        reservoir.add(rows[:, None].astype(float), rows)
+    X, y = reservoir.sample()
+    assert len(y) == 1000 and len(set(y.tolist())) == 1000
+    assert np.array_equal(X[:, 0], y)
+    # Every tenth of the stream is about equally represented
+    assert np.bincount(y // 10_000).min() > 60
+
+
+def test_chunked_training_on_the_engineered_dataset():
+    features = [c for c in pd.read_csv(ENGINEERED_CSV, nrows=0).columns if c != TARGET]
+    data = TrainingData(ENGINEERED_CSV, features, batch_rows=300)
+    train_rows = sum(len(y) for _, y in data.batches("train"))
+    test_rows = sum(len(y) for _, y in data.batches("test"))
+    assert train_rows + test_rows == len(pd.read_csv(ENGINEERED_CSV))
+    assert 0.15 < test_rows / (train_rows + test_rows) < 0.25
+
+    result = train_chunked(data, epochs=3, sample_rows=1000)
+    assert result["train_rows"] == train_rows and result["sample_rows"] == 1000
+    for name, report in result["metrics"].items():
+        assert report["rows"] == test_rows
+        assert report["Accuracy"] > 0.7, name
+    assert result["metrics"]["Hist Gradient Boosting"]["ROC AUC"] > 0.85
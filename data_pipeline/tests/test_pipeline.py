@@ -0,0 +1,73 @@
+import shutil
+
+import pandas as pd
+import pytest
+
+from data_pipeline import default_stages, load_output, run_pipeline, stages
+from data_pipeline.pipeline import RAW_DATASET, REPO_ROOT
+
+DATA_DIR = REPO_ROOT / "data"
+
+
+def statuses(report):
+    return {row["stage"]: row["status"] for row in report}
+
+
+@pytest.fixture(scope="module")
+def work_dir(tmp_path_factory):
+    work_dir = tmp_path_factory.mktemp("pipeline")
+    run_pipeline(default_stages(smote_ratio=0), work_dir)
+    return work_dir
+
+
+def test_outputs_match_the_notebooks(work_dir):
+    cleaned = load_output("clean/cleaned", work_dir)
+    expected = pd.read_csv(DATA_DIR / "Cleaned_Data.csv")
+    for column in [c for c in expected.columns if "Date" in c]:
+        expected[column] = pd.to_datetime(expected[column])
+    text = cleaned.select_dtypes(include="category").columns
+    pd.testing.assert_frame_equal(cleaned.astype({c: object for c in text}), expected.astype({c: object for c in text}),
+                                  check_dtype=False)
+
+    pd.testing.assert_frame_equal(load_output("features/engineered", work_dir),
+                                  pd.read_csv(DATA_DIR / "Reinfection Engineered Dataset.csv"), check_dtype=False)
+    for name in ("X_test", "y_test"):
+        pd.testing.assert_frame_equal(load_output(f"split/{name}", work_dir),
+                                      pd.read_csv(DATA_DIR / "splitted_data" / f"{name}.csv"), check_dtype=False)
+
+
+def test_only_changed_stages_rerun(work_dir):
+    assert set(statuses(run_pipeline(default_stages(smote_ratio=0), work_dir)).values()) == {"cached"}
+
+    # Re-running a stage that produces the same data leaves the later stages cached
+    assert statuses(run_pipeline(default_stages(smote_ratio=0), work_dir, force=("clean",))) == {
+        "ingest": "cached", "clean": "ran", "features": "cached", "split": "cached"}
+
+    assert statuses(run_pipeline(default_stages(test_size=0.25, smote_ratio=0), work_dir)) == {
+        "ingest": "cached", "clean": "cached", "features": "cached", "split": "ran"}
+
+
+def test_changed_raw_data_reruns_everything(tmp_path):
+    raw = tmp_path / "raw.csv"
+    shutil.copyfile(RAW_DATASET, raw)
+    work_dir = tmp_path / "work"
+    run_pipeline(default_stages(raw, smote_ratio=0), work_dir)
+
+    df = pd.read_csv(raw, keep_default_na=False)
+    df.iloc[:50].to_csv(raw, index=False)
+    assert set(statuses(run_pipeline(default_stages(raw, smote_ratio=0), work_dir)).values()) == {"ran"}
+    assert len(load_output("ingest/raw", work_dir)) == 50
+
+
+def test_editing_a_feature_definition_reruns_the_features_stage(work_dir, tmp_path, monkeypatch):
+    assert statuses(run_pipeline(default_stages(smote_ratio=0), work_dir))["features"] == "cached"
+
+    definitions = tmp_path / "features.py"
+    source = (REPO_ROOT / "covid_predictor_api" / "app" / "features.py").read_text()
+    definitions.write_text(source.replace("min_value=0)", "min_value=0)  # edited", 1))
+    assert definitions.read_text() != source
+    monkeypatch.setattr(stages.feature_definitions, "__file__", str(definitions))
+
+    # Same engineered data after the edit, so the split stays cached
+    assert statuses(run_pipeline(default_stages(smote_ratio=0), work_dir)) == {
+        "ingest": "cached", "clean": "cached", "features": "ran", "split": "cached"}
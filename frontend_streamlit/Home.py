@@ -15,6 +15,10 @@ st.set_page_config(
 
 # API endpoint
 API_URL = "http://127.0.0.1:8000/predict"
+WHAT_IF_URL = "http://127.0.0.1:8000/predict/what-if"
+
+# Doses_Received values in the training data; the model has seen nothing beyond 3 doses
+TRAINED_DOSES = [0, 1, 2, 3]
 
 # Function to make prediction
 def predict_reinfection(patient_data):
@@ -29,6 +33,17 @@ def predict_reinfection(patient_data):
         st.error(f"Error connecting to API: {str(e)}")
         return None
 
+# Risk of the same patient over a grid of field variations (no LLM call, one model pass)
+def what_if_surface(patient_data, variations):
+    try:
+        response = requests.post(WHAT_IF_URL, json={"patient": patient_data, "variations": variations})
+        if response.status_code == 200:
+            return response.json()
+        st.warning(f"What-if analysis unavailable: {response.status_code} - {response.text}")
+    except Exception as e:
+        st.warning(f"What-if analysis unavailable: {str(e)}")
+    return None
+
 # App title and description
 st.title("COVID-19 Reinfection Predictor")
 st.markdown("""
@@ -103,7 +118,7 @@ with st.form("patient_form"):
                 "Vaccine Type", 
                 ["Pfizer", "Moderna", "AstraZeneca", "Janssen"]
             )
-            doses_received = st.number_input("Doses Received", min_value=0, max_value=5, value=2)
+            doses_received = st.number_input("Doses Received", min_value=min(TRAINED_DOSES), max_value=max(TRAINED_DOSES), value=2)
             date_of_last_dose = st.date_input(
                 "Date of Last Dose", 
                 value=datetime(2023, 1, 15)
@@ -270,6 +285,32 @@ if submit_button:
         for rec in recommendations:
             st.markdown(rec)
 
+        # How the risk would change with a different vaccination history
+        st.subheader("What-if: Vaccination")
+        surface = what_if_surface(patient_data, {
+            "Doses_Received": TRAINED_DOSES,
+            "Vaccine_Type": ["Pfizer", "Moderna", "AstraZeneca", "Janssen", "None"],
+        })
+        if surface:
+            doses, vaccines = (axis["values"] for axis in surface["axes"])
+            chart_data = pd.DataFrame(
+                [
+                    {"Doses Received": dose, "Vaccine Type": vaccine, "Risk": surface["risk"][i][j]}
+                    for i, dose in enumerate(doses)
+                    for j, vaccine in enumerate(vaccines)
+                ]
+            )
+            st.altair_chart(
+                alt.Chart(chart_data).mark_rect().encode(
+                    x="Doses Received:O",
+                    y="Vaccine Type:N",
+                    color=alt.Color("Risk:Q", scale=alt.Scale(scheme="reds", domain=[0, 1])),
+                    tooltip=["Doses Received", "Vaccine Type", alt.Tooltip("Risk:Q", format=".0%")],
+                ),
+                use_container_width=True,
+            )
+            st.caption(f"Current inputs: {surface['baseline']['risk']:.0%} predicted reinfection probability")
+
 # Add information about the app at the bottom
 st.markdown("---")
 st.markdown("### About This App")
@@ -3,14 +3,15 @@ import streamlit as st
 import sys
 import os
 import json
+import uuid
 import requests
 
 # Add the parent directory to sys.path to import modules from RagModule
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 from RagModule.scripts.rag_pipeline import log_qna
-from langchain_community.vectorstores import FAISS
+from RagModule.scripts.llm_providers import get_llm
+from RagModule.scripts.chunk_store import load_vectorstore
 from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_openai import AzureChatOpenAI
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
 from dotenv import load_dotenv
@@ -31,24 +32,21 @@ INDEX_PATH = os.path.join(os.path.dirname(__file__), "../../RagModule/vectorstor
 # Initialize the session state for chat history
 if "messages" not in st.session_state:
     st.session_state.messages = []
+# The API keeps the conversation memory for follow-up questions under this id
+if "chat_session_id" not in st.session_state:
+    st.session_state.chat_session_id = str(uuid.uuid4())
 
 # Initialize RAG components
 @st.cache_resource
 def load_rag_components():
     """Load RAG components (vectorstore, LLM, retriever)"""
     try:
-        # Initialize Azure LLM
-        llm = AzureChatOpenAI(
-            azure_deployment=os.getenv("DEPLOYMENT_NAME"),
-            api_key=os.getenv("AZURE_API_KEY"),
-            azure_endpoint=os.getenv("AZURE_ENDPOINT"),
-            api_version=os.getenv("AZURE_API_VERSION"),
-            temperature=0,
-        )
+        # Initialize the configured LLM provider (LLM_PROVIDER: azure, local or fake)
+        llm = get_llm()
         
         # Initialize Vector Store
         embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-        vectorstore = FAISS.load_local(INDEX_PATH, embeddings, allow_dangerous_deserialization=True)
+        vectorstore = load_vectorstore(INDEX_PATH, embeddings)
         retriever = vectorstore.as_retriever(search_kwargs={"k": 3})  # Limit to top 3 results
         
         # Define Prompt Template for chatbot
@@ -84,7 +82,7 @@ def query_rag(question):
     try:
         response = requests.post(
             "http://localhost:8000/chat",
-            json={"question": question},
+            json={"question": question, "session_id": st.session_state.chat_session_id},
             headers={"Content-Type": "application/json"},
             timeout=10
         )
@@ -150,4 +148,9 @@ st.sidebar.markdown("""
 # Clear chat button
 if st.sidebar.button("Clear Chat History"):
     st.session_state.messages = []
+    try:
+        requests.delete(f"http://localhost:8000/chat/sessions/{st.session_state.chat_session_id}", timeout=5)
+    except requests.RequestException:
+        pass  # the server evicts idle sessions on its own
+    st.session_state.chat_session_id = str(uuid.uuid4())
     st.rerun()
\ No newline at end of file